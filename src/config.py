@@ -46,6 +46,105 @@ class Config:
     # Downloader
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", 50 * 1024 * 1024))  # 50MB default
     DOWNLOAD_TIMEOUT: int = int(os.getenv("DOWNLOAD_TIMEOUT", 300))  # 5 min default
+    # Отправке файла достаётся остаток DOWNLOAD_TIMEOUT, но не меньше этого (сек)
+    UPLOAD_MIN_TIMEOUT: int = int(os.getenv("UPLOAD_MIN_TIMEOUT", 120))
+
+    # Download cache (повторные запросы одного и того же поста)
+    DOWNLOAD_CACHE_INDEX: Path = DATA_DIR / "download_cache.json"
+    DOWNLOAD_CACHE_TTL: int = int(os.getenv("DOWNLOAD_CACHE_TTL", 24 * 60 * 60))  # 24h default
+
+    # Хранилище файлов загрузок: бюджет диска и водяные отметки LRU-вытеснения
+    MEDIA_STORE_INDEX: Path = DATA_DIR / "media_store.json"
+    MEDIA_STORE_MAX_BYTES: int = int(os.getenv("MEDIA_STORE_MAX_MB", 20 * 1024)) * 1024 * 1024
+    MEDIA_STORE_HIGH_WATERMARK: float = float(os.getenv("MEDIA_STORE_HIGH_WATERMARK", 0.9))
+    MEDIA_STORE_LOW_WATERMARK: float = float(os.getenv("MEDIA_STORE_LOW_WATERMARK", 0.75))
+    # Дедупликация по содержимому: уникальные файлы + жёсткие ссылки (та же ФС, что DATA_DIR)
+    DEDUPLICATE_MEDIA: bool = os.getenv("DEDUPLICATE_MEDIA", "True").lower() == "true"
+    BLOB_STORE_DIR: Path = DATA_DIR / "blobs"
+    # Удаление blob-ов, на которые не ссылаются ни загрузки, ни история (раз в N секунд)
+    BLOB_SWEEP_INTERVAL: int = int(os.getenv("BLOB_SWEEP_INTERVAL", 60 * 60))
+
+    # Кэш info dict yt-dlp (запрос форматов -> загрузка без повторного извлечения)
+    INFO_CACHE_TTL: int = int(os.getenv("INFO_CACHE_TTL", 30 * 60))  # 30 min default
+    INFO_CACHE_MAX_ENTRIES: int = int(os.getenv("INFO_CACHE_MAX_ENTRIES", 200))
+
+    # Докачка: журнал незавершённых загрузок (возобновляются после перезапуска)
+    DOWNLOAD_JOURNAL_PATH: Path = DATA_DIR / "download_jobs.json"
+    DOWNLOAD_RESUME_MAX_AGE: int = int(os.getenv("DOWNLOAD_RESUME_MAX_AGE", 6 * 60 * 60))  # 6h default
+
+    # Circuit breaker платформ (429 / требование логина)
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 3))  # Блокировок за окно
+    CIRCUIT_WINDOW: int = int(os.getenv("CIRCUIT_WINDOW", 5 * 60))
+    CIRCUIT_COOLDOWN: int = int(os.getenv("CIRCUIT_COOLDOWN", 2 * 60))  # Первое открытие, дальше x2
+    CIRCUIT_MAX_COOLDOWN: int = int(os.getenv("CIRCUIT_MAX_COOLDOWN", 30 * 60))
+    CIRCUIT_MAX_DEFER: int = int(os.getenv("CIRCUIT_MAX_DEFER", 20))  # Дольше - сразу отказ
+    RETRY_BACKOFF_BASE: float = float(os.getenv("RETRY_BACKOFF_BASE", 5))
+    RETRY_BACKOFF_MAX: float = float(os.getenv("RETRY_BACKOFF_MAX", 120))
+
+    # Пул аккаунтов Instagram: основной файл cookies + <имя>.txt в директории аккаунтов
+    INSTAGRAM_COOKIES_FILE: Path = Path(os.getenv(
+        "INSTAGRAM_COOKIES_FILE", "/opt/uspsocdowloader/instagram_cookies.txt"
+    ))
+    INSTAGRAM_ACCOUNTS_DIR: Path = Path(os.getenv(
+        "INSTAGRAM_ACCOUNTS_DIR", "/opt/uspsocdowloader/instagram_accounts"
+    ))
+
+    # Download scheduler (одновременные загрузки по платформам)
+    DOWNLOAD_WORKERS: dict = {
+        "instagram": int(os.getenv("DOWNLOAD_WORKERS_INSTAGRAM", 2)),
+        "youtube": int(os.getenv("DOWNLOAD_WORKERS_YOUTUBE", 2)),
+        "tiktok": int(os.getenv("DOWNLOAD_WORKERS_TIKTOK", 3)),
+        "vk": int(os.getenv("DOWNLOAD_WORKERS_VK", 2)),
+        "x": int(os.getenv("DOWNLOAD_WORKERS_X", 2)),
+        # Процессов ffmpeg одновременно (пережатие видео под лимит Telegram)
+        "transcode": int(os.getenv("TRANSCODE_WORKERS", 1)),
+    }
+    DOWNLOAD_WORKERS_DEFAULT: int = int(os.getenv("DOWNLOAD_WORKERS_DEFAULT", 2))
+    DOWNLOAD_QUEUE_MAX: int = int(os.getenv("DOWNLOAD_QUEUE_MAX", 20))  # На одну платформу
+    # Потоки для блокирующих вызовов yt-dlp/gallery-dl (все полосы + запас на запросы форматов)
+    DOWNLOAD_THREADS: int = int(os.getenv(
+        "DOWNLOAD_THREADS", sum(DOWNLOAD_WORKERS.values()) + DOWNLOAD_WORKERS_DEFAULT + 4
+    ))
+
+    # yt-dlp в отдельных процессах (extract_info не блокирует GIL бота)
+    YTDLP_PROCESS_POOL: bool = os.getenv("YTDLP_PROCESS_POOL", "False").lower() == "true"
+    YTDLP_PROCESS_WORKERS: int = int(os.getenv("YTDLP_PROCESS_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+
+    # HTTP-клиент загрузчика (прямые ссылки на фото)
+    HTTP_CONNECTIONS_LIMIT: int = int(os.getenv("HTTP_CONNECTIONS_LIMIT", 50))
+    HTTP_CONNECTIONS_PER_HOST: int = int(os.getenv("HTTP_CONNECTIONS_PER_HOST", 10))
+    HTTP_CHUNK_SIZE: int = 64 * 1024
+    PHOTO_FETCH_CONCURRENCY: int = int(os.getenv("PHOTO_FETCH_CONCURRENCY", 6))  # Слайдов одновременно
+    # Элементов карусели/плейлиста одного поста одновременно (потоки берутся из DOWNLOAD_THREADS)
+    CAROUSEL_CONCURRENCY: int = int(os.getenv("CAROUSEL_CONCURRENCY", 3))
+    # Обновление статуса с прогрессом загрузки (не чаще раза в N секунд на чат)
+    PROGRESS_UPDATE_INTERVAL: float = float(os.getenv("PROGRESS_UPDATE_INTERVAL", 3))
+
+    # Фоновая предзагрузка 360p и аудио, пока пользователь выбирает качество YouTube
+    YOUTUBE_PREFETCH: bool = os.getenv("YOUTUBE_PREFETCH", "False").lower() == "true"
+    YOUTUBE_PREFETCH_TTL: int = int(os.getenv("YOUTUBE_PREFETCH_TTL", 10 * 60))  # Выбор брошен
+
+    # Премиум-статус из листа Users переносится в локальную БД раз в N секунд
+    PREMIUM_SYNC_INTERVAL: int = int(os.getenv("PREMIUM_SYNC_INTERVAL", 10 * 60))
+
+    # Запись строк в Google Sheets: локальный spool + отправка пачками
+    SHEETS_SPOOL_PATH: Path = DATA_DIR / "sheets_spool.jsonl"
+    SHEETS_BATCH_SIZE: int = int(os.getenv("SHEETS_BATCH_SIZE", 50))
+    SHEETS_FLUSH_INTERVAL: float = float(os.getenv("SHEETS_FLUSH_INTERVAL", 10))
+    SHEETS_QUEUE_MAX_ROWS: int = int(os.getenv("SHEETS_QUEUE_MAX_ROWS", 50000))
+    # Дневные счётчики для листа Stats (локально) и период отправки строки дня
+    DAILY_STATS_PATH: Path = DATA_DIR / "daily_stats.json"
+    SHEETS_STATS_INTERVAL: int = int(os.getenv("SHEETS_STATS_INTERVAL", 5 * 60))
+    # Повторный /start того же пользователя в течение N секунд не пишется в лист Users
+    SHEETS_USER_DEBOUNCE: int = int(os.getenv("SHEETS_USER_DEBOUNCE", 60))
+    # Индекс user_id -> строка листа Users перечитывается раз в N секунд (ручные правки)
+    SHEETS_USERS_INDEX_TTL: int = int(os.getenv("SHEETS_USERS_INDEX_TTL", 60 * 60))
+    # Локальная копия листов Users/Requests для админ-команд: период и строк за запрос
+    SHEETS_MIRROR_INTERVAL: int = int(os.getenv("SHEETS_MIRROR_INTERVAL", 5 * 60))
+    SHEETS_MIRROR_CHUNK: int = int(os.getenv("SHEETS_MIRROR_CHUNK", 5000))
+
+    # Видео больше MAX_FILE_SIZE пережимаются ffmpeg под этот лимит
+    TRANSCODE_OVERSIZED: bool = os.getenv("TRANSCODE_OVERSIZED", "True").lower() == "true"
 
     def __repr__(self) -> str:
         """String representation of config."""
@@ -1,5 +1,6 @@
 """Database manager for user settings, download history, and collections."""
 import sqlite3
+import json
 import logging
 from pathlib import Path
 from typing import Optional, List, Dict, Any
@@ -85,6 +86,57 @@ class DatabaseManager:
                 )
             """)
 
+            # Telegram file_id registry (повторная отправка без загрузки файла)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS telegram_files (
+                    content_key TEXT PRIMARY KEY,
+                    files TEXT NOT NULL,
+                    info TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Premium status and daily request counter (hot path of every URL message)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS user_quota (
+                    user_id INTEGER PRIMARY KEY,
+                    is_premium BOOLEAN DEFAULT FALSE,
+                    quota_day TEXT,
+                    daily_requests INTEGER DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Read replica of the Users/Requests sheets for admin views (row_num = sheet row)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sheet_users (
+                    row_num INTEGER PRIMARY KEY,
+                    user_id INTEGER,
+                    username TEXT,
+                    first_name TEXT,
+                    last_name TEXT,
+                    first_seen TEXT,
+                    last_seen TEXT,
+                    total_requests INTEGER DEFAULT 0,
+                    is_premium BOOLEAN DEFAULT FALSE
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sheet_requests (
+                    row_num INTEGER PRIMARY KEY,
+                    timestamp TEXT,
+                    user_id INTEGER,
+                    platform TEXT,
+                    success BOOLEAN
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sheet_sync (
+                    sheet TEXT PRIMARY KEY,
+                    synced_rows INTEGER DEFAULT 0
+                )
+            """)
+
             # Create indices for performance
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_history_user_id
@@ -102,6 +154,18 @@ class DatabaseManager:
                 CREATE INDEX IF NOT EXISTS idx_collections_user_id
                 ON collections(user_id)
             """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_sheet_users_user_id
+                ON sheet_users(user_id)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_sheet_users_requests
+                ON sheet_users(total_requests DESC)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_sheet_requests_platform
+                ON sheet_requests(platform)
+            """)
 
             conn.commit()
             conn.close()
@@ -328,6 +392,57 @@ class DatabaseManager:
             logger.error(f"Failed to get download history: {e}")
             return []
 
+    @async_db_operation
+    def get_favorite_file_paths(self) -> List[str]:
+        """Get file paths of all favorite downloads.
+
+        Returns:
+            List of file paths
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "SELECT file_path FROM download_history "
+                "WHERE is_favorite = TRUE AND file_path IS NOT NULL"
+            )
+            paths = [row[0] for row in cursor.fetchall()]
+            conn.close()
+
+            return paths
+
+        except Exception as e:
+            logger.error(f"Failed to get favorite file paths: {e}")
+            return []
+
+    @async_db_operation
+    def get_history_file_paths(self, prefix: str) -> List[str]:
+        """Get distinct history file paths under a directory.
+
+        Args:
+            prefix: Directory (e.g. the blob store root)
+
+        Returns:
+            List of file paths
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "SELECT DISTINCT file_path FROM download_history WHERE file_path LIKE ?",
+                (prefix.rstrip("/") + "/%",)
+            )
+            paths = [row[0] for row in cursor.fetchall()]
+            conn.close()
+
+            return paths
+
+        except Exception as e:
+            logger.error(f"Failed to get history file paths: {e}")
+            return []
+
     @async_db_operation
     def get_download_by_id(self, download_id: int) -> Optional[Dict[str, Any]]:
         """Get specific download by ID.
@@ -674,6 +789,474 @@ class DatabaseManager:
             logger.error(f"Failed to delete collection: {e}")
             return False
 
+    @async_db_operation
+    def get_telegram_file(self, content_key: str) -> Optional[Dict[str, Any]]:
+        """Get registered Telegram file_ids for content.
+
+        Args:
+            content_key: Content key (platform:post_id:quality)
+
+        Returns:
+            Dict with 'files' (list of {'type', 'file_id'}) and 'info', or None
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "SELECT files, info FROM telegram_files WHERE content_key = ?",
+                (content_key,)
+            )
+            row = cursor.fetchone()
+            conn.close()
+
+            if not row:
+                return None
+
+            return {
+                'content_key': content_key,
+                'files': json.loads(row[0]),
+                'info': json.loads(row[1]) if row[1] else None
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to get telegram file {content_key}: {e}")
+            return None
+
+    @async_db_operation
+    def save_telegram_file(
+        self,
+        content_key: str,
+        files: List[Dict[str, str]],
+        info: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Register Telegram file_ids returned by the first upload.
+
+        Args:
+            content_key: Content key (platform:post_id:quality)
+            files: List of {'type': 'video'|'photo'|..., 'file_id': ...}
+            info: DownloadInfo fields for building caption on resend
+
+        Returns:
+            True if successful
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute(
+                """
+                INSERT OR REPLACE INTO telegram_files (content_key, files, info)
+                VALUES (?, ?, ?)
+                """,
+                (content_key, json.dumps(files),
+                 json.dumps(info, ensure_ascii=False) if info else None)
+            )
+
+            conn.commit()
+            conn.close()
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to save telegram file {content_key}: {e}")
+            return False
+
+    @async_db_operation
+    def delete_telegram_file(self, content_key: str) -> bool:
+        """Remove registered file_ids (e.g. Telegram rejected a stale file_id).
+
+        Args:
+            content_key: Content key (platform:post_id:quality)
+
+        Returns:
+            True if successful
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "DELETE FROM telegram_files WHERE content_key = ?",
+                (content_key,)
+            )
+
+            success = cursor.rowcount > 0
+            conn.commit()
+            conn.close()
+
+            return success
+
+        except Exception as e:
+            logger.error(f"Failed to delete telegram file {content_key}: {e}")
+            return False
+
+    @async_db_operation
+    def get_user_quota(self, user_id: int) -> Dict[str, Any]:
+        """Get premium status and today's successful requests.
+
+        The counter belongs to quota_day; a counter from an earlier day
+        reads as 0, so it resets at midnight without any scan.
+
+        Args:
+            user_id: Telegram user ID
+
+        Returns:
+            {'is_premium': bool, 'daily_requests': int}
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "SELECT is_premium, quota_day, daily_requests FROM user_quota WHERE user_id = ?",
+                (user_id,)
+            )
+            row = cursor.fetchone()
+            conn.close()
+
+            if not row:
+                return {'is_premium': False, 'daily_requests': 0}
+            return {
+                'is_premium': bool(row[0]),
+                'daily_requests': row[2] if row[1] == _today() else 0,
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to get quota for user {user_id}: {e}")
+            return {'is_premium': False, 'daily_requests': 0}
+
+    @async_db_operation
+    def increment_daily_requests(self, user_id: int) -> int:
+        """Count a successful request (atomic upsert, restarts on a new day).
+
+        Args:
+            user_id: Telegram user ID
+
+        Returns:
+            Today's successful requests including this one (0 on error)
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            today = _today()
+
+            cursor.execute(
+                """
+                INSERT INTO user_quota (user_id, quota_day, daily_requests)
+                VALUES (?, ?, 1)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    daily_requests = CASE WHEN quota_day = excluded.quota_day
+                                          THEN daily_requests + 1 ELSE 1 END,
+                    quota_day = excluded.quota_day,
+                    updated_at = CURRENT_TIMESTAMP
+                """,
+                (user_id, today)
+            )
+            cursor.execute(
+                "SELECT daily_requests FROM user_quota WHERE user_id = ?",
+                (user_id,)
+            )
+            count = cursor.fetchone()[0]
+
+            conn.commit()
+            conn.close()
+            return count
+
+        except Exception as e:
+            logger.error(f"Failed to count request for user {user_id}: {e}")
+            return 0
+
+    @async_db_operation
+    def set_premium_users(self, user_ids: List[int]) -> bool:
+        """Replace the set of premium users (sync from the Users sheet).
+
+        Args:
+            user_ids: All premium user IDs
+
+        Returns:
+            True if successful
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("UPDATE user_quota SET is_premium = FALSE WHERE is_premium")
+            cursor.executemany(
+                """
+                INSERT INTO user_quota (user_id, is_premium) VALUES (?, TRUE)
+                ON CONFLICT(user_id) DO UPDATE SET is_premium = TRUE
+                """,
+                [(user_id,) for user_id in user_ids]
+            )
+
+            conn.commit()
+            conn.close()
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to set premium users: {e}")
+            return False
+
+    @async_db_operation
+    def get_sheet_synced_rows(self, sheet: str) -> int:
+        """Get how many data rows of a sheet are already mirrored.
+
+        Args:
+            sheet: Sheet name
+
+        Returns:
+            Number of mirrored rows (the next sync starts after them)
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute("SELECT synced_rows FROM sheet_sync WHERE sheet = ?", (sheet,))
+            row = cursor.fetchone()
+            conn.close()
+            return row[0] if row else 0
+
+        except Exception as e:
+            logger.error(f"Failed to get sync offset for {sheet}: {e}")
+            return 0
+
+    @async_db_operation
+    def add_mirror_users(self, start_row: int, rows: List[List[str]]) -> bool:
+        """Mirror new rows of the Users sheet and advance the offset.
+
+        Args:
+            start_row: Sheet row number of the first row
+            rows: Raw sheet rows (user_id, username, first_name, last_name,
+                language, first_seen, last_seen, total_requests, status,
+                referrer_id, is_premium, ...)
+
+        Returns:
+            True if successful
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.executemany(
+                """
+                INSERT OR REPLACE INTO sheet_users
+                    (row_num, user_id, username, first_name, last_name,
+                     first_seen, last_seen, total_requests, is_premium)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (start_row + i, _to_int(_cell(r, 0)), _cell(r, 1), _cell(r, 2), _cell(r, 3),
+                     _cell(r, 5), _cell(r, 6), _to_int(_cell(r, 7)), _cell(r, 10) == "yes")
+                    for i, r in enumerate(rows)
+                ]
+            )
+            _set_synced_rows(cursor, "Users", start_row - 2 + len(rows))
+
+            conn.commit()
+            conn.close()
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to mirror users: {e}")
+            return False
+
+    @async_db_operation
+    def update_mirror_users(self, activity: List[List[str]], premium: List[List[str]]) -> bool:
+        """Refresh the mutable Users columns (they change in place).
+
+        Args:
+            activity: Columns last_seen, total_requests from sheet row 2
+            premium: Column is_premium from sheet row 2
+
+        Returns:
+            True if successful
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.executemany(
+                "UPDATE sheet_users SET last_seen = ?, total_requests = ? WHERE row_num = ?",
+                [(_cell(r, 0), _to_int(_cell(r, 1)), i + 2) for i, r in enumerate(activity)]
+            )
+            cursor.executemany(
+                "UPDATE sheet_users SET is_premium = ? WHERE row_num = ?",
+                [(_cell(r, 0) == "yes", i + 2) for i, r in enumerate(premium)]
+            )
+
+            conn.commit()
+            conn.close()
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to refresh mirrored users: {e}")
+            return False
+
+    @async_db_operation
+    def add_mirror_requests(self, start_row: int, rows: List[List[str]]) -> bool:
+        """Mirror new rows of the append-only Requests sheet and advance the offset.
+
+        Args:
+            start_row: Sheet row number of the first row
+            rows: Raw sheet rows (timestamp, user_id, username, platform,
+                content_type, url, success, ...)
+
+        Returns:
+            True if successful
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.executemany(
+                """
+                INSERT OR REPLACE INTO sheet_requests (row_num, timestamp, user_id, platform, success)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [
+                    (start_row + i, _cell(r, 0), _to_int(_cell(r, 1)),
+                     _cell(r, 3).lower(), _cell(r, 6) == "yes")
+                    for i, r in enumerate(rows)
+                ]
+            )
+            _set_synced_rows(cursor, "Requests", start_row - 2 + len(rows))
+
+            conn.commit()
+            conn.close()
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to mirror requests: {e}")
+            return False
+
+    @async_db_operation
+    def get_mirror_stats(self) -> Dict[str, Any]:
+        """Get bot totals from the mirrored sheets.
+
+        Returns:
+            Dict with total_users, premium_users, total_requests,
+            successful and platforms (platform -> requests)
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT COUNT(*), COALESCE(SUM(is_premium), 0)
+                FROM sheet_users WHERE user_id IS NOT NULL
+            """)
+            total_users, premium_users = cursor.fetchone()
+
+            cursor.execute("""
+                SELECT platform, COUNT(*), COALESCE(SUM(success), 0)
+                FROM sheet_requests
+                GROUP BY platform
+            """)
+            platforms = {}
+            total_requests = successful = 0
+            for platform, count, ok in cursor.fetchall():
+                total_requests += count
+                successful += ok
+                if platform:
+                    platforms[platform] = count
+
+            conn.close()
+            return {
+                "total_users": total_users,
+                "premium_users": premium_users,
+                "total_requests": total_requests,
+                "successful": successful,
+                "platforms": platforms,
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to get mirrored stats: {e}")
+            return {"total_users": 0, "premium_users": 0, "total_requests": 0,
+                    "successful": 0, "platforms": {}}
+
+    @async_db_operation
+    def get_mirror_users(self, limit: int = 10, order: str = "recent") -> List[Dict[str, Any]]:
+        """Get users from the mirrored Users sheet.
+
+        Args:
+            limit: Maximum number of users
+            order: 'recent' (newest registrations first) or 'top' (most requests first)
+
+        Returns:
+            List of user dictionaries
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            order_by = "total_requests DESC" if order == "top" else "row_num DESC"
+            cursor.execute(
+                f"""
+                SELECT user_id, username, first_name, last_name, first_seen,
+                       last_seen, total_requests, is_premium
+                FROM sheet_users
+                WHERE user_id IS NOT NULL
+                ORDER BY {order_by}
+                LIMIT ?
+                """,
+                (limit,)
+            )
+            rows = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return rows
+
+        except Exception as e:
+            logger.error(f"Failed to get mirrored users: {e}")
+            return []
+
+    @async_db_operation
+    def get_mirror_user_ids(self) -> List[int]:
+        """Get all user IDs from the mirrored Users sheet.
+
+        Returns:
+            List of user IDs
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT DISTINCT user_id FROM sheet_users WHERE user_id IS NOT NULL ORDER BY row_num"
+            )
+            user_ids = [row[0] for row in cursor.fetchall()]
+            conn.close()
+            return user_ids
+
+        except Exception as e:
+            logger.error(f"Failed to get mirrored user ids: {e}")
+            return []
+
+
+def _cell(row: List[str], index: int) -> str:
+    """Sheet cell value ('' for cells the API omitted)"""
+    return str(row[index]).strip() if index < len(row) else ""
+
+
+def _to_int(value: str) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _set_synced_rows(cursor: sqlite3.Cursor, sheet: str, synced_rows: int) -> None:
+    cursor.execute(
+        """
+        INSERT INTO sheet_sync (sheet, synced_rows) VALUES (?, ?)
+        ON CONFLICT(sheet) DO UPDATE SET synced_rows = excluded.synced_rows
+        """,
+        (sheet, synced_rows)
+    )
+
+
+def _today() -> str:
+    """Quota day (local date, same as request timestamps)"""
+    return datetime.now().strftime("%Y-%m-%d")
+
 
 # Global instance
 _db_manager: Optional[DatabaseManager] = None
@@ -0,0 +1,150 @@
+"""
+Blob Store - дедупликация скачанных файлов по содержимому
+Один и тот же файл приходит под разными именами (шаблоны yt-dlp,
+{safe_title}_{i}.jpg, {video_id}_{quality}p.mp4) и от разных пользователей.
+Каждое уникальное содержимое хранится один раз: blobs/<sha256[:2]>/<sha256><ext>,
+а файлы в директориях загрузок - жёсткие ссылки на него. Повтор того же
+содержимого не занимает места: файл загрузки заменяется ссылкой на blob.
+"""
+import errno
+import hashlib
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.utils.logger import get_logger
+from src.config import config
+
+logger = get_logger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def new_hasher():
+    """Хэш содержимого (обновляется по мере записи файла)"""
+    return hashlib.sha256()
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 файла (чтение блоками)"""
+    hasher = new_hasher()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class BlobStore:
+    """Хранилище уникального содержимого с жёсткими ссылками из директорий загрузок"""
+
+    def __init__(self, root: Path):
+        """Инициализация хранилища.
+
+        Args:
+            root: Директория blob-ов (на той же файловой системе, что и загрузки)
+        """
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Хэши, посчитанные при потоковой записи: путь -> (sha256, inode)
+        self._streamed: Dict[str, Tuple[str, int]] = {}
+        # Жёсткие ссылки не поддерживаются (другая файловая система)
+        self.disabled = False
+
+        # Статистика
+        self.stored = 0
+        self.deduplicated = 0
+        self.saved_bytes = 0
+
+    def blob_path(self, digest: str, suffix: str) -> Path:
+        """Путь blob-а по хэшу (расширение сохраняется - по нему выбирается тип отправки)"""
+        return self.root / digest[:2] / f"{digest}{suffix.lower()}"
+
+    def remember(self, path: str, digest: str) -> None:
+        """Запоминает хэш, посчитанный при скачивании файла"""
+        try:
+            self._streamed[path] = (digest, os.stat(path).st_ino)
+        except OSError:
+            pass
+
+    def discard(self, job_dir: Path) -> None:
+        """Забывает хэши файлов удалённой директории загрузки"""
+        prefix = f"{job_dir}{os.sep}"
+        for path in [p for p in self._streamed if p.startswith(prefix)]:
+            del self._streamed[path]
+
+    def adopt(self, path: str) -> Optional[str]:
+        """Переносит файл загрузки в хранилище.
+
+        Если такое содержимое уже есть - файл заменяется жёсткой ссылкой
+        на существующий blob, иначе файл становится новым blob-ом.
+        Вызывать после того, как файл больше не меняется (после remux).
+
+        Returns:
+            Путь blob-а или None (хранилище недоступно, ошибка)
+        """
+        streamed = self._streamed.pop(path, None)
+        if self.disabled:
+            return None
+        try:
+            stat = os.stat(path)
+            # Хэш из потока годится, только если файл не перезаписан после скачивания
+            digest = streamed[0] if streamed and streamed[1] == stat.st_ino else hash_file(path)
+            blob = self.blob_path(digest, Path(path).suffix)
+            try:
+                blob_stat = os.stat(blob)
+            except FileNotFoundError:
+                blob.parent.mkdir(exist_ok=True)
+                os.link(path, blob)
+                self.stored += 1
+                return str(blob)
+
+            if blob_stat.st_ino != stat.st_ino:
+                # Повтор содержимого: ссылка на blob вместо копии
+                tmp_path = f"{path}.link"
+                os.link(blob, tmp_path)
+                os.replace(tmp_path, path)
+                self.deduplicated += 1
+                self.saved_bytes += stat.st_size
+                logger.info(f"Deduplicated {Path(path).name} -> {blob.name}")
+            return str(blob)
+        except OSError as e:
+            if e.errno in (errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP):
+                logger.warning(f"Hardlinks unavailable for blob store, deduplication disabled: {e}")
+                self.disabled = True
+            else:
+                logger.warning(f"Failed to deduplicate {path}: {e}")
+            return None
+
+    def sweep(self, is_pinned: Callable[[str], bool]) -> List[str]:
+        """Удаляет blob-ы, на которые не осталось ссылок из директорий загрузок.
+
+        Args:
+            is_pinned: Blob нужно сохранить (в избранном, записан в истории)
+
+        Returns:
+            Удалённые blob-ы
+        """
+        removed = []
+        for blob in self.root.glob("*/*"):
+            try:
+                if blob.stat().st_nlink > 1 or is_pinned(str(blob)):
+                    continue
+                blob.unlink()
+                removed.append(str(blob))
+            except OSError:
+                continue
+        if removed:
+            logger.info(f"Removed {len(removed)} unreferenced blobs")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика дедупликации"""
+        return {
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "saved_mb": self.saved_bytes / (1024 * 1024),
+            "disabled": self.disabled,
+        }
+
+
+# Singleton instance
+blob_store = BlobStore(config.BLOB_STORE_DIR)
@@ -0,0 +1,118 @@
+"""
+Job Deadline - сквозной дедлайн загрузки (DOWNLOAD_TIMEOUT)
+Отсчёт начинается, когда задача получила слот в очереди платформы, и
+покрывает извлечение, скачивание и постобработку; отправке пользователю
+достаётся остаток. По истечении задача отменяется: gallery-dl и
+HTTP-загрузки прерываются отменой, yt-dlp в потоке останавливается на
+ближайшем своём хуке, зависшие процессы пула убиваются
+"""
+import asyncio
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Dict, List, Optional, TypeVar
+from src.config import config
+
+T = TypeVar("T")
+
+
+class DownloadTimeoutError(Exception):
+    """Загрузка или отправка не уложилась в дедлайн"""
+
+    def __init__(self, platform: Optional[str], timeout: float, stage: str = "download"):
+        self.platform = platform
+        self.timeout = timeout
+        self.stage = stage
+        super().__init__(f"Download timeout for {platform}: {stage} exceeded {timeout:.0f}s")
+
+    @property
+    def user_message(self) -> str:
+        """Сообщение для пользователя"""
+        minutes = max(1, round(self.timeout / 60))
+        return f"Загрузка заняла больше {minutes} мин и была остановлена. Попробуйте позже"
+
+
+class JobDeadline:
+    """Дедлайн одной загрузки и флаг её отмены (общий с потоком yt-dlp)"""
+
+    def __init__(self, timeout: float):
+        """Инициализация.
+
+        Args:
+            timeout: Время на загрузку (сек)
+        """
+        self.timeout = timeout
+        self.started = time.monotonic()
+        self._cancelled = threading.Event()
+        # Директории загрузки - удаляются, если дедлайн истёк
+        self.job_dirs: List[Path] = []
+
+    def remaining(self) -> float:
+        """Оставшееся время (сек), не меньше нуля"""
+        return max(0.0, self.timeout - (time.monotonic() - self.started))
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Останавливает загрузку: хуки yt-dlp прервут её в потоке"""
+        self._cancelled.set()
+
+    def check(self) -> None:
+        """Прерывает yt-dlp, если загрузка отменена (вызывается из потока)"""
+        if not self._cancelled.is_set():
+            return
+        try:
+            # DownloadCancelled yt-dlp не оборачивает и не подавляет
+            from yt_dlp.utils import DownloadCancelled
+        except ImportError:
+            raise DownloadTimeoutError(None, self.timeout)
+        raise DownloadCancelled(f"Download deadline of {self.timeout:.0f}s exceeded")
+
+    def ytdlp_hook(self, d: Dict[str, Any]) -> None:
+        """progress_hooks / postprocessor_hooks yt-dlp"""
+        self.check()
+
+    def match_filter(self, info: Dict[str, Any], *, incomplete: bool = False) -> Optional[str]:
+        """match_filter yt-dlp: проверка между извлечением и скачиванием"""
+        self.check()
+        return None
+
+    def apply(self, ydl_opts: Dict[str, Any]) -> Dict[str, Any]:
+        """Опции yt-dlp с хуками отмены (только для пула потоков)"""
+        return dict(
+            ydl_opts,
+            progress_hooks=[*ydl_opts.get("progress_hooks", []), self.ytdlp_hook],
+            postprocessor_hooks=[*ydl_opts.get("postprocessor_hooks", []), self.ytdlp_hook],
+            match_filter=self.match_filter,
+        )
+
+
+def upload_timeout(started_at: float) -> float:
+    """Время на отправку файла: остаток дедлайна запроса, но не меньше UPLOAD_MIN_TIMEOUT.
+
+    Args:
+        started_at: time.time() начала обработки запроса
+    """
+    remaining = config.DOWNLOAD_TIMEOUT - (time.time() - started_at)
+    return max(config.UPLOAD_MIN_TIMEOUT, remaining)
+
+
+async def upload_within_deadline(coro: Awaitable[T], started_at: float,
+                                 platform: Optional[str] = None) -> T:
+    """Выполняет отправку файла не дольше upload_timeout.
+
+    Raises:
+        DownloadTimeoutError: Отправка не уложилась в дедлайн
+    """
+    timeout = upload_timeout(started_at)
+    try:
+        return await asyncio.wait_for(coro, timeout)
+    except asyncio.TimeoutError:
+        raise DownloadTimeoutError(platform, timeout, stage="upload")
+
+
+# Дедлайн загрузки, выполняемой в текущей задаче
+current_deadline: ContextVar[Optional[JobDeadline]] = ContextVar("current_deadline", default=None)
@@ -0,0 +1,330 @@
+"""
+Download Cache - кэш скачанных медиа по ключу (платформа, post_id, качество)
+Повторный запрос того же поста отдаётся с диска без обращения к сети
+"""
+import json
+import os
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from src.utils.logger import get_logger
+from src.config import config
+
+logger = get_logger(__name__)
+
+
+def make_content_key(platform: Optional[str], post_id: Optional[str],
+                     quality: Optional[str] = None) -> Optional[str]:
+    """Строит ключ контента: platform:post_id:quality
+
+    Args:
+        platform: Название платформы (регистр не важен)
+        post_id: Нормализованный ID поста из URLProcessor
+        quality: Качество/формат (360p, audio, video, photo...)
+
+    Returns:
+        Ключ или None, если post_id неизвестен
+    """
+    if not post_id:
+        return None
+    return f"{(platform or 'unknown').lower()}:{post_id}:{quality or 'default'}"
+
+
+def sent_content_key(platform: Optional[str], post_id: Optional[str],
+                     content_type: Optional[str] = None) -> Optional[str]:
+    """Ключ реестра file_id по типу контента из истории и статистики
+
+    Один построитель для отправки (url_handler) и повторной отправки из
+    истории/избранного (commands): тип YouTube-видео в выбранном качестве
+    (video_360p) даёт качество 360p, как у ключа кэша загрузок.
+
+    Args:
+        platform: Название платформы (регистр не важен)
+        post_id: Нормализованный ID поста из URLProcessor
+        content_type: Тип контента (video, photo, audio, video_360p...)
+
+    Returns:
+        Ключ или None, если post_id неизвестен
+    """
+    quality = content_type
+    if content_type and content_type.startswith("video_") and content_type.endswith("p"):
+        quality = content_type[len("video_"):]
+    return make_content_key(platform, post_id, quality)
+
+
+class DownloadCache:
+    """Персистентный кэш загрузок с TTL (и, опционально, ограничением по размеру)"""
+
+    def __init__(self, index_path: Path, ttl: int, max_bytes: Optional[int] = None):
+        """Инициализация кэша.
+
+        Args:
+            index_path: Путь к JSON-индексу кэша
+            ttl: Время жизни записи в секундах
+            max_bytes: Максимальный суммарный размер файлов в кэше (None - без
+                ограничения: место на диске распределяет MediaStore)
+        """
+        self.index_path = index_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+        # Файлы, которые сейчас отправляются пользователям
+        self._pins: Counter = Counter()
+
+        # Статистика
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Загружает индекс кэша с диска"""
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                    logger.debug(f"Loaded {len(data)} download cache entries")
+                    return data
+            except Exception as e:
+                logger.error(f"Error loading download cache index: {e}")
+        return {}
+
+    def _save(self) -> None:
+        """Сохраняет индекс кэша на диск"""
+        try:
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.error(f"Error saving download cache index: {e}")
+
+    @staticmethod
+    def _entry_paths(info: Dict[str, Any]) -> List[str]:
+        """Возвращает все файлы, на которые ссылается DownloadInfo"""
+        if info.get("file_paths"):
+            return list(info["file_paths"])
+        if info.get("file_path"):
+            return [info["file_path"]]
+        return []
+
+    def _is_entry_pinned(self, entry: Dict[str, Any]) -> bool:
+        return any(self._pins[p] > 0 for p in entry["paths"])
+
+    def _remove_entry(self, key: str, delete_files: bool = True) -> None:
+        """Удаляет запись (и её файлы) из кэша"""
+        entry = self._entries.pop(key, None)
+        if not entry or not delete_files:
+            return
+        for path in entry["paths"]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Failed to delete cached file {path}: {e}")
+        self.evictions += 1
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Получает данные DownloadInfo из кэша.
+
+        Args:
+            key: Ключ контента (make_content_key)
+
+        Returns:
+            Словарь с полями DownloadInfo или None
+        """
+        if not key:
+            return None
+
+        entry = self._entries.get(key)
+        if not entry:
+            self.misses += 1
+            return None
+
+        now = time.time()
+        if now - entry["created"] > self.ttl and not self._is_entry_pinned(entry):
+            self._remove_entry(key)
+            self._save()
+            self.misses += 1
+            return None
+
+        # Файл могли удалить (очистка, отправка большого файла) - запись устарела
+        if not all(os.path.exists(p) for p in entry["paths"]):
+            self._remove_entry(key, delete_files=False)
+            self._save()
+            self.misses += 1
+            return None
+
+        entry["last_access"] = now
+        self.hits += 1
+        logger.info(f"Download cache hit: {key}")
+        return dict(entry["info"])
+
+    def put(self, key: Optional[str], info: Dict[str, Any]) -> None:
+        """Добавляет результат загрузки в кэш.
+
+        Args:
+            key: Ключ контента (make_content_key)
+            info: Словарь с полями DownloadInfo
+        """
+        if not key:
+            return
+
+        paths = self._entry_paths(info)
+        if not paths or not all(os.path.exists(p) for p in paths):
+            return
+
+        now = time.time()
+        self._entries[key] = {
+            "info": info,
+            "paths": paths,
+            "size": sum(os.path.getsize(p) for p in paths),
+            "created": now,
+            "last_access": now,
+        }
+        self._evict()
+        self._save()
+
+    def _evict(self) -> None:
+        """Удаляет устаревшие записи и самые старые по доступу при превышении лимита"""
+        now = time.time()
+        for key, entry in list(self._entries.items()):
+            if now - entry["created"] > self.ttl and not self._is_entry_pinned(entry):
+                self._remove_entry(key)
+
+        if self.max_bytes is None:
+            return
+        total = self.total_size()
+        if total <= self.max_bytes:
+            return
+
+        for key, entry in sorted(self._entries.items(), key=lambda kv: kv[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            if self._is_entry_pinned(entry):
+                continue
+            total -= entry["size"]
+            self._remove_entry(key)
+            logger.info(f"Evicted from download cache: {key}")
+
+    def total_size(self) -> int:
+        """Суммарный размер файлов в кэше (байт)"""
+        return sum(entry["size"] for entry in self._entries.values())
+
+    def pin(self, paths: Iterable[str]) -> None:
+        """Защищает файлы от вытеснения (файл отправляется пользователю)"""
+        for path in paths:
+            if path:
+                self._pins[path] += 1
+
+    def unpin(self, paths: Iterable[str]) -> None:
+        """Снимает защиту от вытеснения"""
+        for path in paths:
+            if path and self._pins[path] > 0:
+                self._pins[path] -= 1
+                if self._pins[path] == 0:
+                    del self._pins[path]
+
+    @contextmanager
+    def pinned(self, paths: Iterable[str]):
+        """Контекстный менеджер: файлы не вытесняются, пока идёт отправка"""
+        paths = [p for p in paths if p]
+        self.pin(paths)
+        try:
+            yield
+        finally:
+            self.unpin(paths)
+
+    def is_pinned(self, path: str) -> bool:
+        """Проверяет, отправляется ли сейчас файл"""
+        return self._pins[path] > 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша"""
+        total_requests = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_mb": self.total_size() / (1024 * 1024),
+            "max_size_mb": self.max_bytes / (1024 * 1024) if self.max_bytes is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total_requests if total_requests else 0,
+            "evictions": self.evictions,
+        }
+
+
+class InfoDictCache:
+    """Кэш info dict yt-dlp в памяти (TTL + LRU).
+
+    Заполняется при запросе форматов YouTube и используется при загрузке,
+    чтобы не извлекать информацию о видео второй раз. Ссылки на форматы
+    YouTube живут несколько часов, поэтому TTL короткий.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        """Инициализация кэша.
+
+        Args:
+            ttl: Время жизни записи в секундах
+            max_entries: Максимальное число записей
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created, info)
+
+        # Статистика
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Возвращает info dict или None"""
+        if not key:
+            return None
+        entry = self._entries.get(key)
+        if entry is None or time.time() - entry[0] > self.ttl:
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Optional[str], info: Optional[Dict[str, Any]]) -> None:
+        """Сохраняет info dict"""
+        if not key or not info:
+            return
+        self._entries[key] = (time.time(), info)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Optional[str]) -> None:
+        """Удаляет запись (например, если ссылки форматов истекли)"""
+        if key:
+            self._entries.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша"""
+        total_requests = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total_requests if total_requests else 0,
+        }
+
+
+# Singleton instances
+# Бюджет диска у файлов загрузок один - MEDIA_STORE_MAX_BYTES (media_store)
+download_cache = DownloadCache(
+    config.DOWNLOAD_CACHE_INDEX,
+    ttl=config.DOWNLOAD_CACHE_TTL,
+)
+
+info_cache = InfoDictCache(
+    ttl=config.INFO_CACHE_TTL,
+    max_entries=config.INFO_CACHE_MAX_ENTRIES,
+)
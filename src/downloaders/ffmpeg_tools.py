@@ -0,0 +1,289 @@
+"""
+FFmpeg Tools - подготовка видео к отправке в Telegram
+- faststart: moov в начало файла без перекодирования (воспроизведение
+  начинается до полной загрузки файла)
+- ffprobe: ширина, высота, длительность для answer_video
+- превью (thumbnail) из кадра видео
+- пережатие под лимит размера: битрейт по длительности и бюджету байт,
+  при низком битрейте кадр уменьшается
+ffmpeg/ffprobe запускаются через asyncio subprocess: поток пула не занят,
+а при отмене задачи (дедлайн загрузки) процесс убивается
+"""
+import asyncio
+import json
+import os
+import shutil
+import struct
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+FFMPEG = shutil.which("ffmpeg") or "/usr/bin/ffmpeg"
+FFPROBE = shutil.which("ffprobe") or "/usr/bin/ffprobe"
+
+# Видео, которые готовятся к отправке (faststart - только для MP4/MOV)
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v", ".webm", ".mkv")
+FASTSTART_EXTENSIONS = (".mp4", ".mov", ".m4v")
+# Превью Telegram: JPEG не больше 320 px по большей стороне
+THUMBNAIL_SIZE = 320
+
+AUDIO_BITRATE = 96_000  # бит/сек
+MIN_VIDEO_BITRATE = 150_000  # Ниже - видео не смотрибельно, не пережимаем
+# Запас на контейнер и неточность однопроходного кодирования
+SIZE_MARGIN = 0.92
+# (минимальный битрейт видео, максимальная высота кадра): чем меньше битрейт, тем меньше кадр
+SCALE_STEPS = (
+    (2_500_000, None),
+    (1_200_000, 720),
+    (600_000, 480),
+    (0, 360),
+)
+
+
+class FFmpegError(Exception):
+    """ffmpeg/ffprobe завершился с ошибкой"""
+
+
+def plan_bitrate(duration: float, target_bytes: int) -> Optional[Tuple[int, Optional[int]]]:
+    """Битрейт видео и высота кадра, при которых файл уложится в target_bytes.
+
+    Args:
+        duration: Длительность видео (сек)
+        target_bytes: Бюджет размера файла
+
+    Returns:
+        (битрейт видео бит/сек, максимальная высота или None) либо None,
+        если даже минимальный битрейт не помещается
+    """
+    if not duration or duration <= 0:
+        return None
+    video_bitrate = target_bytes * 8 * SIZE_MARGIN / duration - AUDIO_BITRATE
+    if video_bitrate < MIN_VIDEO_BITRATE:
+        return None
+    for min_bitrate, height in SCALE_STEPS:
+        if video_bitrate >= min_bitrate:
+            return int(video_bitrate), height
+    return int(video_bitrate), SCALE_STEPS[-1][1]
+
+
+def transcode_args(source: Path, output: Path, video_bitrate: int,
+                   max_height: Optional[int]) -> List[str]:
+    """Аргументы ffmpeg для пережатия в H.264/AAC mp4 с faststart"""
+    args = [
+        "-y", "-v", "error", "-i", str(source),
+        "-c:v", "libx264", "-preset", "veryfast",
+        "-b:v", str(video_bitrate),
+        "-maxrate", str(video_bitrate), "-bufsize", str(video_bitrate * 2),
+        "-pix_fmt", "yuv420p",
+    ]
+    if max_height:
+        # Не увеличиваем кадр; ширина - чётная, с сохранением пропорций
+        args += ["-vf", f"scale=-2:'min({max_height},ih)'"]
+    args += [
+        "-c:a", "aac", "-b:a", str(AUDIO_BITRATE), "-ac", "2",
+        "-movflags", "+faststart",
+        str(output),
+    ]
+    return args
+
+
+async def _run(program: str, args: List[str]) -> str:
+    """Запускает программу и возвращает stdout.
+
+    Raises:
+        FFmpegError: Ненулевой код возврата
+    """
+    proc = await asyncio.create_subprocess_exec(
+        program, *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await proc.communicate()
+    finally:
+        # Отмена задачи (дедлайн) - процесс больше не нужен
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+    if proc.returncode != 0:
+        raise FFmpegError(stderr.decode("utf-8", errors="replace").strip()[-300:] or
+                          f"{Path(program).name} exited with {proc.returncode}")
+    return stdout.decode("utf-8", errors="replace")
+
+
+def is_available() -> bool:
+    """ffmpeg и ffprobe установлены"""
+    return os.path.exists(FFMPEG) and os.path.exists(FFPROBE)
+
+
+async def probe_video(path: Path) -> Dict[str, Any]:
+    """Ширина, высота и длительность видео по ffprobe.
+
+    Returns:
+        {"width", "height", "duration"} - известные значения (пустой при ошибке)
+    """
+    try:
+        output = await _run(FFPROBE, [
+            "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=width,height:format=duration",
+            "-of", "json", str(path)
+        ])
+        data = json.loads(output)
+    except (FFmpegError, ValueError) as e:
+        logger.warning(f"ffprobe failed for {path.name}: {e}")
+        return {}
+
+    meta: Dict[str, Any] = {}
+    streams = data.get("streams") or [{}]
+    for key in ("width", "height"):
+        if streams[0].get(key):
+            meta[key] = int(streams[0][key])
+    try:
+        meta["duration"] = float(data["format"]["duration"])
+    except (KeyError, ValueError, TypeError):
+        pass
+    return meta
+
+
+async def probe_duration(path: Path) -> Optional[float]:
+    """Длительность медиафайла по ffprobe (None - не удалось определить)"""
+    return (await probe_video(path)).get("duration")
+
+
+def moov_before_mdat(path: Path) -> Optional[bool]:
+    """Порядок атомов MP4 верхнего уровня.
+
+    Returns:
+        True - moov в начале (faststart), False - после данных,
+        None - не MP4 или атомы не найдены
+    """
+    try:
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                size, kind = struct.unpack(">I4s", header)
+                header_len = 8
+                if size == 1:
+                    # 64-битный размер атома
+                    size = struct.unpack(">Q", f.read(8))[0]
+                    header_len = 16
+                if kind == b"moov":
+                    return True
+                if kind == b"mdat":
+                    return False
+                if size < header_len:
+                    # size == 0: атом до конца файла
+                    return None
+                f.seek(size - header_len, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+async def faststart(path: Path) -> bool:
+    """Переносит moov в начало файла без перекодирования (remux на месте).
+
+    Returns:
+        True, если файл был перепакован
+    """
+    if path.suffix.lower() not in FASTSTART_EXTENSIONS or moov_before_mdat(path) is not False:
+        return False
+    tmp_path = path.with_name(f"{path.stem}.faststart{path.suffix}")
+    try:
+        await _run(FFMPEG, [
+            "-y", "-v", "error", "-i", str(path),
+            "-map", "0", "-c", "copy", "-movflags", "+faststart",
+            str(tmp_path)
+        ])
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, path)
+    return True
+
+
+async def make_thumbnail(path: Path, duration: Optional[float] = None) -> Optional[Path]:
+    """Превью из кадра видео (JPEG рядом с файлом).
+
+    Кадр берётся на 10% длительности (не больше 3 сек) - первый кадр часто чёрный.
+    """
+    thumb_path = path.with_name(f"{path.stem}.thumb.jpg")
+    offset = min(3.0, duration * 0.1) if duration else 0
+    try:
+        await _run(FFMPEG, [
+            "-y", "-v", "error", "-ss", f"{offset:.2f}", "-i", str(path),
+            "-frames:v", "1",
+            "-vf", f"scale={THUMBNAIL_SIZE}:{THUMBNAIL_SIZE}:force_original_aspect_ratio=decrease",
+            "-q:v", "5",
+            str(thumb_path)
+        ])
+    except FFmpegError as e:
+        logger.warning(f"Thumbnail failed for {path.name}: {e}")
+        return None
+    return thumb_path if thumb_path.exists() else None
+
+
+async def prepare_video(path: Path) -> Dict[str, Any]:
+    """Faststart, метаданные и превью видео для отправки.
+
+    Returns:
+        {"width", "height", "duration", "thumbnail"} - известные значения
+    """
+    if await faststart(path):
+        logger.info(f"Remuxed {path.name} with faststart")
+    meta = await probe_video(path)
+    thumbnail = await make_thumbnail(path, meta.get("duration"))
+    if thumbnail is not None:
+        meta["thumbnail"] = str(thumbnail)
+    return meta
+
+
+async def fit_video(source: Path, target_bytes: int,
+                    duration: Optional[float] = None) -> Optional[Path]:
+    """Пережимает видео так, чтобы файл уложился в target_bytes.
+
+    Однопроходное кодирование может промахнуться по размеру - тогда одна
+    повторная попытка с битрейтом, уменьшенным пропорционально промаху.
+
+    Args:
+        source: Исходное видео
+        target_bytes: Бюджет размера файла
+        duration: Длительность (если известна из метаданных)
+
+    Returns:
+        Путь к пережатому файлу (рядом с исходным) или None, если уложиться не удалось
+
+    Raises:
+        FFmpegError: ffmpeg завершился с ошибкой
+    """
+    duration = duration or await probe_duration(source)
+    plan = plan_bitrate(duration or 0, target_bytes)
+    if plan is None:
+        logger.info(f"Cannot fit {source.name} ({duration}s) into {target_bytes} bytes")
+        return None
+
+    video_bitrate, max_height = plan
+    output = source.with_name(f"{source.stem}.fit.mp4")
+    for attempt in range(2):
+        logger.info(f"Transcoding {source.name}: {video_bitrate // 1000} kbps, height<={max_height}")
+        try:
+            await _run(FFMPEG, transcode_args(source, output, video_bitrate, max_height))
+        except BaseException:
+            # Ошибка или отмена - недописанный файл не нужен
+            output.unlink(missing_ok=True)
+            raise
+        size = output.stat().st_size
+        if size <= target_bytes:
+            return output
+        video_bitrate = int(video_bitrate * target_bytes / size * SIZE_MARGIN)
+        if video_bitrate < MIN_VIDEO_BITRATE:
+            break
+
+    output.unlink(missing_ok=True)
+    return None
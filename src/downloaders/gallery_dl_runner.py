@@ -0,0 +1,192 @@
+"""
+gallery-dl Runner - запуск gallery-dl через asyncio subprocess
+Вывод читается потоково: элементы `-j` (и строки `-g`) передаются в колбэк
+по мере появления, поэтому загрузка фото начинается до завершения процесса.
+Процесс убивается по таймауту и при отмене задачи - поток пула не занят
+"""
+import asyncio
+import codecs
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Sequence
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+GALLERY_DL = "gallery-dl"
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class GalleryDlTimeout(Exception):
+    """gallery-dl не завершился за отведённое время (процесс убит)"""
+
+    def __init__(self, timeout: float, stderr: str = ""):
+        self.timeout = timeout
+        self.stderr = stderr
+        super().__init__(f"gallery-dl timeout after {timeout:.0f}s")
+
+
+@dataclass
+class GalleryDlResult:
+    """Результат запуска gallery-dl"""
+    returncode: int
+    stderr: str = ""
+    items: List[Any] = field(default_factory=list)  # JSON-элементы (-j) или строки (-g)
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and bool(self.items)
+
+
+class JsonArrayStreamParser:
+    """Инкрементальный разбор JSON-массива верхнего уровня.
+
+    Возвращает элементы массива по мере того, как они полностью прочитаны,
+    не дожидаясь закрывающей скобки.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._started = False
+        self._finished = False
+
+    def feed(self, text: str) -> List[Any]:
+        """Добавляет кусок текста и возвращает завершённые элементы.
+
+        Raises:
+            json.JSONDecodeError: Вывод не является JSON-массивом
+        """
+        self._buffer += text
+        items = []
+        pos = 0
+        buf = self._buffer
+
+        while not self._finished:
+            # Пропускаем пробелы и разделители между элементами
+            while pos < len(buf) and (buf[pos].isspace() or (self._started and buf[pos] == ",")):
+                pos += 1
+            if pos >= len(buf):
+                break
+
+            if not self._started:
+                if buf[pos] != "[":
+                    raise json.JSONDecodeError("Expected JSON array", buf, pos)
+                self._started = True
+                pos += 1
+                continue
+
+            if buf[pos] == "]":
+                self._finished = True
+                pos += 1
+                break
+
+            try:
+                item, end = self._decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Элемент ещё не дочитан - ждём следующий кусок
+                break
+            if end == len(buf) and not isinstance(item, (list, dict)):
+                # Число/литерал на границе куска может продолжиться
+                break
+            items.append(item)
+            pos = end
+
+        self._buffer = buf[pos:]
+        return items
+
+    def close(self) -> None:
+        """Проверяет, что массив был прочитан целиком"""
+        if self._started and not self._finished:
+            raise json.JSONDecodeError("Unterminated JSON array", self._buffer, len(self._buffer))
+
+
+async def run_gallery_dl(args: Sequence[str], timeout: float,
+                         on_item: Optional[Callable[[Any], None]] = None,
+                         json_output: bool = True) -> GalleryDlResult:
+    """Запускает gallery-dl и потоково разбирает его вывод.
+
+    Args:
+        args: Аргументы gallery-dl (без имени программы), например ["-j", url]
+        timeout: Максимальное время работы процесса в секундах
+        on_item: Вызывается для каждого JSON-элемента (или строки при -g)
+        json_output: Разбирать stdout как JSON-массив (-j) или построчно (-g)
+
+    Returns:
+        GalleryDlResult с кодом возврата, stderr и всеми элементами
+
+    Raises:
+        GalleryDlTimeout: Процесс не уложился в timeout
+        json.JSONDecodeError: Некорректный JSON при json_output
+    """
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+
+    # Без буферизации stdout Python-процесса элементы приходят сразу
+    env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+    proc = await asyncio.create_subprocess_exec(
+        GALLERY_DL, *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=env,
+    )
+    # stderr читаем параллельно, чтобы процесс не завис на заполненном pipe
+    stderr_task = asyncio.ensure_future(proc.stderr.read())
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parser = JsonArrayStreamParser() if json_output else None
+    pending_line = ""
+    result = GalleryDlResult(returncode=-1)
+
+    def emit(item: Any) -> None:
+        result.items.append(item)
+        if on_item is not None:
+            on_item(item)
+
+    def emit_lines(text: str, final: bool = False) -> None:
+        nonlocal pending_line
+        lines = (pending_line + text).split("\n")
+        pending_line = "" if final else lines.pop()
+        for line in lines:
+            line = line.strip()
+            if line:
+                emit(line)
+
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            chunk = await asyncio.wait_for(proc.stdout.read(READ_CHUNK_SIZE), remaining)
+            text = decoder.decode(chunk, final=not chunk)
+            if parser is not None:
+                for item in parser.feed(text):
+                    emit(item)
+            else:
+                emit_lines(text, final=not chunk)
+            if not chunk:
+                break
+
+        remaining = max(deadline - loop.time(), 0.1)
+        result.returncode = await asyncio.wait_for(proc.wait(), remaining)
+        result.stderr = (await stderr_task).decode("utf-8", errors="replace")
+
+        if parser is not None and result.returncode == 0:
+            parser.close()
+        return result
+
+    except asyncio.TimeoutError:
+        logger.warning(f"gallery-dl killed after {timeout:.0f}s timeout")
+        raise GalleryDlTimeout(timeout)
+
+    finally:
+        # Таймаут, отмена задачи или ошибка разбора - процесс больше не нужен
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+        if not stderr_task.done():
+            stderr_task.cancel()
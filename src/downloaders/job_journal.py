@@ -0,0 +1,148 @@
+"""
+Download Job Journal - журнал незавершённых загрузок
+Каждая загрузка с ключом контента пишет в директорию, зависящую только от
+ключа, и записывается в журнал на время работы. Повторная попытка (и запуск
+бота после перезапуска) находит там .part-файлы yt-dlp и докачивает их,
+а не начинает с нуля
+"""
+import hashlib
+import json
+import os
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from src.utils.logger import get_logger
+from src.config import config
+
+logger = get_logger(__name__)
+
+# Префикс директорий, которые переживают неудачную попытку
+RESUMABLE_DIR_PREFIX = "job_"
+
+
+def resumable_dir_name(key: str) -> str:
+    """Имя директории загрузки для ключа контента"""
+    return RESUMABLE_DIR_PREFIX + hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+
+def is_resumable_dir(path: Path) -> bool:
+    return path.name.startswith(RESUMABLE_DIR_PREFIX)
+
+
+def is_partial_file(path: Path) -> bool:
+    """Недокачанный файл yt-dlp: .part, фрагменты .part-FragN, состояние .ytdl"""
+    return ".part" in path.name or path.suffix == ".ytdl"
+
+
+def partial_bytes(job_dir: Path) -> int:
+    """Объём недокачанных данных в директории загрузки"""
+    if not job_dir.is_dir():
+        return 0
+    total = 0
+    for path in job_dir.iterdir():
+        if path.is_file() and is_partial_file(path):
+            try:
+                total += path.stat().st_size
+            except OSError:
+                pass
+    return total
+
+
+class DownloadJournal:
+    """Персистентный журнал выполняющихся загрузок"""
+
+    def __init__(self, path: Path, max_age: int):
+        """Инициализация журнала.
+
+        Args:
+            path: Путь к JSON-файлу журнала
+            max_age: Загрузки старше (сек) после перезапуска не возобновляются
+        """
+        self.path = path
+        self.max_age = max_age
+        self._jobs: Dict[str, Dict[str, Any]] = self._load()
+
+        # Статистика
+        self.resumed_jobs = 0
+        self.resumed_bytes = 0  # Не скачивались повторно благодаря .part
+        self.wasted_bytes = 0  # Недокачанные данные, которые пришлось выбросить
+        self.restored_jobs = 0  # Возобновлены после перезапуска
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading download journal: {e}")
+        return {}
+
+    def _save(self) -> None:
+        try:
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._jobs, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving download journal: {e}")
+
+    def start(self, key: Optional[str], job: Optional[Dict[str, Any]]) -> None:
+        """Записывает загрузку в журнал.
+
+        Args:
+            key: Ключ контента
+            job: Как повторить загрузку: {"kind": ..., аргументы}
+        """
+        if not key or not job:
+            return
+        self._jobs[key] = {**job, "started": time.time()}
+        self._save()
+
+    def finish(self, key: Optional[str]) -> None:
+        """Загрузка завершилась (успешно или окончательно с ошибкой)"""
+        if key and self._jobs.pop(key, None) is not None:
+            self._save()
+
+    def interrupted(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Забирает из журнала загрузки, прерванные перезапуском.
+
+        Слишком старые записи удаляются без возобновления.
+        """
+        now = time.time()
+        jobs = [(key, job) for key, job in self._jobs.items()
+                if now - job.get("started", 0) <= self.max_age]
+        if self._jobs:
+            self._jobs = {}
+            self._save()
+        return jobs
+
+    def record_resumed(self, size: int) -> None:
+        """Попытка продолжила недокачанные файлы размером size"""
+        if size <= 0:
+            return
+        self.resumed_jobs += 1
+        self.resumed_bytes += size
+        logger.info(f"Resuming download from {size} bytes of partial data")
+
+    def record_wasted(self, size: int) -> None:
+        """Недокачанные файлы размером size удалены"""
+        if size > 0:
+            self.wasted_bytes += size
+
+    def get_stats(self) -> Dict[str, int]:
+        """Статистика докачки"""
+        return {
+            "pending": len(self._jobs),
+            "resumed_jobs": self.resumed_jobs,
+            "resumed_bytes": self.resumed_bytes,
+            "wasted_bytes": self.wasted_bytes,
+            "restored_jobs": self.restored_jobs,
+        }
+
+
+# Ключ контента загрузки, выполняемой в текущей задаче
+current_job_key: ContextVar[Optional[str]] = ContextVar("current_job_key", default=None)
+
+# Singleton instance
+download_journal = DownloadJournal(config.DOWNLOAD_JOURNAL_PATH, config.DOWNLOAD_RESUME_MAX_AGE)
@@ -4,17 +4,43 @@ Media Downloader - загрузка медиа со всех платформ
 """
 import os
 import asyncio
+import json
 import random
+import shutil
 import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, List
-from dataclasses import dataclass
+from typing import Callable, Optional, Dict, List, Set, Tuple
+from dataclasses import dataclass, asdict, fields, replace
+import aiofiles
+import aiohttp
 from src.utils.logger import get_logger
 from src.config import config
 from src.utils.rate_limiter import rate_limiter
+from src.utils.circuit_breaker import CircuitOpenError, backoff_delay, circuit_breaker, is_throttle_error
+from src.utils.instagram_accounts import current_account, instagram_accounts
+from src.downloaders.download_cache import download_cache, info_cache, make_content_key
+from src.downloaders.scheduler import download_scheduler, PositionCallback
+from src.downloaders import ytdlp_worker
+from src.downloaders.gallery_dl_runner import GalleryDlTimeout, run_gallery_dl
+from src.downloaders import ffmpeg_tools
+from src.downloaders.media_store import media_store, result_paths
+from src.downloaders.blob_store import blob_store, new_hasher
+from src.database.db_manager import get_db_manager
+from src.downloaders.progress import DownloadProgress, ProgressCallback, current_progress
+from src.downloaders.deadline import DownloadTimeoutError, JobDeadline, current_deadline
+from src.downloaders.job_journal import (
+    current_job_key, download_journal, is_partial_file, is_resumable_dir,
+    partial_bytes, resumable_dir_name
+)
 
 logger = get_logger(__name__)
 
+# Полоса планировщика для ffmpeg (лимит процессов - DOWNLOAD_WORKERS["transcode"])
+TRANSCODE_LANE = "transcode"
+
 
 @dataclass
 class DownloadInfo:
@@ -36,6 +62,65 @@ class DownloadInfo:
     platform: Optional[str] = None
     is_carousel: bool = False  # Карусель из нескольких медиа
     is_too_large: bool = False  # Файл слишком большой для Telegram video
+    # Видео, подготовленные к отправке: путь -> {width, height, duration, thumbnail}
+    media_meta: Optional[Dict[str, Dict]] = None
+    # Общие копии файлов (дедупликация): путь загрузки -> путь blob-а
+    blob_paths: Optional[Dict[str, str]] = None
+
+    def shared_path(self, path: Optional[str]) -> Optional[str]:
+        """Путь, который переживёт удаление директории загрузки (для истории)"""
+        return (self.blob_paths or {}).get(path, path)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "DownloadInfo":
+        """Восстанавливает DownloadInfo из словаря (кэш, реестр file_id)"""
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+class _InFlightDownload:
+    """Загрузка, результат которой ждут один или несколько запросов"""
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class _PhotoFetchBatch:
+    """Фото, загрузка которых стартует сразу по мере получения ссылок"""
+
+    def __init__(self, downloader: "MediaDownloader"):
+        self._downloader = downloader
+        self._semaphore = asyncio.Semaphore(config.PHOTO_FETCH_CONCURRENCY)
+        self._fetches: List[Tuple[str, asyncio.Future]] = []
+        self.urls: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._fetches)
+
+    def start(self, url: str, filename: str) -> None:
+        """Запускает загрузку фото в фоне (не больше PHOTO_FETCH_CONCURRENCY сразу)"""
+        self.urls.append(url)
+        task = asyncio.ensure_future(
+            self._downloader._fetch_bounded(self._semaphore, len(self._fetches), url, filename)
+        )
+        self._fetches.append((filename, task))
+
+    async def wait(self) -> Tuple[List[str], int]:
+        """Ждёт все загрузки.
+
+        Returns:
+            (скачанные файлы в порядке ссылок, суммарный размер)
+        """
+        sizes = await asyncio.gather(*[task for _, task in self._fetches])
+        files = [filename for (filename, _), size in zip(self._fetches, sizes) if size is not None]
+        return files, sum(size for size in sizes if size is not None)
+
+    def cancel(self) -> None:
+        """Отменяет незавершённые загрузки"""
+        for _, task in self._fetches:
+            if not task.done():
+                task.cancel()
 
 
 class MediaDownloader:
@@ -65,20 +150,17 @@ class MediaDownloader:
         """Извлекает URL процитированного твита если есть"""
         try:
             import re
-            loop = asyncio.get_event_loop()
-            
+
             ydl_opts = {
                 "quiet": True,
                 "extract_flat": True,
                 "skip_download": True,
                 "no_warnings": True,
             }
-            
-            def extract():
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    return ydl.extract_info(url, download=False)
-            
-            info = await loop.run_in_executor(None, extract)
+
+            info = await self._call_platform(
+                "twitter", lambda: self._run_ydl(url, ydl_opts, download=False)
+            )
             
             if info:
                 # Twitter включает URL цитируемого твита в description
@@ -101,6 +183,7 @@ class MediaDownloader:
         "fragment_retries": 5,
         "ignoreerrors": False,
         "nocheckcertificate": True,
+        "continuedl": True,  # Докачивать .part, оставшиеся от прерванной попытки
     }
 
     YDL_OPTS_VIDEO = {
@@ -123,11 +206,517 @@ class MediaDownloader:
 
     def __init__(self):
         self._ensure_directories()
+        self.cache = download_cache
+        self.info_cache = info_cache
+        self.scheduler = download_scheduler
+        self.journal = download_journal
+        self.breaker = circuit_breaker
+        self.accounts = instagram_accounts
+        self.store = media_store
+        self.blobs = blob_store
+
+        # Ограниченный пул потоков для блокирующих вызовов yt-dlp/gallery-dl
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.DOWNLOAD_THREADS, thread_name_prefix="download"
+        )
+
+        # Опционально: yt-dlp в отдельных процессах
+        self.process_pool: Optional[ytdlp_worker.YtDlpProcessPool] = None
+        if config.YTDLP_PROCESS_POOL:
+            self.process_pool = ytdlp_worker.YtDlpProcessPool(config.YTDLP_PROCESS_WORKERS)
+
+        # Общий HTTP-клиент (keep-alive, DNS-кэш) - создаётся при первом запросе
+        self._http: Optional[aiohttp.ClientSession] = None
+        # Бот останавливается (см. begin_shutdown)
+        self.shutting_down = False
+
+        # Загрузки, которые выполняются прямо сейчас: ключ контента -> общая задача
+        self._inflight: Dict[str, "_InFlightDownload"] = {}
+        # Прогресс выполняющихся загрузок: ключ контента -> общий прогресс
+        self._progress: Dict[str, DownloadProgress] = {}
+
+        # Статистика объединения одинаковых загрузок
+        self.downloads_started = 0
+        self.downloads_coalesced = 0
+
+        # Загрузки и отправки (<полоса>:upload), остановленные по дедлайну: платформа -> количество
+        self.timeouts: Dict[str, int] = defaultdict(int)
+        # Потоки yt-dlp, которые ещё работают после отмены своей загрузки
+        self._hung_threads: Set[Future] = set()
+
+        # Пережатие видео под лимит размера
+        self.transcodes = 0
+        self.transcodes_failed = 0
+        self.transcode_saved_bytes = 0
+
+    async def _run_ydl(self, url: str, ydl_opts: dict, download: bool = True,
+                       info: Optional[dict] = None) -> Optional[dict]:
+        """Выполняет yt-dlp extract_info в пуле процессов или потоков.
+
+        Args:
+            url: Ссылка на медиа
+            ydl_opts: Опции YoutubeDL
+            download: Скачивать файлы или только извлечь информацию
+            info: Ранее извлечённый info dict (без повторного извлечения)
+
+        Returns:
+            Очищенный (pickle-совместимый) info dict или None
+        """
+        account = current_account.get()
+        if account is not None:
+            ydl_opts = dict(ydl_opts, cookiefile=str(account.cookies_file))
+        deadline = current_deadline.get()
+        if self.process_pool is not None:
+            # Хуки прогресса и отмены не передаются в другой процесс: задачу,
+            # не уложившуюся в остаток дедлайна, пул останавливает, убивая её процесс
+            try:
+                return await self.process_pool.run(
+                    url, ydl_opts, download, info,
+                    timeout=deadline.remaining() if deadline is not None else None,
+                )
+            except asyncio.TimeoutError:
+                deadline.cancel()
+                raise DownloadTimeoutError(None, deadline.timeout)
+        progress = current_progress.get()
+        if download and progress is not None:
+            ydl_opts = dict(ydl_opts, progress_hooks=[progress.ytdlp_hook])
+        if deadline is not None:
+            ydl_opts = deadline.apply(ydl_opts)
+        future = self._executor.submit(ytdlp_worker.extract_info, url, ydl_opts, download, info)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if not future.done():
+                # Поток нельзя прервать извне - он остановится на ближайшем хуке yt-dlp
+                self._hung_threads.add(future)
+                future.add_done_callback(self._hung_threads.discard)
+            raise
+
+    async def _run_ydl_with_cached_info(self, url: str, ydl_opts: dict,
+                                        video_id: Optional[str]) -> Optional[dict]:
+        """Скачивает видео YouTube, используя info dict из запроса форматов.
+
+        Если ссылки форматов в кэшированном info уже недействительны,
+        информация извлекается заново.
+        """
+        cached = self.info_cache.get(video_id)
+        if cached is not None:
+            try:
+                return await self._call_platform(
+                    "youtube", lambda: self._run_ydl(url, ydl_opts, download=True, info=cached)
+                )
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cached info for {video_id} failed, re-extracting: {str(e)[:100]}")
+                self.info_cache.pop(video_id)
+        return await self._call_platform("youtube", lambda: self._run_ydl(url, ydl_opts, download=True))
+
+    async def _call_platform(self, platform: Optional[str], factory,
+                             failure_of: Optional[Callable] = None):
+        """Выполняет запрос к платформе через circuit breaker.
+
+        Запрос к Instagram выполняется от аккаунта из пула: у аккаунта свой
+        circuit breaker, cookies берутся из current_account.
+
+        Args:
+            platform: Платформа
+            factory: Функция без аргументов, возвращающая корутину запроса
+            failure_of: Для запросов, сообщающих об ошибке результатом (gallery-dl):
+                возвращает текст ошибки или None
+
+        Raises:
+            CircuitOpenError: Платформа заблокировала бота, запрос не отправлялся
+        """
+        key = self.scheduler.lane_name(platform)
+        account = await self.accounts.acquire() if key == "instagram" else None
+        if account is not None:
+            key = account.lane
+        token = current_account.set(account)
+        try:
+            await self.breaker.acquire(key)
+            try:
+                result = await factory()
+            except BaseException as e:
+                # Отмена и таймаут тоже освобождают пробный запрос
+                self._record_result(key, account, e)
+                raise
+            self._record_result(key, account, failure_of(result) if failure_of else None)
+            return result
+        finally:
+            current_account.reset(token)
+            self.accounts.release(account)
+
+    @staticmethod
+    def _gallery_dl_failure(result) -> Optional[str]:
+        """Ошибка запуска gallery-dl для circuit breaker (failure_of)"""
+        return (result.stderr or "gallery-dl failed") if result.returncode != 0 else None
+
+    def _record_result(self, key: str, account, error) -> None:
+        """Результат запроса для circuit breaker и оценки аккаунта"""
+        if error:
+            self.breaker.record_failure(key, error)
+        else:
+            self.breaker.record_success(key)
+        self.accounts.record(account, error or None)
+
+    async def _get_http(self) -> aiohttp.ClientSession:
+        """Возвращает общий HTTP-клиент загрузчика с пулом соединений"""
+        if self._http is None or self._http.closed:
+            connector = aiohttp.TCPConnector(
+                limit=config.HTTP_CONNECTIONS_LIMIT,
+                limit_per_host=config.HTTP_CONNECTIONS_PER_HOST,
+                ttl_dns_cache=300,
+                keepalive_timeout=30,
+            )
+            self._http = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=60),
+            )
+        return self._http
+
+    async def _fetch_to_file(self, url: str, filename: str) -> int:
+        """Скачивает файл по HTTP потоково, не держа его целиком в памяти.
+
+        Args:
+            url: Прямая ссылка на файл
+            filename: Куда сохранить
+
+        Returns:
+            Размер файла в байтах
+
+        Raises:
+            Exception: HTTP-ошибка или сбой соединения (частичный файл удаляется)
+        """
+        session = await self._get_http()
+        headers = {"User-Agent": self._get_random_user_agent()}
+        progress = current_progress.get()
+        hasher = new_hasher()
+        size = 0
+        try:
+            async with session.get(url, headers=headers) as resp:
+                if resp.status != 200:
+                    raise Exception(f"HTTP {resp.status}")
+                if progress is not None:
+                    progress.add_total(resp.content_length)
+                async with aiofiles.open(filename, "wb") as f:
+                    async for chunk in resp.content.iter_chunked(config.HTTP_CHUNK_SIZE):
+                        await f.write(chunk)
+                        hasher.update(chunk)
+                        size += len(chunk)
+                        if progress is not None:
+                            progress.add_bytes(len(chunk))
+        except BaseException:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            raise
+        # Хэш посчитан при записи - дедупликации не нужно перечитывать файл
+        self.blobs.remember(filename, hasher.hexdigest())
+        return size
+
+    async def _fetch_many(self, items: List[Tuple[str, str]]) -> List[Optional[int]]:
+        """Параллельно скачивает несколько файлов (не больше PHOTO_FETCH_CONCURRENCY сразу).
+
+        Args:
+            items: Пары (url, путь к файлу)
+
+        Returns:
+            Размеры файлов в том же порядке; None для файлов, которые не скачались
+        """
+        semaphore = asyncio.Semaphore(config.PHOTO_FETCH_CONCURRENCY)
+        return await asyncio.gather(*[
+            self._fetch_bounded(semaphore, i, url, filename)
+            for i, (url, filename) in enumerate(items)
+        ])
+
+    async def _fetch_bounded(self, semaphore: asyncio.Semaphore, index: int,
+                             url: str, filename: str) -> Optional[int]:
+        """Скачивает один файл под семафором; ошибка не прерывает остальные"""
+        async with semaphore:
+            try:
+                return await self._fetch_to_file(url, filename)
+            except Exception as e:
+                logger.warning(f"Failed to download photo {index}: {e}")
+                return None
+
+    def index_store(self) -> None:
+        """Строит индекс хранилища загрузок обходом директорий (при запуске бота, один раз)"""
+        self.store.scan([*self.DOWNLOAD_DIRS.values(), self.blobs.root])
+
+    def restart_workers(self) -> None:
+        """Перезапускает процессы yt-dlp (после обновления yt-dlp)"""
+        if self.process_pool is not None:
+            self.process_pool.restart()
+
+    def begin_shutdown(self) -> None:
+        """Бот останавливается: отменённые дальше загрузки остаются в журнале"""
+        self.shutting_down = True
+
+    def shutdown(self) -> None:
+        """Останавливает пулы потоков и процессов"""
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def close(self) -> None:
+        """Закрывает HTTP-клиент и останавливает пулы"""
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        self._http = None
+        self.store.flush()
+        self.shutdown()
+
+    def _get_cached(self, cache_key: Optional[str]) -> Optional[DownloadInfo]:
+        """Возвращает результат из кэша загрузок (без обращения к сети)"""
+        data = self.cache.get(cache_key)
+        if data is None:
+            return None
+        self.store.touch(result_paths(data))
+        return DownloadInfo.from_dict(data)
+
+    def _store_cached(self, cache_key: Optional[str], result: DownloadInfo) -> None:
+        """Сохраняет успешный результат в кэш загрузок"""
+        if cache_key and result.success and result.file_path and not result.is_too_large:
+            self.cache.put(cache_key, asdict(result))
+
+    async def _cached_download(self, cache_key: Optional[str], factory,
+                               platform: Optional[str] = None,
+                               on_queued: Optional[PositionCallback] = None,
+                               low_priority: bool = False,
+                               on_progress: Optional[ProgressCallback] = None,
+                               job: Optional[Dict] = None) -> DownloadInfo:
+        """Кэш -> общая загрузка (single-flight) -> очередь платформы -> сохранение в кэш.
+
+        Args:
+            cache_key: Ключ контента (None - без кэша и объединения)
+            factory: Функция без аргументов, возвращающая корутину загрузки
+            platform: Платформа (полоса планировщика)
+            on_queued: Колбэк (позиция, ETA), если загрузка ждёт в очереди
+            low_priority: Фоновая предзагрузка (уступает очередь запросам пользователей)
+            on_progress: Колбэк прогресса загрузки (процент, скорость, ETA)
+            job: Аргументы загрузки для журнала (возобновление после перезапуска)
+
+        Returns:
+            Результат загрузки
+
+        Raises:
+            QueueFullError: Очередь платформы переполнена
+            CircuitOpenError: Платформа временно заблокировала бота
+        """
+        cached = self._get_cached(cache_key)
+        if cached:
+            return cached
+
+        # Платформа заблокировала бота надолго - не занимаем очередь
+        lane = self.scheduler.lane_name(platform)
+        self.breaker.check(lane)
+        if lane == "instagram":
+            self.accounts.check()
+
+        # Объединённые запросы подписываются на прогресс уже идущей загрузки
+        progress = self._progress.get(cache_key) if cache_key else None
+        owns_progress = progress is None
+        if owns_progress:
+            progress = DownloadProgress(self.scheduler.lane_name(platform))
+            if cache_key:
+                self._progress[cache_key] = progress
+        started = False
+
+        def finish_progress() -> None:
+            progress.finish()
+            if self._progress.get(cache_key) is progress:
+                del self._progress[cache_key]
+
+        async def run() -> DownloadInfo:
+            nonlocal started
+            started = True
+            current_progress.set(progress)
+            current_job_key.set(cache_key)
+            self.journal.start(cache_key, job)
+            try:
+                result = await self.scheduler.run(
+                    platform, lambda: self._run_with_deadline(platform, factory),
+                    on_position=on_queued, low_priority=low_priority, key=cache_key
+                )
+            except asyncio.CancelledError:
+                if not self.shutting_down:
+                    # Отменена предзагрузка или загрузка без ожидающих - возобновлять нечего
+                    self.journal.finish(cache_key)
+                # При остановке бота запись остаётся - загрузка продолжится после перезапуска
+                raise
+            except BaseException:
+                self.journal.finish(cache_key)
+                raise
+            finally:
+                finish_progress()
+            self.journal.finish(cache_key)
+            if result.success:
+                # Blob-ы - те же inode, место учитывается один раз
+                self.store.track(result_paths(asdict(result)) + list((result.blob_paths or {}).values()))
+            self._store_cached(cache_key, result)
+            return result
+
+        if not low_priority:
+            # Пользователь ждёт контент, который, возможно, уже предзагружается в фоне
+            self.scheduler.promote(cache_key)
+
+        if on_progress is not None:
+            progress.subscribe(on_progress)
+        try:
+            return await self._single_flight(cache_key, run)
+        finally:
+            if on_progress is not None:
+                progress.unsubscribe(on_progress)
+            if owns_progress and not started:
+                # Запрос присоединился к загрузке, которая уже завершалась
+                finish_progress()
+
+    async def _run_with_deadline(self, platform: Optional[str], factory) -> DownloadInfo:
+        """Выполняет загрузку не дольше DOWNLOAD_TIMEOUT.
+
+        По истечении дедлайна загрузка отменяется, yt-dlp в потоке
+        прерывается хуками, задача пула процессов - своим таймаутом, а
+        директории загрузки удаляются вместе с .part-файлами.
+        """
+        deadline = JobDeadline(config.DOWNLOAD_TIMEOUT)
+        current_deadline.set(deadline)
+        try:
+            result = await asyncio.wait_for(self._download_and_prepare(factory), deadline.timeout)
+        except asyncio.TimeoutError:
+            if deadline.remaining() > 0:
+                # Таймаут внутри загрузки, а не дедлайн
+                raise
+            deadline.cancel()
+        else:
+            # Задачу yt-dlp в пуле процессов мог остановить её таймаут (остаток дедлайна)
+            if not deadline.cancelled:
+                return result
+        for job_dir in deadline.job_dirs:
+            self._remove_job_dir(job_dir, keep_partial=False)
+        lane = self.scheduler.lane_name(platform)
+        self.timeouts[lane] += 1
+        error = DownloadTimeoutError(lane, deadline.timeout)
+        logger.warning(str(error))
+        return DownloadInfo(success=False, platform=platform, error_message=error.user_message)
+
+    async def _download_and_prepare(self, factory) -> DownloadInfo:
+        """Загрузка + подготовка видео к отправке (в пределах дедлайна)"""
+        result = await factory()
+        await self._prepare_videos(result)
+        await self._deduplicate(result)
+        return result
+
+    async def _prepare_videos(self, result: DownloadInfo) -> None:
+        """Faststart, размеры, длительность и превью скачанных видео.
+
+        Результат сохраняется в media_meta и кэшируется вместе с загрузкой.
+        Ошибка подготовки не мешает отправке файла как есть.
+        """
+        if not result.success or not result.file_path or not ffmpeg_tools.is_available():
+            return
+        media_meta = {}
+        for path in result.file_paths or [result.file_path]:
+            if not path.lower().endswith(ffmpeg_tools.VIDEO_EXTENSIONS) or not os.path.exists(path):
+                continue
+            try:
+                media_meta[path] = await ffmpeg_tools.prepare_video(Path(path))
+            except Exception as e:
+                logger.warning(f"Failed to prepare video {Path(path).name}: {e}")
+        if not media_meta:
+            return
+        result.media_meta = media_meta
+        # Remux немного меняет размер файла
+        sizes = [os.path.getsize(p) for p in result.file_paths or [result.file_path] if os.path.exists(p)]
+        result.file_size = sum(sizes)
+
+    async def _deduplicate(self, result: DownloadInfo) -> None:
+        """Заменяет повторы уже скачанного содержимого жёсткими ссылками.
+
+        Выполняется после подготовки видео: remux перезаписывает файл.
+        """
+        if not config.DEDUPLICATE_MEDIA or not result.success or not result.file_path:
+            return
+        blob_paths = {}
+        for path in result_paths(asdict(result)):
+            blob = await asyncio.to_thread(self.blobs.adopt, path)
+            if blob:
+                blob_paths[path] = blob
+        result.blob_paths = blob_paths or None
+
+    async def _single_flight(self, cache_key: Optional[str], factory) -> DownloadInfo:
+        """Объединяет одновременные загрузки одного и того же контента.
+
+        Первый запрос запускает загрузку, остальные ждут её результата.
+        Отмена одного ожидающего не прерывает загрузку для остальных.
+        """
+        if not cache_key:
+            self.downloads_started += 1
+            return await factory()
+
+        flight = self._inflight.get(cache_key)
+        coalesced = flight is not None
+        if coalesced:
+            self.downloads_coalesced += 1
+            logger.info(f"Coalesced download for {cache_key} ({flight.waiters} already waiting)")
+        else:
+            self.downloads_started += 1
+            flight = _InFlightDownload(asyncio.ensure_future(factory()))
+            self._inflight[cache_key] = flight
+            flight.task.add_done_callback(
+                lambda _task, key=cache_key, f=flight: self._inflight.pop(key, None)
+                if self._inflight.get(key) is f else None
+            )
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            # Никто больше не ждёт - загрузка не нужна
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+        # Каждый получатель получает свою копию результата
+        return replace(result) if coalesced else result
+
+    def record_upload_timeout(self, platform: Optional[str]) -> None:
+        """Учитывает отправку пользователю, не уложившуюся в дедлайн"""
+        self.timeouts[f"{self.scheduler.lane_name(platform)}:upload"] += 1
+
+    def get_stats(self) -> Dict[str, any]:
+        """Статистика загрузчика (объединение одинаковых загрузок).
+
+        Returns:
+            Словарь со статистикой
+        """
+        total = self.downloads_started + self.downloads_coalesced
+        return {
+            "downloads_started": self.downloads_started,
+            "downloads_coalesced": self.downloads_coalesced,
+            "coalesce_rate": self.downloads_coalesced / total if total else 0,
+            "in_flight": len(self._inflight),
+            "timeouts": dict(self.timeouts),
+            "hung_workers": len(self._hung_threads) + (
+                self.process_pool.hung if self.process_pool is not None else 0
+            ),
+            "transcodes": self.transcodes,
+            "transcodes_failed": self.transcodes_failed,
+            "transcode_saved_bytes": self.transcode_saved_bytes,
+        }
+
+    @staticmethod
+    def _youtube_id(url: str) -> Optional[str]:
+        """Извлекает ID видео YouTube из URL"""
+        from src.processors.url_processor import URLProcessor
+        video_id, _ = URLProcessor.extract_youtube_id(url)
+        return video_id
 
     async def get_youtube_formats(self, url: str) -> Optional[Dict]:
         """Получить доступные форматы YouTube видео"""
-        import yt_dlp
-
         try:
             ydl_opts = {
                 "quiet": True,
@@ -136,13 +725,14 @@ class MediaDownloader:
                 "skip_download": True,
             }
 
-            loop = asyncio.get_event_loop()
-
-            def extract():
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    return ydl.extract_info(url, download=False)
-
-            info = await loop.run_in_executor(None, extract)
+            # info сохраняется для последующей загрузки выбранного качества
+            video_id = self._youtube_id(url)
+            info = self.info_cache.get(video_id)
+            if info is None:
+                info = await self._call_platform(
+                    "youtube", lambda: self._run_ydl(url, ydl_opts, download=False)
+                )
+                self.info_cache.put(video_id, info)
 
             if not info:
                 return None
@@ -173,15 +763,24 @@ class MediaDownloader:
             logger.error(f"Error getting YouTube formats: {e}")
             return None
 
-    async def download_youtube_quality(self, url: str, quality: int = 360) -> DownloadInfo:
+    async def download_youtube_quality(self, url: str, quality: int = 360,
+                                       on_queued: Optional[PositionCallback] = None,
+                                       low_priority: bool = False,
+                                       on_progress: Optional[ProgressCallback] = None) -> DownloadInfo:
         """Скачать YouTube видео в указанном качестве"""
-        import yt_dlp
-
+        cache_key = make_content_key("youtube", self._youtube_id(url), f"{quality}p")
+        return await self._cached_download(
+            cache_key, lambda: self._download_youtube_quality(url, quality),
+            platform="youtube", on_queued=on_queued, low_priority=low_priority,
+            on_progress=on_progress, job={"kind": "youtube_quality", "url": url, "quality": quality}
+        )
+
+    async def _download_youtube_quality(self, url: str, quality: int) -> DownloadInfo:
         try:
             # Rate limiting для YouTube
             await rate_limiter.wait_if_needed("youtube")
 
-            output_dir = self.DOWNLOAD_DIRS["video"]
+            output_dir = self._make_job_dir("video", resumable=True)
             output_template = str(output_dir / f"%(id)s_{quality}p.%(ext)s")
 
             # Сначала пробуем mp4, потом merge видео+аудио через ffmpeg, потом best
@@ -204,39 +803,31 @@ class MediaDownloader:
                 }],
             }
 
-            loop = asyncio.get_event_loop()
-
-            def download():
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    return ydl.extract_info(url, download=True)
-
-            info = await loop.run_in_executor(None, download)
+            info = await self._run_ydl_with_cached_info(url, ydl_opts, self._youtube_id(url))
 
             if not info:
+                self._remove_job_dir(output_dir)
                 return DownloadInfo(success=False, error_message="Не удалось получить информацию о видео")
 
-            # Найти скачанный файл
-            video_id = info.get("id", "unknown")
-            possible_files = list(output_dir.glob(f"{video_id}_{quality}p.mp4"))
-
-            if not possible_files:
-                possible_files = list(output_dir.glob(f"{video_id}_{quality}p.*"))
-
-            if not possible_files:
-                possible_files = list(output_dir.glob(f"{video_id}*"))
-
+            # Итоговый файл (после склейки и конвертации) - из requested_downloads
+            possible_files = self._collect_output_paths(info, output_dir)
             if not possible_files:
+                self._remove_job_dir(output_dir)
                 return DownloadInfo(success=False, error_message="Файл не найден после загрузки")
 
-            file_path = possible_files[0]
+            mp4_files = [p for p in possible_files if p.endswith(".mp4")]
+            file_path = Path((mp4_files or possible_files)[0])
             file_size = file_path.stat().st_size
 
             # Проверка размера
             if file_size > self.MAX_FILE_SIZES["video"]:
-                file_path.unlink()
+                self._remove_job_dir(output_dir, keep_partial=False)
                 return DownloadInfo(
                     success=False,
-                    error_message=f"Видео слишком большое ({file_size // (1024*1024)} MB, максимум 50 MB)"
+                    error_message=(
+                        f"Видео слишком большое ({file_size // (1024*1024)} MB, "
+                        f"максимум {self.MAX_FILE_SIZES['video'] // (1024*1024)} MB)"
+                    )
                 )
 
             return DownloadInfo(
@@ -251,19 +842,30 @@ class MediaDownloader:
                 platform="YouTube"
             )
 
+        except CircuitOpenError as e:
+            return DownloadInfo(success=False, platform="YouTube", error_message=e.user_message)
         except Exception as e:
             logger.error(f"Error downloading YouTube {quality}p: {e}")
             return DownloadInfo(success=False, error_message=str(e))
 
-    async def download_youtube_audio(self, url: str) -> DownloadInfo:
+    async def download_youtube_audio(self, url: str,
+                                     on_queued: Optional[PositionCallback] = None,
+                                     low_priority: bool = False,
+                                     on_progress: Optional[ProgressCallback] = None) -> DownloadInfo:
         """Скачать только аудио с YouTube"""
-        import yt_dlp
-
+        cache_key = make_content_key("youtube", self._youtube_id(url), "audio")
+        return await self._cached_download(
+            cache_key, lambda: self._download_youtube_audio(url),
+            platform="youtube", on_queued=on_queued, low_priority=low_priority,
+            on_progress=on_progress, job={"kind": "youtube_audio", "url": url}
+        )
+
+    async def _download_youtube_audio(self, url: str) -> DownloadInfo:
         try:
             # Rate limiting для YouTube
             await rate_limiter.wait_if_needed("youtube")
 
-            output_dir = self.DOWNLOAD_DIRS["audio"]
+            output_dir = self._make_job_dir("audio", resumable=True)
             output_template = str(output_dir / "%(id)s.%(ext)s")
 
             ydl_opts = {
@@ -277,24 +879,18 @@ class MediaDownloader:
                 }],
             }
 
-            loop = asyncio.get_event_loop()
-
-            def download():
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    return ydl.extract_info(url, download=True)
-
-            info = await loop.run_in_executor(None, download)
+            info = await self._run_ydl_with_cached_info(url, ydl_opts, self._youtube_id(url))
 
             if not info:
+                self._remove_job_dir(output_dir)
                 return DownloadInfo(success=False, error_message="Не удалось получить информацию")
 
-            video_id = info.get("id", "unknown")
-            possible_files = list(output_dir.glob(f"{video_id}.*"))
-
+            possible_files = self._collect_output_paths(info, output_dir)
             if not possible_files:
+                self._remove_job_dir(output_dir)
                 return DownloadInfo(success=False, error_message="Аудио файл не найден")
 
-            file_path = possible_files[0]
+            file_path = Path(possible_files[0])
             file_size = file_path.stat().st_size
 
             return DownloadInfo(
@@ -307,6 +903,8 @@ class MediaDownloader:
                 platform="YouTube"
             )
 
+        except CircuitOpenError as e:
+            return DownloadInfo(success=False, platform="YouTube", error_message=e.user_message)
         except Exception as e:
             logger.error(f"Error downloading YouTube audio: {e}")
             return DownloadInfo(success=False, error_message=str(e))
@@ -326,7 +924,9 @@ class MediaDownloader:
         file_size = file_path.stat().st_size
         if file_size > max_size:
             logger.warning(f"File size {file_size} exceeds max {max_size}")
-            file_path.unlink()
+            # Большое видео нужно транскодеру (fit_video), его удалит вытеснение MediaStore
+            if not (config.TRANSCODE_OVERSIZED and content_type == "video"):
+                file_path.unlink()
             return False
         return True
 
@@ -344,7 +944,7 @@ class MediaDownloader:
         }
 
         if platform.lower() == "instagram":
-            cookies_file = self.COOKIES_DIR / "instagram_cookies.txt"
+            # cookiefile - аккаунта из пула, выбирается при запросе (_run_ydl)
             opts.update({
                 "format": "best",
                 "postprocessors": [],
@@ -352,9 +952,6 @@ class MediaDownloader:
                 "sleep_interval": 2,
                 "max_sleep_interval": 5,
             })
-            if cookies_file.exists():
-                opts["cookiefile"] = str(cookies_file)
-                logger.info("Using Instagram cookies")
         elif platform.lower() == "tiktok":
             opts.update({
                 "format": "best[ext=mp4]/best",
@@ -382,56 +979,114 @@ class MediaDownloader:
 
         return opts
 
-    async def _download_with_retry(self, url: str, ydl_opts: dict, max_retries: int = 3) -> Optional[dict]:
-        """Загрузка с повторными попытками"""
-        import yt_dlp
+    async def _download_with_retry(self, url: str, ydl_opts: dict, max_retries: int = 3,
+                                   download: bool = True, info: Optional[dict] = None,
+                                   platform: Optional[str] = None) -> Optional[dict]:
+        """Загрузка с повторными попытками.
 
+        info (уже извлечённый info dict) используется только в первой попытке -
+        повторные попытки извлекают информацию заново. После 429 пауза общая
+        для всех задач платформы (circuit breaker), после прочих ошибок -
+        экспоненциальная пауза этой задачи.
+
+        Raises:
+            CircuitOpenError: Платформа заблокировала бота
+        """
         last_error = None
         for attempt in range(max_retries):
-            try:
-                if attempt > 0:
-                    delay = (attempt + 1) * 3 + random.uniform(1, 3)
+            if attempt > 0:
+                if not is_throttle_error(last_error):
+                    delay = backoff_delay(attempt, config.RETRY_BACKOFF_BASE, config.RETRY_BACKOFF_MAX)
                     logger.info(f"Retry {attempt + 1}/{max_retries} after {delay:.1f}s delay")
                     await asyncio.sleep(delay)
-                    ydl_opts["http_headers"]["User-Agent"] = self._get_random_user_agent()
-
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    loop = asyncio.get_event_loop()
-                    info = await loop.run_in_executor(None, lambda: ydl.extract_info(url, download=True))
-                    return info
+                ydl_opts["http_headers"]["User-Agent"] = self._get_random_user_agent()
+                info = None
+                # .part прошлой попытки докачивается, а не скачивается заново
+                self.journal.record_resumed(partial_bytes(Path(ydl_opts["outtmpl"]).parent))
 
+            try:
+                return await self._call_platform(
+                    platform, lambda: self._run_ydl(url, ydl_opts, download=download, info=info)
+                )
+            except (CircuitOpenError, DownloadTimeoutError):
+                raise
             except Exception as e:
                 last_error = str(e)
                 logger.warning(f"Attempt {attempt + 1} failed: {last_error[:100]}")
 
-                if "429" in last_error or "Too Many" in last_error:
-                    await asyncio.sleep(10 + random.uniform(1, 5))
-                continue
-
         raise Exception(last_error or "Download failed after retries")
 
-    def _find_recent_file(self, directory: Path, seconds: int = 120) -> Optional[str]:
-        """Находит недавно созданный файл в директории"""
-        try:
-            for f in sorted(directory.glob("*"), key=lambda x: x.stat().st_mtime, reverse=True):
-                if f.is_file() and f.stat().st_mtime > time.time() - seconds:
-                    return str(f)
-        except Exception as e:
-            logger.error(f"Error finding recent file: {e}")
-        return None
-
-    def _find_recent_files(self, directory: Path, seconds: int = 120, count: int = 10) -> List[str]:
-        """Находит несколько недавно созданных файлов в директории"""
-        files = []
-        try:
-            for f in sorted(directory.glob("*"), key=lambda x: x.stat().st_mtime, reverse=True):
-                if f.is_file() and f.stat().st_mtime > time.time() - seconds:
-                    files.append(str(f))
-                    if len(files) >= count:
-                        break
-        except Exception as e:
-            logger.error(f"Error finding recent files: {e}")
-        return files
+    def _make_job_dir(self, content_type: str, resumable: bool = False) -> Path:
+        """Создаёт отдельную директорию для файлов одной загрузки.
+
+        Одновременные загрузки пишут в разные директории и не видят чужие файлы.
+        Для resumable-загрузки с ключом контента директория зависит только от
+        ключа (single-flight гарантирует одну загрузку на ключ) - повторная
+        попытка находит .part-файлы предыдущей и докачивает их.
+        """
+        base_dir = self.DOWNLOAD_DIRS.get(content_type, self.DOWNLOAD_DIRS["other"])
+        key = current_job_key.get() if resumable else None
+        if key:
+            job_dir = base_dir / resumable_dir_name(key)
+            self.journal.record_resumed(partial_bytes(job_dir))
+        else:
+            job_dir = base_dir / uuid.uuid4().hex
+        job_dir.mkdir(parents=True, exist_ok=True)
+        deadline = current_deadline.get()
+        if deadline is not None:
+            deadline.job_dirs.append(job_dir)
+        return job_dir
+
+    def _remove_job_dir(self, job_dir: Path, keep_partial: bool = True) -> None:
+        """Удаляет директорию неудачной загрузки.
+
+        Недокачанные файлы resumable-загрузки остаются для следующей попытки
+        (их удалит cleanup_old_files, если попытки не будет). keep_partial=False -
+        загрузка остановлена по дедлайну, её данные не нужны.
+        """
+        size = partial_bytes(job_dir)
+        if keep_partial and size and is_resumable_dir(job_dir):
+            logger.info(f"Keeping {size} bytes of partial download in {job_dir.name} for retry")
+            return
+        self.journal.record_wasted(size)
+        shutil.rmtree(job_dir, ignore_errors=True)
+        self.blobs.discard(job_dir)
+
+    @staticmethod
+    def _collect_output_paths(info: Optional[dict], job_dir: Optional[Path] = None) -> List[str]:
+        """Возвращает итоговые пути скачанных файлов.
+
+        Пути берутся из requested_downloads (yt-dlp обновляет filepath после
+        постпроцессоров), включая элементы плейлиста. Если их нет - файлы
+        ищутся только в директории этой загрузки.
+
+        Args:
+            info: Info dict yt-dlp
+            job_dir: Директория загрузки
+
+        Returns:
+            Пути существующих файлов в порядке загрузки
+        """
+        paths: List[str] = []
+
+        def visit(node):
+            if not isinstance(node, dict):
+                return
+            for item in node.get("requested_downloads") or []:
+                file_path = item.get("filepath")
+                if file_path and file_path not in paths and os.path.exists(file_path):
+                    paths.append(file_path)
+            for entry in node.get("entries") or []:
+                visit(entry)
+
+        visit(info)
+
+        if not paths and job_dir is not None and job_dir.exists():
+            paths = sorted(
+                str(f) for f in job_dir.iterdir()
+                if f.is_file() and not f.name.endswith((".part", ".ytdl", ".thumb.jpg"))
+            )
+        return paths
 
     async def download_video(self, url: str, platform: str = "unknown") -> DownloadInfo:
         try:
@@ -443,15 +1098,18 @@ class MediaDownloader:
                 return DownloadInfo(success=False, platform=platform,
                     error_message="yt-dlp не установлен")
 
-            output_template = str(self.DOWNLOAD_DIRS["video"] / "%(title).50s_%(playlist_index|0)s.%(ext)s")
+            job_dir = self._make_job_dir("video", resumable=True)
+            output_template = str(job_dir / "%(title).50s_%(playlist_index|0)s.%(ext)s")
 
             ydl_opts = self.YDL_OPTS_VIDEO.copy()
             ydl_opts["outtmpl"] = output_template
             ydl_opts.update(self._get_platform_opts(platform))
 
             try:
-                info = await self._download_with_retry(url, ydl_opts)
+                # Сначала только информация: элементы плейлиста качаются параллельно
+                info = await self._download_with_retry(url, ydl_opts, download=False, platform=platform)
             except Exception as e:
+                self._remove_job_dir(job_dir)
                 error_str = str(e)
                 # Если нет видео - пробуем скачать как фото (Twitter/X часто содержит только картинки)
                 if "No video" in error_str or "no video" in error_str.lower():
@@ -461,18 +1119,24 @@ class MediaDownloader:
                         if quote_url and quote_url != url:
                             logger.info(f"Found quote tweet, trying: {quote_url}")
                             return await self.download_video(quote_url, platform)
+                    # Пост Instagram без видео - фото через gallery-dl от аккаунта пула
+                    if platform.lower() == "instagram":
+                        logger.info("No video found, trying to download as Instagram gallery")
+                        return await self.download_instagram_gallery(url, platform)
                     # Если не quote tweet - пробуем скачать как фото
                     logger.info(f"No video found, trying to download as photo from {platform}")
                     return await self.download_twitter_photo(url, platform)
                 raise
 
             if not info:
+                self._remove_job_dir(job_dir)
                 return DownloadInfo(success=False, platform=platform,
                     error_message="Не удалось извлечь информацию о видео")
 
             # Проверяем, есть ли контент для скачивания (для VK wallposts без видео)
             entries = info.get("entries", [])
             if info.get("_type") == "playlist" and not entries:
+                self._remove_job_dir(job_dir)
                 logger.warning(f"No downloadable content in {platform} post")
                 if platform.lower() == "vk":
                     return DownloadInfo(success=False, platform=platform,
@@ -499,7 +1163,17 @@ class MediaDownloader:
             if is_playlist:
                 # Twitter с несколькими видео - обрабатываем как карусель
                 logger.info(f"Detected playlist with {n_entries} entries from {platform}")
-                downloaded_files = self._find_recent_files(self.DOWNLOAD_DIRS["video"], count=n_entries)
+
+                def entry_opts(index: int) -> dict:
+                    return dict(ydl_opts, outtmpl=str(job_dir / f"%(title).50s_{index + 1}.%(ext)s"))
+
+                semaphore = asyncio.Semaphore(config.CAROUSEL_CONCURRENCY)
+                results = await asyncio.gather(*[
+                    self._download_entry_bounded(semaphore, i, entry, entry_opts(i), platform)
+                    for i, entry in enumerate(entries)
+                ])
+                # Порядок файлов совпадает с порядком элементов в посте
+                downloaded_files = [path for paths in results for path in paths]
                 
                 if downloaded_files:
                     # Проверяем размер всех файлов
@@ -524,14 +1198,23 @@ class MediaDownloader:
                             comments=comments, views=views, url=post_url, platform=platform,
                             is_carousel=True)
                     else:
+                        self._remove_job_dir(job_dir, keep_partial=False)
                         return DownloadInfo(success=False, platform=platform,
-                            error_message="Все видео слишком большие (максимум 300 MB каждое)")
+                            error_message=(
+                                f"Все видео слишком большие "
+                                f"(максимум {self.MAX_FILE_SIZES['video'] // (1024*1024)} MB каждое)"
+                            ))
                 
+                self._remove_job_dir(job_dir)
                 return DownloadInfo(success=False, platform=platform,
                     error_message="Файлы не найдены после загрузки")
 
-            # Пробуем найти файл (одиночное видео)
-            filename = self._find_recent_file(self.DOWNLOAD_DIRS["video"])
+            # Одиночное видео: скачиваем по уже извлечённой информации
+            info = await self._download_with_retry(url, ydl_opts, info=info, platform=platform) or info
+
+            # Итоговый файл (одиночное видео)
+            output_files = self._collect_output_paths(info, job_dir)
+            filename = output_files[0] if output_files else None
 
             if filename and os.path.exists(filename):
                 file_size = os.path.getsize(filename)
@@ -545,9 +1228,12 @@ class MediaDownloader:
                     comments=comments, views=views, url=post_url, platform=platform,
                     is_too_large=is_too_large)
 
+            self._remove_job_dir(job_dir)
             return DownloadInfo(success=False, platform=platform,
                 error_message="Файл не найден после загрузки")
 
+        except CircuitOpenError as e:
+            return DownloadInfo(success=False, platform=platform, error_message=e.user_message)
         except Exception as e:
             logger.error(f"Error downloading video: {str(e)}")
             error_msg = str(e)[:150]
@@ -560,16 +1246,18 @@ class MediaDownloader:
             logger.info(f"Starting audio download from {platform}: {url}")
             import yt_dlp
 
-            output_template = str(self.DOWNLOAD_DIRS["audio"] / "%(title).50s_%(playlist_index|0)s.%(ext)s")
+            job_dir = self._make_job_dir("audio", resumable=True)
+            output_template = str(job_dir / "%(title).50s_%(playlist_index|0)s.%(ext)s")
             ydl_opts = self.YDL_OPTS_AUDIO.copy()
             ydl_opts["outtmpl"] = output_template
             ydl_opts.update(self._get_platform_opts(platform))
 
-            info = await self._download_with_retry(url, ydl_opts)
+            info = await self._download_with_retry(url, ydl_opts, platform=platform)
 
             if info:
                 title = info.get("title", "Unknown")
-                filename = self._find_recent_file(self.DOWNLOAD_DIRS["audio"])
+                output_files = self._collect_output_paths(info, job_dir)
+                filename = output_files[0] if output_files else None
 
                 if filename and os.path.exists(filename):
                     if self._check_file_size(Path(filename), "audio"):
@@ -580,173 +1268,150 @@ class MediaDownloader:
             return DownloadInfo(success=False, platform=platform,
                 error_message="Не удалось загрузить аудио")
 
+        except CircuitOpenError as e:
+            return DownloadInfo(success=False, platform=platform, error_message=e.user_message)
         except Exception as e:
             return DownloadInfo(success=False, platform=platform,
                 error_message=f"Ошибка: {str(e)[:100]}")
 
+    @staticmethod
+    def _merge_meta(meta: Dict, values: Dict) -> None:
+        """Дополняет метаданные поста: уже найденные значения не перезаписываются"""
+        for key, value in values.items():
+            if value is not None and meta.get(key) in (None, ""):
+                meta[key] = value
+
     async def download_twitter_photo(self, url: str, platform: str = "unknown") -> DownloadInfo:
         """Скачивает фото из Twitter/X твита используя gallery-dl"""
+        batch = _PhotoFetchBatch(self)
         try:
             # Rate limiting для Twitter
             await rate_limiter.wait_if_needed("twitter")
 
             logger.info(f"Starting Twitter photo download: {url}")
-            import subprocess
-            import aiohttp
-            import json
 
-            loop = asyncio.get_event_loop()
+            meta: Dict = {}
+            job_dir = self._make_job_dir("photo")
+
+            def add_photo(photo_url: str) -> None:
+                # Фото начинает качаться сразу, не дожидаясь завершения gallery-dl
+                if photo_url in batch.urls:
+                    return
+                description = meta.get("description") or ""
+                safe_title = "".join(c for c in description[:40] if c.isalnum() or c in " -_").strip() or "twitter"
+                ext = "png" if "format=png" in photo_url else "jpg"
+                batch.start(photo_url, str(job_dir / f"{safe_title}_{len(batch)}.{ext}"))
+
+            def add_meta(data: Dict) -> None:
+                user = data.get("user", {})
+                self._merge_meta(meta, {
+                    "description": data.get("content", ""),
+                    "author": user.get("name", ""),
+                    "author_name": user.get("nick", ""),
+                    "likes": data.get("favorite_count"),
+                    "comments": data.get("reply_count"),
+                    "views": data.get("view_count"),
+                })
+
+            def on_json_item(item) -> None:
+                if not isinstance(item, list) or len(item) < 2:
+                    return
+                # Элемент с URL изображения (тип 3), метаданные в item[2]
+                if item[0] == 3 and isinstance(item[1], str):
+                    if len(item) > 2 and isinstance(item[2], dict):
+                        add_meta(item[2])
+                    if "pbs.twimg.com" in item[1]:
+                        add_photo(item[1])
+                # Элемент с метаданными (тип 2)
+                elif item[0] == 2 and isinstance(item[1], dict):
+                    add_meta(item[1])
+
+            def on_url_line(line: str) -> None:
+                if "pbs.twimg.com" in line:
+                    first_url = line.split("|")[0].strip()
+                    if first_url:
+                        add_photo(first_url)
 
             # Используем gallery-dl -j для получения полных метаданных и URL
-            result = await loop.run_in_executor(
-                None,
-                lambda: subprocess.run(
-                    ["gallery-dl", "-j", url],
-                    capture_output=True, text=True, timeout=30
+            try:
+                await self._call_platform(
+                    platform,
+                    lambda: run_gallery_dl(["-j"] + self.accounts.cookie_args() + [url],
+                                           timeout=30, on_item=on_json_item),
+                    failure_of=self._gallery_dl_failure,
                 )
-            )
-
-            title = ""
-            description = ""
-            author = ""
-            author_name = ""
-            likes = None
-            comments = None
-            views = None
-            post_url = url
-            photo_urls = []
-
-            if result.returncode == 0 and result.stdout.strip():
-                try:
-                    data = json.loads(result.stdout)
-                    for item in data:
-                        if isinstance(item, list) and len(item) > 1:
-                            # Элемент с URL изображения (тип 3)
-                            if item[0] == 3 and isinstance(item[1], str):
-                                if "pbs.twimg.com" in item[1]:
-                                    photo_urls.append(item[1])
-                                # Метаданные в item[2]
-                                if len(item) > 2 and isinstance(item[2], dict):
-                                    meta = item[2]
-                                    if not description:
-                                        description = meta.get("content", "")
-                                    if not author:
-                                        author = meta.get("user", {}).get("name", "")
-                                    if not author_name:
-                                        author_name = meta.get("user", {}).get("nick", "")
-                                    if likes is None:
-                                        likes = meta.get("favorite_count")
-                                    if comments is None:
-                                        comments = meta.get("reply_count")
-                                    if views is None:
-                                        views = meta.get("view_count")
-                            # Элемент с метаданными (тип 2)
-                            elif item[0] == 2 and isinstance(item[1], dict):
-                                meta = item[1]
-                                if not description:
-                                    description = meta.get("content", "")
-                                if not author:
-                                    author = meta.get("user", {}).get("name", "")
-                                if not author_name:
-                                    author_name = meta.get("user", {}).get("nick", "")
-                                if likes is None:
-                                    likes = meta.get("favorite_count")
-                                if comments is None:
-                                    comments = meta.get("reply_count")
-                                if views is None:
-                                    views = meta.get("view_count")
-                except json.JSONDecodeError:
-                    logger.warning("Failed to parse gallery-dl JSON output")
+            except json.JSONDecodeError:
+                logger.warning("Failed to parse gallery-dl JSON output")
 
             # Если JSON не сработал, пробуем обычный режим gallery-dl -g
-            if not photo_urls:
-                result = await loop.run_in_executor(
-                    None,
-                    lambda: subprocess.run(
-                        ["gallery-dl", "-g", url],
-                        capture_output=True, text=True, timeout=30
-                    )
+            if not batch:
+                await self._call_platform(
+                    platform,
+                    lambda: run_gallery_dl(["-g"] + self.accounts.cookie_args() + [url],
+                                           timeout=30, on_item=on_url_line, json_output=False),
+                    failure_of=self._gallery_dl_failure,
                 )
-                if result.returncode == 0:
-                    for line in result.stdout.strip().split("\n"):
-                        line = line.strip()
-                        if line and "pbs.twimg.com" in line:
-                            first_url = line.split("|")[0].strip()
-                            if first_url and first_url not in photo_urls:
-                                photo_urls.append(first_url)
 
             # Не ограничиваем описание здесь - url_handler сам решит, как отправить
+            description = meta.get("description") or ""
             title = (description[:50] + "...") if description else "Twitter"
 
-            if not photo_urls:
+            if not batch:
+                self._remove_job_dir(job_dir)
                 return DownloadInfo(success=False, platform=platform,
                     error_message="Не найдены изображения в твите")
 
-            logger.info(f"Found {len(photo_urls)} images in tweet")
-
-            downloaded_files = []
-            total_size = 0
-            safe_title = "".join(c for c in str(title)[:40] if c.isalnum() or c in " -_").strip() or "twitter"
-
-            async with aiohttp.ClientSession() as session:
-                headers = {"User-Agent": self._get_random_user_agent()}
-                for i, photo_url in enumerate(photo_urls):
-                    try:
-                        async with session.get(photo_url, headers=headers) as resp:
-                            if resp.status == 200:
-                                content = await resp.read()
-                                ext = "jpg"
-                                if "format=png" in photo_url:
-                                    ext = "png"
-                                filename = str(self.DOWNLOAD_DIRS["photo"] / f"{safe_title}_{i}.{ext}")
-                                with open(filename, "wb") as f:
-                                    f.write(content)
-                                downloaded_files.append(filename)
-                                total_size += len(content)
-                                logger.info(f"Twitter photo {i} downloaded: {filename}")
-                    except Exception as e:
-                        logger.warning(f"Failed to download photo {i}: {e}")
+            logger.info(f"Found {len(batch)} images in tweet")
+
+            downloaded_files, total_size = await batch.wait()
+            logger.info(f"Twitter photos downloaded: {len(downloaded_files)}/{len(batch)}")
 
             if downloaded_files:
                 if len(downloaded_files) == 1:
                     return DownloadInfo(
                         success=True, file_path=downloaded_files[0], file_size=total_size,
-                        title=title, description=description, author=author,
-                        author_name=author_name, likes=likes, comments=comments,
-                        views=views, url=post_url, platform=platform)
+                        title=title, description=description, author=meta.get("author", ""),
+                        author_name=meta.get("author_name", ""), likes=meta.get("likes"),
+                        comments=meta.get("comments"), views=meta.get("views"),
+                        url=url, platform=platform)
                 else:
                     # Несколько фото - как карусель
                     return DownloadInfo(
                         success=True, file_path=downloaded_files[0], file_paths=downloaded_files,
                         file_size=total_size, title=title, description=description,
-                        author=author, author_name=author_name, likes=likes,
-                        comments=comments, views=views, url=post_url,
+                        author=meta.get("author", ""), author_name=meta.get("author_name", ""),
+                        likes=meta.get("likes"), comments=meta.get("comments"),
+                        views=meta.get("views"), url=url,
                         platform=platform, is_carousel=True)
 
+            self._remove_job_dir(job_dir)
             return DownloadInfo(success=False, platform=platform,
                 error_message="Не удалось скачать изображения")
 
+        except CircuitOpenError as e:
+            self._remove_job_dir(job_dir)
+            return DownloadInfo(success=False, platform=platform, error_message=e.user_message)
         except Exception as e:
             logger.error(f"Error downloading Twitter photo: {str(e)}")
             return DownloadInfo(success=False, platform=platform,
                 error_message=f"Ошибка: {str(e)[:100]}")
+        finally:
+            # Таймаут или отмена - недокачанные фото больше не нужны
+            batch.cancel()
 
     async def download_photo(self, url: str, platform: str = "unknown") -> DownloadInfo:
         """Загружает фото - для Instagram скачивает через thumbnail"""
         try:
             logger.info(f"Starting photo download from {platform}: {url}")
-            import yt_dlp
-            import aiohttp
 
             # Получаем информацию о посте
             ydl_opts = self.YDL_OPTS_BASE.copy()
             ydl_opts.update(self._get_platform_opts(platform))
             ydl_opts["ignore_no_formats_error"] = True  # Игнорируем ошибку "no video"
 
-            loop = asyncio.get_event_loop()
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = await loop.run_in_executor(None, lambda: ydl.extract_info(url, download=False))
+            info = await self._call_platform(
+                platform, lambda: self._run_ydl(url, ydl_opts, download=False)
+            )
 
             if not info:
                 return DownloadInfo(success=False, platform=platform,
@@ -779,19 +1444,14 @@ class MediaDownloader:
 
             # Скачиваем фото напрямую
             safe_title = "".join(c for c in title[:50] if c.isalnum() or c in " -_").strip()
-            filename = str(self.DOWNLOAD_DIRS["photo"] / f"{safe_title}.jpg")
-
-            async with aiohttp.ClientSession() as session:
-                headers = {"User-Agent": self._get_random_user_agent()}
-                async with session.get(photo_url, headers=headers) as resp:
-                    if resp.status == 200:
-                        content = await resp.read()
-                        with open(filename, "wb") as f:
-                            f.write(content)
-                        logger.info(f"Photo downloaded: {filename}")
-                    else:
-                        return DownloadInfo(success=False, platform=platform,
-                            error_message=f"Ошибка загрузки фото: HTTP {resp.status}")
+            filename = str(self._make_job_dir("photo") / f"{safe_title or 'photo'}.jpg")
+
+            try:
+                await self._fetch_to_file(photo_url, filename)
+                logger.info(f"Photo downloaded: {filename}")
+            except Exception as e:
+                return DownloadInfo(success=False, platform=platform,
+                    error_message=f"Ошибка загрузки фото: {e}")
 
             if os.path.exists(filename):
                 file_size = os.path.getsize(filename)
@@ -803,6 +1463,8 @@ class MediaDownloader:
             return DownloadInfo(success=False, platform=platform,
                 error_message="Файл не сохранён")
 
+        except CircuitOpenError as e:
+            return DownloadInfo(success=False, platform=platform, error_message=e.user_message)
         except Exception as e:
             logger.error(f"Error downloading photo: {str(e)}")
             return DownloadInfo(success=False, platform=platform,
@@ -810,41 +1472,68 @@ class MediaDownloader:
 
     async def download_instagram_gallery(self, url: str, platform: str = "instagram") -> DownloadInfo:
         """Скачивает Instagram пост (фото/карусель) через gallery-dl с cookies"""
+        batch = _PhotoFetchBatch(self)
         try:
-            # Применяем rate limiting для Instagram
-            wait_time = await rate_limiter.wait_if_needed("instagram")
-            if wait_time > 0:
-                logger.info(f"Rate limited Instagram download by {wait_time:.1f}s")
-
+            # Rate limiting - по аккаунту пула (_call_platform)
             logger.info(f"Starting Instagram gallery download: {url}")
-            import subprocess
-            import aiohttp
-            import json
 
-            loop = asyncio.get_event_loop()
-            cookies_file = self.COOKIES_DIR / "instagram_cookies.txt"
-
-            if not cookies_file.exists():
-                logger.warning("Instagram cookies not found, trying without auth")
-                cookies_arg = []
-            else:
-                cookies_arg = ["--cookies", str(cookies_file)]
+            meta: Dict = {}
+            job_dir = self._make_job_dir("photo")
+
+            def add_meta(data: Dict, full: bool) -> None:
+                values = {
+                    "description": data.get("description", ""),
+                    "author": data.get("username", ""),
+                    "author_name": data.get("fullname", ""),
+                    "likes": data.get("likes"),
+                }
+                if full:
+                    values["comments"] = data.get("comments")
+                    values["post_url"] = data.get("post_url")
+                self._merge_meta(meta, values)
+
+            def on_json_item(item) -> None:
+                if not isinstance(item, list) or len(item) < 2:
+                    return
+                # Метаданные поста (тип 2)
+                if item[0] == 2 and isinstance(item[1], dict):
+                    add_meta(item[1], full=True)
+
+                # URL изображения (тип 3)
+                elif item[0] == 3 and isinstance(item[1], str):
+                    if len(item) > 2 and isinstance(item[2], dict):
+                        add_meta(item[2], full=False)
+                    img_url = item[1]
+                    # Только URL изображений из поста (cdninstagram.com, исключаем profile pic)
+                    if "cdninstagram.com" in img_url and "/v/t51" in img_url:
+                        # Слайд начинает качаться сразу, пока gallery-dl читает остальные
+                        author = meta.get("author") or ""
+                        safe_title = "".join(c for c in author[:30] if c.isalnum() or c in " -_").strip() or "instagram"
+                        batch.start(img_url, str(job_dir / f"{safe_title}_{len(batch)}.jpg"))
 
             # Используем gallery-dl -j для получения JSON с метаданными и URL
-            cmd = ["gallery-dl", "-j"] + cookies_arg + [url]
-
             try:
-                result = await loop.run_in_executor(
-                    None,
-                    lambda: subprocess.run(cmd, capture_output=True, text=True, timeout=180)
+                result = await self._call_platform(
+                    "instagram",
+                    lambda: run_gallery_dl(["-j"] + self.accounts.cookie_args() + [url],
+                                           timeout=180, on_item=on_json_item),
+                    failure_of=self._gallery_dl_failure,
                 )
-            except subprocess.TimeoutExpired:
+            except GalleryDlTimeout:
                 logger.error("gallery-dl timeout (likely Instagram rate limit)")
+                self._remove_job_dir(job_dir)
                 return DownloadInfo(success=False, platform=platform,
                     error_message="Instagram временно ограничил доступ. Попробуйте через несколько минут.")
+            except json.JSONDecodeError as e:
+                logger.error(f"Failed to parse gallery-dl JSON: {e}")
+                self._remove_job_dir(job_dir)
+                return DownloadInfo(success=False, platform=platform,
+                    error_message="Ошибка парсинга данных Instagram")
 
-            if result.returncode != 0 or not result.stdout.strip():
-                stderr = result.stderr if hasattr(result, 'stderr') else ""
+            if result.returncode != 0 or not result.items:
+                batch.cancel()
+                self._remove_job_dir(job_dir)
+                stderr = result.stderr
                 # Проверяем на rate limit
                 if "429" in stderr or "Too Many Requests" in stderr or "Waiting until" in stderr:
                     return DownloadInfo(success=False, platform=platform,
@@ -854,84 +1543,15 @@ class MediaDownloader:
                 return DownloadInfo(success=False, platform=platform,
                     error_message="Не удалось получить информацию о посте Instagram")
 
-            # Парсим JSON
-            description = ""
-            author = ""
-            author_name = ""
-            likes = None
-            comments = None
-            post_url = url
-            photo_urls = []
-
-            try:
-                data = json.loads(result.stdout)
-                for item in data:
-                    if isinstance(item, list) and len(item) > 1:
-                        # Метаданные поста (тип 2)
-                        if item[0] == 2 and isinstance(item[1], dict):
-                            meta = item[1]
-                            if not description:
-                                description = meta.get("description", "")
-                            if not author:
-                                author = meta.get("username", "")
-                            if not author_name:
-                                author_name = meta.get("fullname", "")
-                            if likes is None:
-                                likes = meta.get("likes")
-                            if comments is None:
-                                comments = meta.get("comments")
-                            if not post_url or post_url == url:
-                                post_url = meta.get("post_url", url)
-
-                        # URL изображения (тип 3)
-                        elif item[0] == 3 and isinstance(item[1], str):
-                            img_url = item[1]
-                            # Только URL изображений из поста (cdninstagram.com, исключаем profile pic)
-                            if "cdninstagram.com" in img_url and "/v/t51" in img_url:
-                                photo_urls.append(img_url)
-                            # Метаданные в item[2]
-                            if len(item) > 2 and isinstance(item[2], dict):
-                                meta = item[2]
-                                if not description:
-                                    description = meta.get("description", "")
-                                if not author:
-                                    author = meta.get("username", "")
-                                if not author_name:
-                                    author_name = meta.get("fullname", "")
-                                if likes is None:
-                                    likes = meta.get("likes")
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse gallery-dl JSON: {e}")
-                return DownloadInfo(success=False, platform=platform,
-                    error_message="Ошибка парсинга данных Instagram")
-
-            if not photo_urls:
+            if not batch:
+                self._remove_job_dir(job_dir)
                 return DownloadInfo(success=False, platform=platform,
                     error_message="Не найдены изображения в посте")
 
-            logger.info(f"Found {len(photo_urls)} images in Instagram post")
-
-            # Скачиваем фото
-            downloaded_files = []
-            total_size = 0
-            safe_title = "".join(c for c in str(author)[:30] if c.isalnum() or c in " -_").strip() or "instagram"
-
-            async with aiohttp.ClientSession() as session:
-                headers = {"User-Agent": self._get_random_user_agent()}
-                for i, photo_url in enumerate(photo_urls):
-                    try:
-                        async with session.get(photo_url, headers=headers) as resp:
-                            if resp.status == 200:
-                                content = await resp.read()
-                                ext = "jpg"
-                                filename = str(self.DOWNLOAD_DIRS["photo"] / f"{safe_title}_{i}.{ext}")
-                                with open(filename, "wb") as f:
-                                    f.write(content)
-                                downloaded_files.append(filename)
-                                total_size += len(content)
-                                logger.info(f"Instagram photo {i} downloaded: {filename}")
-                    except Exception as e:
-                        logger.warning(f"Failed to download photo {i}: {e}")
+            logger.info(f"Found {len(batch)} images in Instagram post")
+
+            downloaded_files, total_size = await batch.wait()
+            logger.info(f"Instagram photos downloaded: {len(downloaded_files)}/{len(batch)}")
 
             if downloaded_files:
                 is_carousel = len(downloaded_files) > 1
@@ -940,23 +1560,103 @@ class MediaDownloader:
                     file_path=downloaded_files[0],
                     file_paths=downloaded_files if is_carousel else None,
                     file_size=total_size,
-                    description=description,
-                    author=author,
-                    author_name=author_name,
-                    likes=likes,
-                    comments=comments,
-                    url=post_url,
+                    description=meta.get("description", ""),
+                    author=meta.get("author", ""),
+                    author_name=meta.get("author_name", ""),
+                    likes=meta.get("likes"),
+                    comments=meta.get("comments"),
+                    url=meta.get("post_url") or url,
                     platform=platform,
                     is_carousel=is_carousel
                 )
 
+            self._remove_job_dir(job_dir)
             return DownloadInfo(success=False, platform=platform,
                 error_message="Не удалось скачать изображения")
 
+        except CircuitOpenError as e:
+            return DownloadInfo(success=False, platform=platform, error_message=e.user_message)
         except Exception as e:
             logger.error(f"Error downloading Instagram gallery: {str(e)}")
             return DownloadInfo(success=False, platform=platform,
                 error_message=f"Ошибка: {str(e)[:100]}")
+        finally:
+            # Таймаут или отмена - недокачанные фото больше не нужны
+            batch.cancel()
+
+    async def _download_entry(self, index: int, entry: dict, ydl_opts: dict,
+                              platform: Optional[str] = None) -> List[str]:
+        """Скачивает один элемент плейлиста/карусели.
+
+        Элемент уже извлечён вместе с постом, поэтому страница не запрашивается
+        повторно; если ссылки форматов не сработали - элемент извлекается заново.
+        Запрос идёт через _call_platform: circuit breaker, для Instagram -
+        аккаунт из пула (cookies, своя полоса и оценка аккаунта).
+
+        Returns:
+            Пути скачанных файлов (пустой список при ошибке)
+        """
+        entry_url = entry.get("webpage_url") or entry.get("url")
+
+        async def fetch() -> dict:
+            try:
+                return await self._run_ydl(entry_url, ydl_opts, download=True, info=entry)
+            except Exception as e:
+                if not entry_url:
+                    raise
+                logger.info(f"Entry {index} info is stale, re-extracting: {e}")
+                return await self._run_ydl(entry_url, ydl_opts, download=True)
+
+        try:
+            entry_info = await self._call_platform(platform, fetch)
+        except Exception as e:
+            logger.warning(f"Failed to download entry {index}: {e}")
+            return []
+
+        return [path for path in self._collect_output_paths(entry_info) if os.path.exists(path)]
+
+    async def _download_entry_bounded(self, semaphore: asyncio.Semaphore, index: int,
+                                      entry: dict, ydl_opts: dict,
+                                      platform: Optional[str] = None) -> List[str]:
+        async with semaphore:
+            return await self._download_entry(index, entry, ydl_opts, platform)
+
+    async def _download_carousel_item(self, semaphore: asyncio.Semaphore, index: int, entry: dict,
+                                      job_dir: Path, platform: str) -> Optional[Tuple[str, int]]:
+        """Скачивает один слайд карусели.
+
+        Returns:
+            (путь, размер) или None, если слайд скачать не удалось
+        """
+        title = entry.get("title", f"media_{index}")
+        safe_title = "".join(c for c in title[:40] if c.isalnum() or c in " -_").strip()
+
+        async with semaphore:
+            if entry.get("formats"):
+                # Видео - через yt-dlp
+                video_opts = self.YDL_OPTS_VIDEO.copy()
+                video_opts["outtmpl"] = str(job_dir / f"{safe_title}_{index}.%(ext)s")
+                video_opts.update(self._get_platform_opts(platform))
+
+                video_files = await self._download_entry(index, entry, video_opts, platform)
+                if not video_files:
+                    return None
+                logger.info(f"Carousel video {index} downloaded: {video_files[0]}")
+                return video_files[0], os.path.getsize(video_files[0])
+
+            # Фото - через thumbnail
+            thumbnails = entry.get("thumbnails", [])
+            photo_url = thumbnails[-1].get("url") if thumbnails else None
+            if not photo_url:
+                return None
+            filename = str(job_dir / f"{safe_title}_{index}.jpg")
+            try:
+                size = await self._fetch_to_file(photo_url, filename)
+            except Exception as e:
+                logger.warning(f"Failed to download carousel photo {index}: {e}")
+                return None
+            logger.info(f"Carousel photo {index} downloaded: {filename}")
+            return filename, size
 
     async def download_carousel(self, url: str, platform: str = "unknown") -> DownloadInfo:
         """Скачивает карусель (пост с несколькими фото/видео)"""
@@ -967,17 +1667,14 @@ class MediaDownloader:
             if platform.lower() == "instagram":
                 return await self.download_instagram_gallery(url, platform)
 
-            import yt_dlp
-            import aiohttp
 
             ydl_opts = self.YDL_OPTS_BASE.copy()
             ydl_opts.update(self._get_platform_opts(platform))
             ydl_opts["ignore_no_formats_error"] = True
 
-            loop = asyncio.get_event_loop()
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = await loop.run_in_executor(None, lambda: ydl.extract_info(url, download=False))
+            info = await self._call_platform(
+                platform, lambda: self._run_ydl(url, ydl_opts, download=False)
+            )
 
             if not info or not info.get("entries"):
                 return DownloadInfo(success=False, platform=platform,
@@ -994,50 +1691,21 @@ class MediaDownloader:
             comments = first.get("comment_count")
             post_url = info.get("webpage_url") or url
 
-            downloaded_files = []
-            total_size = 0
-
-            for i, entry in enumerate(entries):
-                has_video = len(entry.get("formats", [])) > 0
-                title = entry.get("title", f"media_{i}")
-                safe_title = "".join(c for c in title[:40] if c.isalnum() or c in " -_").strip()
-
-                if has_video:
-                    # Скачиваем видео через yt-dlp
-                    video_opts = self.YDL_OPTS_VIDEO.copy()
-                    video_opts["outtmpl"] = str(self.DOWNLOAD_DIRS["video"] / f"{safe_title}_{i}.%(ext)s")
-                    video_opts.update(self._get_platform_opts(platform))
-
-                    entry_url = entry.get("webpage_url") or entry.get("url")
-                    if entry_url:
-                        with yt_dlp.YoutubeDL(video_opts) as ydl:
-                            await loop.run_in_executor(None, lambda u=entry_url: ydl.download([u]))
-
-                        video_file = self._find_recent_file(self.DOWNLOAD_DIRS["video"], seconds=60)
-                        if video_file and os.path.exists(video_file):
-                            downloaded_files.append(("video", video_file))
-                            total_size += os.path.getsize(video_file)
-                            logger.info(f"Carousel video {i} downloaded: {video_file}")
-                else:
-                    # Скачиваем фото через thumbnail
-                    thumbnails = entry.get("thumbnails", [])
-                    if thumbnails:
-                        photo_url = thumbnails[-1].get("url")
-                        if photo_url:
-                            filename = str(self.DOWNLOAD_DIRS["photo"] / f"{safe_title}_{i}.jpg")
-                            async with aiohttp.ClientSession() as session:
-                                headers = {"User-Agent": self._get_random_user_agent()}
-                                async with session.get(photo_url, headers=headers) as resp:
-                                    if resp.status == 200:
-                                        content = await resp.read()
-                                        with open(filename, "wb") as f:
-                                            f.write(content)
-                                        downloaded_files.append(("photo", filename))
-                                        total_size += os.path.getsize(filename)
-                                        logger.info(f"Carousel photo {i} downloaded: {filename}")
-
-            if downloaded_files:
-                file_paths = [f[1] for f in downloaded_files]
+            # Фото и видео карусели - в одной директории загрузки
+            job_dir = self._make_job_dir("other")
+
+            # Элементы качаются параллельно; ошибка одного не отменяет остальные
+            semaphore = asyncio.Semaphore(config.CAROUSEL_CONCURRENCY)
+            results = await asyncio.gather(*[
+                self._download_carousel_item(semaphore, i, entry, job_dir, platform)
+                for i, entry in enumerate(entries)
+            ])
+            # Порядок файлов совпадает с порядком слайдов (для answer_media_group)
+            file_paths = [path for path, _ in filter(None, results)]
+            total_size = sum(size for _, size in filter(None, results))
+
+            if file_paths:
+                logger.info(f"Carousel downloaded: {len(file_paths)}/{len(entries)} items")
                 return DownloadInfo(
                     success=True,
                     file_path=file_paths[0],
@@ -1052,15 +1720,119 @@ class MediaDownloader:
                     is_carousel=True
                 )
 
+            self._remove_job_dir(job_dir)
             return DownloadInfo(success=False, platform=platform,
                 error_message="Не удалось скачать ни одного файла из карусели")
 
+        except CircuitOpenError as e:
+            return DownloadInfo(success=False, platform=platform, error_message=e.user_message)
         except Exception as e:
             logger.error(f"Error downloading carousel: {str(e)}")
             return DownloadInfo(success=False, platform=platform,
                 error_message=f"Ошибка: {str(e)[:100]}")
 
-    async def download(self, url: str, content_type: str = "video", platform: str = "unknown") -> DownloadInfo:
+    async def download(self, url: str, content_type: str = "video", platform: str = "unknown",
+                       post_id: Optional[str] = None,
+                       on_queued: Optional[PositionCallback] = None,
+                       on_progress: Optional[ProgressCallback] = None,
+                       low_priority: bool = False) -> DownloadInfo:
+        """Загружает медиа; повторные и одновременные запросы того же поста
+        отдаются из кэша или из уже идущей загрузки"""
+        cache_key = make_content_key(platform, post_id, content_type)
+        job = {"kind": "download", "url": url, "content_type": content_type,
+               "platform": platform, "post_id": post_id}
+        return await self._cached_download(
+            cache_key, lambda: self._download(url, content_type, platform),
+            platform=platform, on_queued=on_queued, on_progress=on_progress,
+            low_priority=low_priority, job=job
+        )
+
+    async def fit_video(self, result: DownloadInfo, cache_key: Optional[str] = None,
+                        target_bytes: Optional[int] = None,
+                        on_queued: Optional[PositionCallback] = None) -> DownloadInfo:
+        """Пережимает видео под лимит размера (по умолчанию MAX_FILE_SIZE).
+
+        ffmpeg выполняется в полосе transcode планировщика (ограниченное число
+        процессов, дедлайн DOWNLOAD_TIMEOUT). Пережатый вариант кэшируется под
+        своим ключом рядом с оригиналом.
+
+        Args:
+            result: Успешная загрузка видео
+            cache_key: Ключ контента оригинала
+            target_bytes: Бюджет размера файла
+            on_queued: Колбэк (позиция, ETA), если пережатие ждёт в очереди
+
+        Returns:
+            DownloadInfo пережатого файла или с ошибкой (оригинал не меняется)
+        """
+        target = target_bytes or config.MAX_FILE_SIZE
+        fit_key = f"{cache_key}:fit{target // (1024 * 1024)}mb" if cache_key else None
+        return await self._cached_download(
+            fit_key, lambda: self._fit_video(result, target),
+            platform=TRANSCODE_LANE, on_queued=on_queued
+        )
+
+    async def _fit_video(self, result: DownloadInfo, target_bytes: int) -> DownloadInfo:
+        source = Path(result.file_path)
+        try:
+            # Оригинал не вытесняется из кэша, пока ffmpeg его читает
+            with self.cache.pinned([str(source)]):
+                output = await ffmpeg_tools.fit_video(source, target_bytes, result.duration)
+        except Exception as e:
+            logger.error(f"Error transcoding {source.name}: {e}")
+            self.transcodes_failed += 1
+            return DownloadInfo(success=False, platform=result.platform,
+                                error_message=f"Не удалось сжать видео: {str(e)[:100]}")
+
+        if output is None:
+            self.transcodes_failed += 1
+            return DownloadInfo(success=False, platform=result.platform,
+                                error_message="Видео слишком длинное, чтобы сжать его до лимита")
+
+        size = output.stat().st_size
+        self.transcodes += 1
+        self.transcode_saved_bytes += max(0, result.file_size - size)
+        logger.info(f"Video fitted: {source.name} {result.file_size} -> {size} bytes")
+        return replace(result, file_path=str(output), file_paths=None, file_size=size,
+                       is_too_large=False, is_carousel=False, media_meta=None)
+
+    def resume_interrupted_jobs(self) -> int:
+        """Возобновляет загрузки, прерванные перезапуском бота.
+
+        Загрузки идут в фоне с низким приоритетом и докачивают свои .part;
+        результат попадает в кэш, а повторный запрос пользователя
+        присоединяется к идущей загрузке.
+
+        Returns:
+            Число возобновлённых загрузок
+        """
+        jobs = self.journal.interrupted()
+        for key, job in jobs:
+            kind = job.get("kind")
+            if kind == "download":
+                coro = self.download(job["url"], job["content_type"], job["platform"],
+                                     job["post_id"], low_priority=True)
+            elif kind == "youtube_quality":
+                coro = self.download_youtube_quality(job["url"], job["quality"], low_priority=True)
+            elif kind == "youtube_audio":
+                coro = self.download_youtube_audio(job["url"], low_priority=True)
+            else:
+                continue
+            asyncio.ensure_future(self._resume_job(key, coro))
+        self.journal.restored_jobs += len(jobs)
+        if jobs:
+            logger.info(f"Resuming {len(jobs)} interrupted downloads")
+        return len(jobs)
+
+    @staticmethod
+    async def _resume_job(key: str, coro) -> None:
+        try:
+            result = await coro
+            logger.info(f"Interrupted download {key} resumed: success={result.success}")
+        except Exception as e:
+            logger.warning(f"Failed to resume download {key}: {e}")
+
+    async def _download(self, url: str, content_type: str, platform: str) -> DownloadInfo:
         # Для Instagram постов проверяем - может быть карусель
         if platform.lower() == "instagram" and content_type in ["photo", "post", "carousel"]:
             return await self.download_carousel(url, platform)
@@ -1072,19 +1844,48 @@ class MediaDownloader:
             return await self.download_video(url, platform)
 
     def cleanup_old_files(self, days: int = 1):
-        import time
+        """Удаляет старые файлы и опустевшие директории загрузок"""
         try:
             current_time = time.time()
             threshold = current_time - (days * 24 * 60 * 60)
             for dir_path in self.DOWNLOAD_DIRS.values():
                 if not dir_path.exists():
                     continue
-                for file_path in dir_path.glob("*"):
-                    if file_path.is_file() and file_path.stat().st_mtime < threshold:
+                removed = []
+                for file_path in dir_path.rglob("*"):
+                    if (file_path.is_file() and file_path.stat().st_mtime < threshold
+                            and not self.store.is_pinned(str(file_path))):
+                        if is_partial_file(file_path):
+                            # Недокачанное так и не понадобилось
+                            self.journal.record_wasted(file_path.stat().st_size)
                         file_path.unlink()
+                        removed.append(str(file_path))
+                self.store.forget(removed)
+                for job_dir in dir_path.iterdir():
+                    # Свежая пустая директория может принадлежать идущей загрузке
+                    if (job_dir.is_dir() and job_dir.stat().st_mtime < threshold
+                            and not any(job_dir.iterdir())):
+                        job_dir.rmdir()
         except Exception as e:
             logger.error(f"Error cleaning up: {str(e)}")
 
+    async def sweep_blobs(self) -> int:
+        """Удаляет blob-ы без файлов загрузок.
+
+        Blob-ы, на которые ссылается история (повторная отправка), остаются -
+        их срок жизни определяет бюджет MediaStore (LRU), как у остальных файлов.
+
+        Returns:
+            Число удалённых blob-ов
+        """
+        db = get_db_manager()
+        referenced = set(await db.get_history_file_paths(str(self.blobs.root))) if db else set()
+        removed = await asyncio.to_thread(
+            self.blobs.sweep, lambda path: path in referenced or self.store.is_pinned(path)
+        )
+        self.store.forget(removed)
+        return len(removed)
+
 
 # Singleton instance
 media_downloader = MediaDownloader()
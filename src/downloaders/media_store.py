@@ -0,0 +1,318 @@
+"""
+Media Store - учёт файлов загрузок на диске с бюджетом по размеру
+Каждый готовый файл записывается в индекс (размер, последнее обращение),
+поэтому занятое место известно без обхода директорий. Когда объём
+превышает верхнюю отметку, давно не использованные файлы удаляются до
+нижней отметки; избранное и файлы, которые сейчас отправляются, не трогаются.
+Это единственный бюджет диска для загрузок: кэш загрузок своего лимита не
+ведёт. Жёсткие ссылки (файлы загрузок и blob дедупликации) занимают место
+один раз, поэтому учёт и вытеснение идут по inode: содержимое удаляется
+вместе со всеми своими путями.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from src.utils.logger import get_logger
+from src.config import config
+from src.downloaders.download_cache import download_cache
+from src.downloaders.job_journal import is_partial_file
+
+logger = get_logger(__name__)
+
+# Изменения индекса за это время записываются на диск одним сохранением
+SAVE_DELAY = 5.0
+
+
+class MediaStore:
+    """Индекс файлов загрузок с LRU-вытеснением по водяным отметкам"""
+
+    def __init__(self, index_path: Path, max_bytes: int, high_watermark: float,
+                 low_watermark: float, is_busy: Optional[Callable[[str], bool]] = None):
+        """Инициализация хранилища.
+
+        Args:
+            index_path: Путь к JSON-индексу
+            max_bytes: Бюджет диска для файлов загрузок
+            high_watermark: Доля бюджета, при превышении которой начинается вытеснение
+            low_watermark: Доля бюджета, до которой вытеснение освобождает место
+            is_busy: Проверка, что файл сейчас отправляется (не вытесняется)
+        """
+        self.index_path = index_path
+        self.max_bytes = max_bytes
+        self.high_bytes = int(max_bytes * high_watermark)
+        self.low_bytes = int(max_bytes * low_watermark)
+        self.is_busy = is_busy or (lambda path: False)
+
+        self.indexed = index_path.exists()
+        data = self._load()
+        # Путь -> {"size", "last_access", "inode"}
+        self._files: Dict[str, Dict[str, Any]] = {}
+        # Содержимое (inode, для старых записей - путь) -> его пути
+        self._groups: Dict[Any, Set[str]] = {}
+        self._total = 0
+        for path, entry in data.get("files", {}).items():
+            inode = entry.get("inode")
+            if inode is None:
+                # Индекс до учёта жёстких ссылок
+                try:
+                    inode = os.stat(path).st_ino
+                except OSError:
+                    pass
+            self._add(path, entry["size"], entry["last_access"], inode)
+        # Файлы избранного (не вытесняются)
+        self._favorites: Set[str] = set(data.get("favorites", []))
+        # Корневые директории загрузок (не удаляются, даже если опустели)
+        self._roots: Set[str] = set()
+        # Отложенное сохранение индекса (в цикле событий)
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self._write_lock = threading.Lock()
+        self._version = 0  # Номер снимка: запоздавшая запись не затирает более новую
+        self._written_version = 0
+
+        # Статистика
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+
+    def _load(self) -> Dict[str, Any]:
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading media store index: {e}")
+        return {}
+
+    def _snapshot(self) -> Tuple[int, Dict[str, Any]]:
+        self._version += 1
+        return self._version, {
+            "files": {path: dict(entry) for path, entry in self._files.items()},
+            "favorites": sorted(self._favorites),
+        }
+
+    def _write(self, snapshot: Tuple[int, Dict[str, Any]]) -> None:
+        version, data = snapshot
+        with self._write_lock:
+            if version < self._written_version:
+                return
+            self._written_version = version
+            try:
+                tmp_path = self.index_path.with_suffix(".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.index_path)
+            except Exception as e:
+                logger.error(f"Error saving media store index: {e}")
+
+    def _save(self) -> None:
+        """Сохраняет индекс: в цикле событий - через SAVE_DELAY в executor, иначе сразу"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(self._snapshot())
+            return
+        if self._save_handle is None:
+            self._save_handle = loop.call_later(SAVE_DELAY, self._save_later, loop)
+
+    def _save_later(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._save_handle = None
+        loop.run_in_executor(None, self._write, self._snapshot())
+
+    def flush(self) -> None:
+        """Немедленно сохраняет отложенные изменения (при остановке)"""
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+            self._write(self._snapshot())
+
+    def scan(self, roots: Iterable[Path]) -> None:
+        """Строит индекс по файлам на диске (один раз, если индекса ещё не было)"""
+        roots = list(roots)
+        self._roots = {str(root) for root in roots}
+        if self.indexed:
+            return
+        for root in roots:
+            if not root.exists():
+                continue
+            for path in root.rglob("*"):
+                if path.is_file() and not is_partial_file(path):
+                    stat = path.stat()
+                    self._add(str(path), stat.st_size, stat.st_mtime, stat.st_ino)
+        self.indexed = True
+        logger.info(f"Media store indexed {len(self._files)} files ({self._total} bytes)")
+        self.evict()
+        self._save()
+
+    @staticmethod
+    def _group_key(path: str, entry: Dict[str, Any]) -> Any:
+        return entry["inode"] if entry.get("inode") is not None else path
+
+    def _add(self, path: str, size: int, last_access: float, inode: Optional[int]) -> None:
+        self._drop(path)
+        entry = {"size": size, "last_access": last_access, "inode": inode}
+        self._files[path] = entry
+        group = self._groups.setdefault(self._group_key(path, entry), set())
+        if not group:
+            # Первая ссылка на содержимое - место занято один раз
+            self._total += size
+        group.add(path)
+
+    def _drop(self, path: str) -> None:
+        entry = self._files.pop(path, None)
+        if entry is None:
+            return
+        key = self._group_key(path, entry)
+        group = self._groups.get(key, set())
+        group.discard(path)
+        if not group:
+            # Последняя ссылка - место освобождено
+            self._groups.pop(key, None)
+            self._total -= entry["size"]
+
+    def track(self, paths: Iterable[Optional[str]]) -> None:
+        """Записывает готовые файлы в индекс и освобождает место при необходимости"""
+        now = time.time()
+        tracked = set()
+        for path in paths:
+            if path and os.path.isfile(path):
+                stat = os.stat(path)
+                self._add(path, stat.st_size, now, stat.st_ino)
+                tracked.add(path)
+        # Только что скачанные файлы ещё не отправлены
+        self.evict(keep=tracked)
+        self._save()
+
+    def touch(self, paths: Iterable[Optional[str]]) -> None:
+        """Файлы снова понадобились (попадание в кэш)"""
+        now = time.time()
+        for path in paths:
+            entry = self._files.get(path) if path else None
+            if entry is not None:
+                entry["last_access"] = now
+        self._save()
+
+    def forget(self, paths: Iterable[Optional[str]]) -> None:
+        """Файлы удалены в обход хранилища"""
+        dropped = False
+        for path in paths:
+            if path and path in self._files:
+                self._drop(path)
+                dropped = True
+        if dropped:
+            self._save()
+
+    def pin_favorite(self, path: Optional[str]) -> None:
+        """Файл добавлен в избранное - не вытесняется"""
+        if path:
+            self._favorites.add(path)
+            self._save()
+
+    def unpin_favorite(self, path: Optional[str]) -> None:
+        if path and path in self._favorites:
+            self._favorites.discard(path)
+            self._save()
+
+    def set_favorites(self, paths: Iterable[Optional[str]]) -> None:
+        """Синхронизирует избранное с базой данных"""
+        self._favorites = {path for path in paths if path}
+        self._save()
+
+    def is_pinned(self, path: str) -> bool:
+        """Файл в избранном или сейчас отправляется"""
+        return path in self._favorites or self.is_busy(path)
+
+    def total_size(self) -> int:
+        """Занятое файлами загрузок место (байт) по индексу"""
+        return self._total
+
+    def evict(self, keep: Iterable[str] = ()) -> int:
+        """Удаляет давно не использованные файлы, если занято больше верхней отметки.
+
+        Args:
+            keep: Файлы, которые нельзя удалять в этот раз
+
+        Returns:
+            Число удалённых файлов
+        """
+        if self._total <= self.high_bytes:
+            return 0
+
+        keep = set(keep)
+        evicted = 0
+        # Давность содержимого - последнее обращение по любому из его путей
+        groups = sorted(
+            (list(paths) for paths in self._groups.values()),
+            key=lambda paths: max(self._files[p]["last_access"] for p in paths),
+        )
+        for paths in groups:
+            if self._total <= self.low_bytes:
+                break
+            for path in [p for p in paths if not os.path.exists(p)]:
+                # Файл удалили в обход хранилища
+                self._drop(path)
+                paths.remove(path)
+            if not paths or any(p in keep or self.is_pinned(p) for p in paths):
+                continue
+            size = self._files[paths[0]]["size"]
+            removed = 0
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Failed to evict {path}: {e}")
+                    continue
+                self._drop(path)
+                self._remove_empty_dir(Path(path).parent)
+                removed += 1
+            if removed == len(paths):
+                evicted += 1
+                self.evicted_files += 1
+                self.evicted_bytes += size
+
+        logger.info(f"Media store evicted {evicted} files, {self._total} bytes in use")
+        return evicted
+
+    def _remove_empty_dir(self, job_dir: Path) -> None:
+        """Удаляет опустевшую директорию загрузки"""
+        if str(job_dir) in self._roots:
+            return
+        try:
+            if not any(job_dir.iterdir()):
+                job_dir.rmdir()
+        except OSError:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика хранилища"""
+        return {
+            "files": len(self._files),
+            "size_mb": self._total / (1024 * 1024),
+            "max_size_mb": self.max_bytes / (1024 * 1024),
+            "favorites": len(self._favorites),
+            "evicted_files": self.evicted_files,
+            "evicted_mb": self.evicted_bytes / (1024 * 1024),
+        }
+
+
+def result_paths(info: Dict[str, Any]) -> List[str]:
+    """Все файлы результата загрузки: медиа и превью видео"""
+    paths = list(info.get("file_paths") or ([info["file_path"]] if info.get("file_path") else []))
+    for meta in (info.get("media_meta") or {}).values():
+        if meta.get("thumbnail"):
+            paths.append(meta["thumbnail"])
+    return paths
+
+
+# Singleton instance
+media_store = MediaStore(
+    config.MEDIA_STORE_INDEX,
+    max_bytes=config.MEDIA_STORE_MAX_BYTES,
+    high_watermark=config.MEDIA_STORE_HIGH_WATERMARK,
+    low_watermark=config.MEDIA_STORE_LOW_WATERMARK,
+    is_busy=download_cache.is_pinned,
+)
@@ -0,0 +1,152 @@
+"""
+YouTube Prefetch - фоновая предзагрузка бесплатных вариантов видео
+Пока пользователь смотрит на клавиатуру выбора качества, 360p и аудио
+скачиваются с низким приоритетом и попадают в кэш загрузок. Выбор этого
+варианта присоединяется к уже идущей загрузке или берёт файл из кэша
+"""
+import asyncio
+from typing import Callable, Dict, Optional
+from src.utils.logger import get_logger
+from src.config import config
+from src.downloaders.scheduler import QueueFullError
+
+logger = get_logger(__name__)
+
+# Варианты, которые выбирает большинство бесплатных пользователей
+VARIANT_360P = "360p"
+VARIANT_AUDIO = "audio"
+
+
+class _Prefetch:
+    """Предзагрузки для одного сообщения с выбором качества"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.expire_handle: Optional[asyncio.TimerHandle] = None
+
+
+class YoutubePrefetcher:
+    """Фоновая предзагрузка 360p/аудио для YouTube"""
+
+    def __init__(self, downloader, enabled: bool, ttl: int):
+        """Инициализация.
+
+        Args:
+            downloader: MediaDownloader
+            enabled: Включена ли предзагрузка
+            ttl: Через сколько секунд выбор качества считается брошенным
+        """
+        self.downloader = downloader
+        self.enabled = enabled
+        self.ttl = ttl
+        self._prefetches: Dict[int, _Prefetch] = {}
+
+        # Статистика
+        self.started = 0
+        self.used = 0
+        self.cancelled = 0
+
+    def start(self, message_id: int, url: str, on_expire: Optional[Callable[[], None]] = None) -> None:
+        """Запускает предзагрузку для сообщения с клавиатурой выбора качества.
+
+        Args:
+            message_id: ID сообщения с клавиатурой
+            url: Ссылка на видео
+            on_expire: Вызывается, когда выбор не сделан за ttl секунд
+        """
+        if not self.enabled:
+            return
+
+        self.discard(message_id)
+        prefetch = _Prefetch(url)
+        prefetch.tasks[VARIANT_360P] = asyncio.ensure_future(self._run(
+            self.downloader.download_youtube_quality(url, 360, low_priority=True), VARIANT_360P
+        ))
+        prefetch.tasks[VARIANT_AUDIO] = asyncio.ensure_future(self._run(
+            self.downloader.download_youtube_audio(url, low_priority=True), VARIANT_AUDIO
+        ))
+        prefetch.expire_handle = asyncio.get_event_loop().call_later(
+            self.ttl, self._expire, message_id, on_expire
+        )
+        self._prefetches[message_id] = prefetch
+        self.started += 1
+        logger.info(f"YouTube prefetch started for message {message_id}: {url}")
+
+    @staticmethod
+    async def _run(coro, variant: str) -> None:
+        try:
+            result = await coro
+            if not result.success:
+                logger.info(f"YouTube {variant} prefetch failed: {result.error_message}")
+        except QueueFullError:
+            logger.info(f"YouTube {variant} prefetch skipped: queue is full")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"YouTube {variant} prefetch error: {e}")
+
+    def choose(self, message_id: int, variant: str) -> None:
+        """Пользователь выбрал вариант: остальные предзагрузки отменяются.
+
+        Выбранная предзагрузка продолжается - запрос пользователя
+        присоединяется к ней через single-flight.
+
+        Args:
+            message_id: ID сообщения с клавиатурой
+            variant: "360p", "480p", ..., "audio"
+        """
+        prefetch = self._prefetches.pop(message_id, None)
+        if prefetch is None:
+            return
+        if prefetch.expire_handle:
+            prefetch.expire_handle.cancel()
+        for name, task in prefetch.tasks.items():
+            if name == variant:
+                self.used += 1
+            elif not task.done():
+                task.cancel()
+                self.cancelled += 1
+
+    def discard(self, message_id: int) -> None:
+        """Отменяет все предзагрузки сообщения"""
+        prefetch = self._prefetches.pop(message_id, None)
+        if prefetch is None:
+            return
+        if prefetch.expire_handle:
+            prefetch.expire_handle.cancel()
+        for task in prefetch.tasks.values():
+            if not task.done():
+                task.cancel()
+                self.cancelled += 1
+
+    def _expire(self, message_id: int, on_expire: Optional[Callable[[], None]]) -> None:
+        if message_id not in self._prefetches:
+            return
+        logger.info(f"YouTube prefetch expired for message {message_id}")
+        self.discard(message_id)
+        if on_expire is not None:
+            on_expire()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Статистика предзагрузки"""
+        return {
+            "enabled": self.enabled,
+            "active": len(self._prefetches),
+            "started": self.started,
+            "used": self.used,
+            "cancelled": self.cancelled,
+        }
+
+
+def _create_prefetcher() -> YoutubePrefetcher:
+    from src.downloaders.media_downloader import media_downloader
+    return YoutubePrefetcher(
+        media_downloader,
+        enabled=config.YOUTUBE_PREFETCH,
+        ttl=config.YOUTUBE_PREFETCH_TTL,
+    )
+
+
+# Singleton instance
+youtube_prefetcher = _create_prefetcher()
@@ -0,0 +1,199 @@
+"""
+Download Progress - прогресс загрузки и метрики скорости по платформам
+Байты приходят из progress_hooks yt-dlp (потоки пула) и из HTTP-загрузок
+фото; подписчики (статусные сообщения) получают снимки не чаще раза в
+PROGRESS_UPDATE_INTERVAL секунд
+"""
+import asyncio
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from src.utils.logger import get_logger
+from src.config import config
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ProgressSnapshot:
+    """Состояние загрузки в момент отправки подписчикам"""
+    downloaded: int
+    total: Optional[int] = None
+    speed: Optional[float] = None  # байт/сек
+    eta: Optional[float] = None  # сек
+
+    @property
+    def percent(self) -> Optional[float]:
+        if not self.total:
+            return None
+        return min(100.0, self.downloaded * 100.0 / self.total)
+
+
+# Колбэк прогресса: получает снимок состояния загрузки
+ProgressCallback = Callable[[ProgressSnapshot], Awaitable[None]]
+
+
+class ProgressMetrics:
+    """Реальная скорость скачивания по платформам (без очереди и извлечения)"""
+
+    def __init__(self):
+        self._platforms: Dict[str, Dict[str, float]] = {}
+        self.active: Dict[int, "DownloadProgress"] = {}
+
+    def record(self, platform: str, downloaded: int, seconds: float) -> None:
+        """Учитывает завершённую загрузку"""
+        stats = self._platforms.setdefault(platform, {"downloads": 0, "bytes": 0, "seconds": 0.0})
+        stats["downloads"] += 1
+        stats["bytes"] += downloaded
+        stats["seconds"] += seconds
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Статистика по платформам.
+
+        Returns:
+            Словарь: платформа -> {downloads, bytes, avg_speed, active, current_speed}
+        """
+        current: Dict[str, Tuple[int, float]] = {}
+        for progress in self.active.values():
+            count, speed = current.get(progress.platform, (0, 0.0))
+            current[progress.platform] = (count + 1, speed + (progress.snapshot().speed or 0))
+
+        result = {}
+        for platform in set(self._platforms) | set(current):
+            stats = self._platforms.get(platform, {"downloads": 0, "bytes": 0, "seconds": 0.0})
+            active, current_speed = current.get(platform, (0, 0.0))
+            result[platform] = {
+                "downloads": stats["downloads"],
+                "bytes": stats["bytes"],
+                "avg_speed": stats["bytes"] / stats["seconds"] if stats["seconds"] else 0,
+                "active": active,
+                "current_speed": current_speed,
+            }
+        return result
+
+
+class DownloadProgress:
+    """Прогресс одной загрузки (общий для объединённых запросов)"""
+
+    def __init__(self, platform: str, interval: Optional[float] = None,
+                 metrics: Optional[ProgressMetrics] = None):
+        """Инициализация.
+
+        Args:
+            platform: Платформа (для метрик)
+            interval: Минимальный интервал между уведомлениями подписчиков (сек)
+            metrics: Куда записать итог загрузки
+        """
+        self.platform = platform
+        self.interval = config.PROGRESS_UPDATE_INTERVAL if interval is None else interval
+        self.metrics = metrics if metrics is not None else progress_metrics
+        self._loop = asyncio.get_event_loop()
+        self._lock = threading.Lock()
+        self._subscribers: List[ProgressCallback] = []
+
+        # Файлы yt-dlp: имя -> (скачано, размер)
+        self._files: Dict[str, Tuple[int, Optional[int]]] = {}
+        # Прямые HTTP-загрузки
+        self._http_bytes = 0
+        self._http_total = 0
+        self._http_total_known = True
+
+        self._first_at: Optional[float] = None
+        self._last_at: Optional[float] = None
+        self._last_emit = 0.0
+        self._finished = False
+        self.metrics.active[id(self)] = self
+
+    def subscribe(self, callback: ProgressCallback) -> None:
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: ProgressCallback) -> None:
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def ytdlp_hook(self, d: Dict[str, Any]) -> None:
+        """progress_hooks yt-dlp (вызывается из потока загрузки)"""
+        status = d.get("status")
+        if status not in ("downloading", "finished"):
+            return
+        name = d.get("filename") or d.get("tmpfilename") or ""
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        downloaded = d.get("downloaded_bytes") or 0
+        if status == "finished":
+            downloaded = total = d.get("total_bytes") or downloaded
+        with self._lock:
+            self._files[name] = (int(downloaded), int(total) if total else None)
+        self._touch()
+
+    def add_total(self, size: Optional[int]) -> None:
+        """Размер очередного HTTP-файла (None - неизвестен)"""
+        with self._lock:
+            if size:
+                self._http_total += size
+            else:
+                self._http_total_known = False
+
+    def add_bytes(self, count: int) -> None:
+        """Получены байты HTTP-загрузки"""
+        with self._lock:
+            self._http_bytes += count
+        self._touch()
+
+    def _touch(self) -> None:
+        now = time.monotonic()
+        if self._first_at is None:
+            self._first_at = now
+        self._last_at = now
+        if self._subscribers and now - self._last_emit >= self.interval:
+            self._last_emit = now
+            # Хуки yt-dlp выполняются в потоках - уведомляем из event loop
+            self._loop.call_soon_threadsafe(self._emit)
+
+    def snapshot(self) -> ProgressSnapshot:
+        """Текущее состояние загрузки"""
+        with self._lock:
+            files = list(self._files.values())
+            downloaded = self._http_bytes + sum(done for done, _ in files)
+            known = self._http_total_known and all(size for _, size in files)
+            total = self._http_total + sum(size or 0 for _, size in files) if known else None
+
+        speed = None
+        if self._first_at is not None and self._last_at is not None and self._last_at > self._first_at:
+            speed = downloaded / (self._last_at - self._first_at)
+        eta = None
+        if speed and total:
+            eta = max(0.0, (total - downloaded) / speed)
+        return ProgressSnapshot(downloaded=downloaded, total=total or None, speed=speed, eta=eta)
+
+    def _emit(self) -> None:
+        if self._finished:
+            return
+        snapshot = self.snapshot()
+        for callback in list(self._subscribers):
+            asyncio.ensure_future(self._safe_callback(callback, snapshot))
+
+    @staticmethod
+    async def _safe_callback(callback: ProgressCallback, snapshot: ProgressSnapshot) -> None:
+        try:
+            await callback(snapshot)
+        except Exception as e:
+            logger.debug(f"Progress callback failed: {e}")
+
+    def finish(self) -> None:
+        """Загрузка завершена: итог уходит в метрики"""
+        if self._finished:
+            return
+        self._finished = True
+        self.metrics.active.pop(id(self), None)
+        snapshot = self.snapshot()
+        if snapshot.downloaded and self._first_at is not None:
+            self.metrics.record(self.platform, snapshot.downloaded, self._last_at - self._first_at)
+
+
+# Прогресс загрузки, выполняемой в текущей задаче
+current_progress: ContextVar[Optional[DownloadProgress]] = ContextVar("current_progress", default=None)
+
+# Singleton instance
+progress_metrics = ProgressMetrics()
@@ -0,0 +1,264 @@
+"""
+Download Scheduler - очередь загрузок с отдельными полосами для платформ
+Каждая платформа получает свой лимит одновременных загрузок, поэтому долгая
+склейка YouTube 1080p не блокирует TikTok, а всплеск запросов не порождает
+неограниченное число потоков
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+from src.utils.logger import get_logger
+from src.config import config
+
+logger = get_logger(__name__)
+
+# Колбэк позиции в очереди: (позиция, ожидаемое время ожидания в секундах)
+PositionCallback = Callable[[int, float], Awaitable[None]]
+
+# Псевдонимы платформ -> имя полосы
+LANE_ALIASES = {
+    "twitter": "x",
+}
+
+
+class QueueFullError(Exception):
+    """Очередь загрузок платформы переполнена"""
+
+    def __init__(self, lane: str, max_queue: int):
+        self.lane = lane
+        self.max_queue = max_queue
+        super().__init__(f"Download queue is full for {lane} ({max_queue} jobs waiting)")
+
+
+class _Job:
+    """Задача, ожидающая свободного слота в полосе"""
+
+    def __init__(self, on_position: Optional[PositionCallback], low_priority: bool = False,
+                 key: Optional[str] = None):
+        self.started = asyncio.get_event_loop().create_future()
+        self.on_position = on_position
+        self.low_priority = low_priority
+        self.key = key
+        self.position = 0
+
+
+class _Lane:
+    """Полоса платформы: лимит одновременных загрузок и очередь ожидания"""
+
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.active = 0
+        self.queue: Deque[_Job] = deque()
+
+        # Статистика
+        self.completed = 0
+        self.rejected = 0
+        self.avg_duration = 0.0  # Экспоненциальное среднее длительности загрузки
+        self.total_wait = 0.0
+
+    def enqueue(self, job: _Job) -> None:
+        """Ставит задачу в очередь: обычные задачи - перед фоновыми"""
+        if job.low_priority:
+            self.queue.append(job)
+            return
+        for index, queued in enumerate(self.queue):
+            if queued.low_priority:
+                self.queue.insert(index, job)
+                return
+        self.queue.append(job)
+
+    def eta(self, position: int, default_duration: float) -> float:
+        """Ожидаемое время до старта задачи на позиции position"""
+        duration = self.avg_duration or default_duration
+        return math.ceil(position / self.workers) * duration
+
+
+class DownloadScheduler:
+    """Планировщик загрузок с полосами по платформам"""
+
+    # Вес нового замера в среднем времени загрузки
+    EMA_ALPHA = 0.2
+
+    def __init__(self, workers: Dict[str, int], default_workers: int, max_queue: int,
+                 default_duration: float = 30.0):
+        """Инициализация планировщика.
+
+        Args:
+            workers: Число одновременных загрузок для каждой платформы
+            default_workers: Лимит для платформ, не указанных в workers
+            max_queue: Максимальная длина очереди ожидания одной полосы
+            default_duration: Оценка длительности загрузки до первых замеров (сек)
+        """
+        self.workers = {name.lower(): count for name, count in workers.items()}
+        self.default_workers = default_workers
+        self.max_queue = max_queue
+        self.default_duration = default_duration
+        self._lanes: Dict[str, _Lane] = {}
+
+    @staticmethod
+    def lane_name(platform: Optional[str]) -> str:
+        """Нормализует название платформы в имя полосы"""
+        name = (platform or "other").lower()
+        return LANE_ALIASES.get(name, name)
+
+    def _get_lane(self, platform: Optional[str]) -> _Lane:
+        name = self.lane_name(platform)
+        lane = self._lanes.get(name)
+        if lane is None:
+            lane = _Lane(name, self.workers.get(name, self.default_workers), self.max_queue)
+            self._lanes[name] = lane
+        return lane
+
+    async def run(self, platform: Optional[str], factory: Callable[[], Awaitable[Any]],
+                  on_position: Optional[PositionCallback] = None,
+                  low_priority: bool = False, key: Optional[str] = None) -> Any:
+        """Выполняет загрузку в полосе платформы.
+
+        Если свободных слотов нет, задача встаёт в очередь; on_position
+        вызывается при постановке в очередь и при каждом сдвиге позиции.
+
+        Args:
+            platform: Платформа (определяет полосу)
+            factory: Функция без аргументов, возвращающая корутину загрузки
+            on_position: Колбэк (позиция, ETA в секундах)
+            low_priority: Фоновая задача (предзагрузка) - пропускает вперёд
+                обычные и вытесняется ими из переполненной очереди
+            key: Ключ контента (для promote)
+
+        Returns:
+            Результат factory()
+
+        Raises:
+            QueueFullError: Очередь полосы переполнена
+        """
+        lane = self._get_lane(platform)
+
+        if lane.active < lane.workers and not lane.queue:
+            lane.active += 1
+        else:
+            await self._wait_for_slot(lane, _Job(on_position, low_priority, key))
+
+        started_at = time.monotonic()
+        try:
+            return await factory()
+        finally:
+            self._record_duration(lane, time.monotonic() - started_at)
+            self._release(lane)
+
+    async def _wait_for_slot(self, lane: _Lane, job: _Job) -> None:
+        """Ставит задачу в очередь и ждёт, пока ей передадут слот"""
+        if len(lane.queue) >= lane.max_queue and not self._evict_low_priority(lane, job):
+            lane.rejected += 1
+            raise QueueFullError(lane.name, lane.max_queue)
+
+        lane.enqueue(job)
+        queued_at = time.monotonic()
+        logger.info(f"Download queued in {lane.name} lane (position {len(lane.queue)})")
+        self._notify_positions(lane)
+
+        try:
+            await job.started
+        except QueueFullError:
+            # Фоновая задача вытеснена из очереди обычной
+            raise
+        except asyncio.CancelledError:
+            if job.started.done() and not job.started.cancelled():
+                # Слот уже был передан этой задаче - возвращаем его следующей
+                self._release(lane)
+            else:
+                lane.queue.remove(job)
+                self._notify_positions(lane)
+            raise
+
+        lane.total_wait += time.monotonic() - queued_at
+
+    def _evict_low_priority(self, lane: _Lane, job: _Job) -> bool:
+        """Освобождает место в очереди для обычной задачи, вытесняя последнюю фоновую"""
+        if job.low_priority:
+            return False
+        for queued in reversed(lane.queue):
+            if queued.low_priority and not queued.started.done():
+                lane.queue.remove(queued)
+                queued.started.set_exception(QueueFullError(lane.name, lane.max_queue))
+                logger.info(f"Background download evicted from {lane.name} queue")
+                return True
+        return False
+
+    def promote(self, key: Optional[str]) -> None:
+        """Поднимает фоновую задачу до обычной (пользователь ждёт её результат)"""
+        if not key:
+            return
+        for lane in self._lanes.values():
+            for job in lane.queue:
+                if job.key == key and job.low_priority:
+                    lane.queue.remove(job)
+                    job.low_priority = False
+                    lane.enqueue(job)
+                    self._notify_positions(lane)
+                    return
+
+    def _release(self, lane: _Lane) -> None:
+        """Освобождает слот: передаёт его первой задаче в очереди"""
+        while lane.queue:
+            job = lane.queue.popleft()
+            if not job.started.done():
+                # Слот переходит к задаче, active не меняется
+                job.started.set_result(None)
+                self._notify_positions(lane)
+                return
+        lane.active -= 1
+
+    def _record_duration(self, lane: _Lane, duration: float) -> None:
+        lane.completed += 1
+        if lane.avg_duration:
+            lane.avg_duration += self.EMA_ALPHA * (duration - lane.avg_duration)
+        else:
+            lane.avg_duration = duration
+
+    def _notify_positions(self, lane: _Lane) -> None:
+        """Сообщает ожидающим задачам их новую позицию в очереди"""
+        for index, job in enumerate(lane.queue, start=1):
+            if job.on_position is None or job.position == index:
+                continue
+            job.position = index
+            eta = lane.eta(index, self.default_duration)
+            asyncio.ensure_future(self._safe_callback(job.on_position, index, eta))
+
+    @staticmethod
+    async def _safe_callback(callback: PositionCallback, position: int, eta: float) -> None:
+        try:
+            await callback(position, eta)
+        except Exception as e:
+            logger.debug(f"Queue position callback failed: {e}")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Статистика по полосам.
+
+        Returns:
+            Словарь: полоса -> {workers, active, queued, completed, rejected,
+            avg_duration, avg_wait}
+        """
+        return {
+            name: {
+                "workers": lane.workers,
+                "active": lane.active,
+                "queued": len(lane.queue),
+                "completed": lane.completed,
+                "rejected": lane.rejected,
+                "avg_duration": lane.avg_duration,
+                "avg_wait": lane.total_wait / lane.completed if lane.completed else 0,
+            }
+            for name, lane in self._lanes.items()
+        }
+
+
+# Singleton instance
+download_scheduler = DownloadScheduler(
+    workers=config.DOWNLOAD_WORKERS,
+    default_workers=config.DOWNLOAD_WORKERS_DEFAULT,
+    max_queue=config.DOWNLOAD_QUEUE_MAX,
+)
@@ -0,0 +1,249 @@
+"""
+yt-dlp Worker - выполнение yt-dlp в пуле процессов
+extract_info, сортировка форматов и обработка JSON - тяжёлый чистый Python;
+в потоках бота они конкурируют за GIL и задерживают event loop для всех
+пользователей. В режиме YTDLP_PROCESS_POOL эти вызовы уходят в долгоживущие
+процессы с заранее импортированным yt_dlp
+"""
+import asyncio
+import copy
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Очередь процесса пула для сообщений (номер задачи, PID)
+_started: Optional["multiprocessing.Queue"] = None
+
+
+def _init_worker(started: "multiprocessing.Queue") -> None:
+    """Инициализация процесса пула: сообщаем PID и прогреваем импорт yt_dlp"""
+    global _started
+    # Ctrl+C обрабатывает основной процесс, он же останавливает пул
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _started = started
+    started.put((None, os.getpid()))
+    import yt_dlp  # noqa: F401
+
+
+def _run_job(job_id: int, fn: Callable, *args: Any) -> Any:
+    """Выполняет задачу в процессе пула, сообщив, какой процесс её взял"""
+    _started.put((job_id, os.getpid()))
+    return fn(*args)
+
+
+def _kill_process(pid: int) -> None:
+    """Убивает процесс по PID (в Windows SIGTERM - это TerminateProcess)"""
+    try:
+        os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+    except OSError:
+        pass
+
+
+def _ping() -> bool:
+    return True
+
+
+def extract_info(url: str, ydl_opts: Dict[str, Any], download: bool = True,
+                 info: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Запускает yt-dlp и возвращает info dict, пригодный для pickle.
+
+    Выполняется как в пуле процессов, так и в пуле потоков - результат
+    одинаковый в обоих режимах.
+
+    Args:
+        url: Ссылка на медиа
+        ydl_opts: Опции YoutubeDL (только сериализуемые значения)
+        download: Скачивать файлы или только извлечь информацию
+        info: Ранее извлечённый info dict - тогда страница не запрашивается
+            повторно, а форматы выбираются заново по ydl_opts
+
+    Returns:
+        Очищенный info dict или None
+    """
+    import yt_dlp
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        if info is not None:
+            # Как download_with_info_file: копию, т.к. yt-dlp дополняет dict
+            result = ydl.process_ie_result(copy.deepcopy(info), download=download)
+        else:
+            result = ydl.extract_info(url, download=download)
+        if result is None:
+            return None
+        return ydl.sanitize_info(result)
+
+
+class YtDlpProcessPool:
+    """Пул долгоживущих процессов для yt-dlp"""
+
+    def __init__(self, workers: int):
+        """Инициализация пула (процессы запускаются при первом обращении).
+
+        Args:
+            workers: Число процессов
+        """
+        self.workers = max(1, workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # PID процессов текущего пула: процессы сообщают их при запуске
+        # (у ProcessPoolExecutor нет публичного доступа к своим процессам)
+        self._started: Optional["multiprocessing.Queue"] = None
+        self._pids: Set[int] = set()
+        # Выполняющиеся задачи: номер -> PID процесса (когда процесс сообщил)
+        self._job_ids = itertools.count()
+        self._jobs: Dict[int, Optional[int]] = {}
+        # Задачи, отменённые по дедлайну, но всё ещё занимающие процесс
+        self._hung: Set[Future] = set()
+        self.kills = 0
+
+    def get_executor(self) -> Executor:
+        """Возвращает пул процессов, создавая и прогревая его при необходимости"""
+        if self._pool is None:
+            # spawn: не копируем в дочерние процессы event loop и потоки бота
+            context = multiprocessing.get_context("spawn")
+            self._started = context.Queue()
+            self._pids = set()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._started,),
+            )
+            # Процессы стартуют лениво - запускаем все сразу, чтобы первый
+            # пользователь не ждал импорта yt_dlp
+            for _ in range(self.workers):
+                self._pool.submit(_ping)
+            logger.info(f"yt-dlp process pool started ({self.workers} workers)")
+        return self._pool
+
+    async def run(self, url: str, ydl_opts: Dict[str, Any], download: bool = True,
+                  info: Optional[Dict[str, Any]] = None,
+                  timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Выполняет extract_info в пуле процессов (см. call)"""
+        return await self.call(extract_info, url, ydl_opts, download, info, timeout=timeout)
+
+    async def call(self, fn: Callable, *args: Any, timeout: Optional[float] = None) -> Any:
+        """Выполняет функцию в пуле процессов.
+
+        Args:
+            fn: Функция уровня модуля (передаётся в процесс через pickle)
+            timeout: Сколько ждать задачу (остаток дедлайна загрузки); по
+                истечении процесс, выполняющий задачу, убивается
+
+        Raises:
+            asyncio.TimeoutError: Задача не уложилась в timeout
+        """
+        if timeout is not None and timeout <= 0:
+            raise asyncio.TimeoutError()
+        pool = self.get_executor()
+        job_id = next(self._job_ids)
+        self._jobs[job_id] = None
+        future = pool.submit(_run_job, job_id, fn, *args)
+        future.add_done_callback(lambda _: self._jobs.pop(job_id, None))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._kill_job(pool, job_id, future)
+            raise
+        except asyncio.CancelledError:
+            if not future.done():
+                self._abandon(future)
+            raise
+
+    def worker_pids(self) -> Set[int]:
+        """PID запущенных процессов текущего пула"""
+        if self._started is not None:
+            while True:
+                try:
+                    job_id, pid = self._started.get_nowait()
+                except queue.Empty:
+                    break
+                self._pids.add(pid)
+                if job_id in self._jobs:
+                    self._jobs[job_id] = pid
+        return set(self._pids)
+
+    def _detach(self) -> Optional[ProcessPoolExecutor]:
+        """Отвязывает текущий пул: следующий вызов создаст новый"""
+        pool, self._pool = self._pool, None
+        self._started = None
+        self._pids = set()
+        return pool
+
+    @property
+    def hung(self) -> int:
+        """Процессов занято отменёнными задачами"""
+        return len(self._hung)
+
+    def _abandon(self, future: Future) -> None:
+        """Отменённая задача продолжает выполняться в процессе.
+
+        Когда такими задачами заняты все процессы, пул убивается: ожидающие
+        задачи получают BrokenProcessPool (их повторит _download_with_retry),
+        следующий вызов создаёт новый пул.
+        """
+        self._hung.add(future)
+        future.add_done_callback(self._hung.discard)
+        if len(self._hung) >= self.workers:
+            logger.warning(f"All {self.workers} yt-dlp workers hung on cancelled jobs, killing pool")
+            self.kill()
+
+    def _kill_job(self, pool: ProcessPoolExecutor, job_id: int, future: Future) -> None:
+        """Задача не уложилась в дедлайн: убиваем её процесс.
+
+        После гибели процесса ProcessPoolExecutor считается сломанным и
+        останавливает остальные процессы - их задачи получают BrokenProcessPool
+        (их повторит _download_with_retry), следующий вызов создаёт новый пул.
+        """
+        self.worker_pids()
+        pid = self._jobs.get(job_id)
+        if pid is None or pool is not self._pool:
+            # Процесс ещё не сообщил о задаче или пул уже перезапущен
+            self._abandon(future)
+            return
+        logger.warning(f"yt-dlp job exceeded its deadline, killing worker {pid}")
+        self._detach()
+        pool.shutdown(wait=False)
+        _kill_process(pid)
+        self._hung.clear()
+        self.kills += 1
+
+    def kill(self) -> None:
+        """Убивает процессы пула, не дожидаясь текущих задач"""
+        pids = self.worker_pids()
+        pool = self._detach()
+        if pool is None:
+            return
+        pool.shutdown(wait=False)
+        for pid in pids:
+            _kill_process(pid)
+        self._hung.clear()
+        self.kills += 1
+
+    def restart(self) -> None:
+        """Перезапускает процессы (например, после обновления yt-dlp).
+
+        Новые задачи сразу уходят в новый пул, а старый останавливается,
+        доделав уже принятые задачи, - идущие загрузки не прерываются.
+        """
+        old_pool = self._detach()
+        # Зависшие задачи занимают процессы старого пула, а не нового
+        self._hung.clear()
+        self.get_executor()
+        if old_pool is not None:
+            old_pool.shutdown(wait=False, cancel_futures=False)
+            logger.info("yt-dlp process pool restarted, old workers finish current jobs")
+
+    def shutdown(self) -> None:
+        """Останавливает пул процессов"""
+        pool = self._detach()
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+            logger.info("yt-dlp process pool stopped")
@@ -6,10 +6,21 @@ from aiogram.filters import Command
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from src.utils.logger import get_logger
 from src.utils.sheets import sheets_manager
+from src.utils.sheets_mirror import sheets_mirror
+from src.utils.user_quota import user_quota
 from src.utils.text_helpers import safe_format_error
 from src.config import config
 from src.database.db_manager import get_db_manager
 from src.utils.rate_limiter import rate_limiter
+from src.downloaders.download_cache import download_cache, info_cache, sent_content_key
+from src.downloaders.media_downloader import media_downloader
+from src.downloaders.prefetch import youtube_prefetcher
+from src.downloaders.progress import progress_metrics
+from src.downloaders.media_store import media_store
+from src.processors.url_processor import URLProcessor
+from src.utils.file_registry import (
+    get_registered_media, register_sent_media, send_registered_media
+)
 from src.utils.history_exporter import export_user_history, HistoryExporter
 from src.utils.history_search import HistorySearcher
 
@@ -28,6 +39,23 @@ def is_admin(user_id: int) -> bool:
     return user_id == config.ADMIN_ID
 
 
+# Названия типов медиа для подписей при повторной отправке
+MEDIA_KIND_NAMES = {
+    "video": "Видео",
+    "animation": "Видео",
+    "audio": "Аудио",
+    "photo": "Фото",
+}
+
+
+def _history_content_key(item: dict):
+    """Ключ контента для записи истории (как при первой отправке в url_handler)."""
+    url_info = URLProcessor().process(item.get('url') or "")
+    if not url_info.is_valid:
+        return None
+    return sent_content_key(url_info.platform.value, url_info.post_id, item.get('content_type'))
+
+
 # ==================== ПОЛЬЗОВАТЕЛЬСКИЕ КОМАНДЫ ====================
 
 # Обработчик текстовых сообщений для создания коллекции
@@ -297,7 +325,7 @@ async def premium_command(message: types.Message) -> None:
     logger.info(f"User {user_id} requested premium info")
 
     # Проверяем текущий статус пользователя
-    is_premium = await sheets_manager.is_user_premium(user_id)
+    is_premium = await user_quota.is_premium(user_id)
 
     if is_premium:
         text = (
@@ -313,7 +341,7 @@ async def premium_command(message: types.Message) -> None:
         return
 
     # Получаем количество скачиваний сегодня
-    daily_count = await sheets_manager.get_user_daily_requests(user_id)
+    daily_count = await user_quota.daily_requests(user_id)
 
     text = (
         "💎 <b>Premium подписка</b>\n\n"
@@ -758,7 +786,7 @@ async def admin_command(message: types.Message) -> None:
         "/users - 👥 Список пользователей\n"
         "/broadcast &lt;текст&gt; - 📢 Рассылка всем\n"
         "/checkinstagram - 🔍 Проверить Instagram\n"
-        "/setcookies - 🍪 Обновить cookies\n\n"
+        "/setcookies [аккаунт] - 🍪 Обновить cookies\n\n"
         "<b>Ссылки:</b>\n"
         "📊 <a href='https://docs.google.com/spreadsheets/d/1cQhOc-FyY5uF7cLC2nH0jht2pITrt0bc3swhvfhVUoI/'>Google Sheets</a>\n"
         "💬 <a href='https://t.me/c/3307715316/'>Супергруппа уведомлений</a>"
@@ -777,43 +805,8 @@ async def allstats_command(message: types.Message) -> None:
     logger.info(f"Admin {message.from_user.id} requested all stats")
 
     try:
-        # Получаем данные из Google Sheets
-        if not await sheets_manager.init():
-            await message.answer("❌ Google Sheets недоступен.")
-            return
-
-        import asyncio
-        loop = asyncio.get_event_loop()
-
-        def get_stats():
-            ws_users = sheets_manager.spreadsheet.worksheet("Users")
-            ws_requests = sheets_manager.spreadsheet.worksheet("Requests")
-
-            users = ws_users.get_all_values()[1:]  # Skip header
-            requests = ws_requests.get_all_values()[1:]  # Skip header
-
-            total_users = len(users)
-            premium_users = sum(1 for u in users if len(u) > 10 and u[10] == "yes")
-
-            total_requests = len(requests)
-            successful = sum(1 for r in requests if len(r) > 6 and r[6] == "yes")
-
-            # Platform stats
-            platforms = {}
-            for r in requests:
-                if len(r) > 3 and r[3]:
-                    p = r[3].lower()
-                    platforms[p] = platforms.get(p, 0) + 1
-
-            return {
-                "total_users": total_users,
-                "premium_users": premium_users,
-                "total_requests": total_requests,
-                "successful": successful,
-                "platforms": platforms
-            }
-
-        stats = await loop.run_in_executor(None, get_stats)
+        # Пользователи и запросы - из локальной копии листов Google Sheets
+        stats = await sheets_mirror.get_stats()
 
         # Получаем данные из базы
         db_stats = {}
@@ -906,7 +899,8 @@ async def allstats_command(message: types.Message) -> None:
             f"  ❌ Ошибок: {stats['total_requests'] - stats['successful']}\n\n"
 
             "<b>📊 Платформы (Sheets):</b>\n"
-            f"{platform_text}\n\n"
+            f"{platform_text}\n"
+            f"<i>Данные Sheets на {sheets_mirror.synced_at()}</i>\n\n"
         )
 
         if db_stats:
@@ -949,20 +943,8 @@ async def users_command(message: types.Message) -> None:
     logger.info(f"Admin {message.from_user.id} requested users list")
 
     try:
-        if not await sheets_manager.init():
-            await message.answer("❌ Google Sheets недоступен.")
-            return
-
-        import asyncio
-        loop = asyncio.get_event_loop()
-
-        def get_users():
-            ws = sheets_manager.spreadsheet.worksheet("Users")
-            users = ws.get_all_values()[1:]  # Skip header
-            # Last 20 users, sorted by registration date (newest first)
-            return users[-20:][::-1] if len(users) > 20 else users[::-1]
-
-        users = await loop.run_in_executor(None, get_users)
+        # Newest registrations first
+        users = await sheets_mirror.get_users(limit=10, order="recent")
 
         if not users:
             await message.answer("👥 Пользователей пока нет.")
@@ -970,13 +952,13 @@ async def users_command(message: types.Message) -> None:
 
         text = "👥 <b>Последние пользователи:</b>\n\n"
 
-        for u in users[:10]:  # Show max 10
-            user_id = u[0] if len(u) > 0 else "?"
-            username = u[1] if len(u) > 1 and u[1] else "нет"
-            first_name = u[2] if len(u) > 2 else ""
-            first_seen = u[5] if len(u) > 5 else "?"
-            requests = u[7] if len(u) > 7 else "0"
-            is_premium = "⭐" if len(u) > 10 and u[10] == "yes" else ""
+        for u in users:
+            user_id = u["user_id"]
+            username = u["username"] or "нет"
+            first_name = u["first_name"] or ""
+            first_seen = u["first_seen"] or "?"
+            requests = u["total_requests"] or 0
+            is_premium = "⭐" if u["is_premium"] else ""
 
             text += f"{is_premium}👤 <b>{first_name}</b> (@{username})\n"
             text += f"   ID: <code>{user_id}</code> | Запросов: {requests}\n"
@@ -1012,19 +994,18 @@ async def broadcast_command(message: types.Message) -> None:
     logger.info(f"Admin {message.from_user.id} starting broadcast")
 
     try:
-        if not await sheets_manager.init():
-            await message.answer("❌ Google Sheets недоступен.")
-            return
-
         import asyncio
-        loop = asyncio.get_event_loop()
-
-        def get_user_ids():
-            ws = sheets_manager.spreadsheet.worksheet("Users")
-            users = ws.get_all_values()[1:]  # Skip header
-            return [int(u[0]) for u in users if u[0].isdigit()]
 
-        user_ids = await loop.run_in_executor(None, get_user_ids)
+        # Дописываем зарегистрированных после последней синхронизации (только новые строки)
+        if not await sheets_mirror.sync():
+            # Без синхронизации в рассылку не попадут новые пользователи
+            await message.answer(
+                "❌ Не удалось обновить список пользователей из Google Sheets "
+                f"(последняя синхронизация: {sheets_mirror.synced_at()}).\n"
+                "Рассылка не начата, повторите позже."
+            )
+            return
+        user_ids = await sheets_mirror.get_user_ids()
 
         if not user_ids:
             await message.answer("👥 Нет пользователей для рассылки.")
@@ -1065,9 +1046,10 @@ async def broadcast_command(message: types.Message) -> None:
 # ==================== INSTAGRAM COOKIES MANAGEMENT ====================
 
 from src.utils.instagram_health import instagram_health, check_instagram_connection, update_cookies
+from src.utils.instagram_accounts import MAIN_ACCOUNT, instagram_accounts
 
-# State for waiting cookies
-_waiting_for_cookies = set()
+# State for waiting cookies: admin id -> account name
+_waiting_for_cookies = {}
 
 
 @router.message(Command("checkinstagram"))
@@ -1090,9 +1072,19 @@ async def check_instagram_command(message: types.Message) -> None:
             f"🔴 <b>Instagram Status: ERROR</b>\n\n"
             f"{check_message}\n\n"
             f"Для обновления cookies:\n"
-            f"1. Отправьте /setcookies\n"
+            f"1. Отправьте /setcookies [имя аккаунта]\n"
             f"2. Затем отправьте файл cookies или текст"
         )
+
+    accounts = instagram_accounts.get_stats()
+    if len(accounts) > 1:
+        text += "\n\n<b>Пул аккаунтов</b>\n" + "\n".join(
+            f"• {a['name']}: здоровье {a['score']:.0%}, запросов {a['requests']}, "
+            f"блокировок {a['throttled']}"
+            + (f", пауза {a['cooldown']:.0f}s" if a['cooldown'] else "")
+            + (" ⚠️ нужен логин" if a['needs_login'] else "")
+            for a in accounts
+        )
     
     await status_msg.edit_text(text, parse_mode="HTML")
 
@@ -1104,12 +1096,21 @@ async def setcookies_command(message: types.Message) -> None:
         await message.answer("❌ У вас нет доступа к этой команде.")
         return
 
-    logger.info(f"Admin {message.from_user.id} started cookies update")
+    # /setcookies <имя> - cookies аккаунта пула (новое имя добавляет аккаунт)
+    parts = (message.text or "").split(maxsplit=1)
+    account_name = parts[1].strip() if len(parts) > 1 else MAIN_ACCOUNT
+    if not instagram_accounts.valid_name(account_name):
+        await message.answer("❌ Имя аккаунта: латиница, цифры, _ и -, до 32 символов.")
+        return
+
+    logger.info(f"Admin {message.from_user.id} started cookies update for account {account_name}")
     
-    _waiting_for_cookies.add(message.from_user.id)
+    _waiting_for_cookies[message.from_user.id] = account_name
     
+    accounts = ", ".join(a.name for a in instagram_accounts.accounts) or "нет"
     text = (
         "🍪 <b>Обновление Instagram Cookies</b>\n\n"
+        f"Аккаунт: <b>{account_name}</b> (в пуле: {accounts})\n\n"
         "Отправьте cookies одним из способов:\n\n"
         "1️⃣ <b>Файл</b> - отправьте .txt файл с cookies\n"
         "2️⃣ <b>Текст</b> - вставьте содержимое cookies\n\n"
@@ -1124,7 +1125,7 @@ async def setcookies_command(message: types.Message) -> None:
 async def cancel_command(message: types.Message) -> None:
     """Отменить ожидание cookies."""
     if message.from_user.id in _waiting_for_cookies:
-        _waiting_for_cookies.discard(message.from_user.id)
+        _waiting_for_cookies.pop(message.from_user.id, None)
         await message.answer("❌ Обновление cookies отменено.")
     else:
         await message.answer("Нечего отменять.")
@@ -1171,6 +1172,126 @@ async def ratelimit_command(message: types.Message) -> None:
         if len(lines) == 1:
             lines.append("Нет данных. Загрузки еще не было.")
 
+        cache_stats = download_cache.get_stats()
+        lines.append(
+            f"\n💾 <b>Кэш загрузок</b>\n"
+            f"   Записей: {cache_stats['entries']}\n"
+            f"   Размер: {cache_stats['size_mb']:.1f} MB\n"
+            f"   Попаданий: {cache_stats['hits']} ({cache_stats['hit_rate']:.0%})\n"
+            f"   Вытеснено: {cache_stats['evictions']}\n"
+        )
+
+        store_stats = media_store.get_stats()
+        lines.append(
+            f"🗄 <b>Файлы загрузок</b>\n"
+            f"   Занято: {store_stats['size_mb']:.0f} / {store_stats['max_size_mb']:.0f} MB "
+            f"({store_stats['files']} файлов, в избранном {store_stats['favorites']})\n"
+            f"   Вытеснено: {store_stats['evicted_files']} ({store_stats['evicted_mb']:.0f} MB)\n"
+        )
+
+        blob_stats = media_downloader.blobs.get_stats()
+        lines.append(
+            f"🔗 <b>Дедупликация</b>\n"
+            f"   Уникальных файлов: {blob_stats['stored']}, повторов: {blob_stats['deduplicated']}\n"
+            f"   Сэкономлено: {blob_stats['saved_mb']:.0f} MB"
+            f"{' (выключена: нет жёстких ссылок)' if blob_stats['disabled'] else ''}\n"
+        )
+
+        info_stats = info_cache.get_stats()
+        lines.append(
+            f"📋 <b>Кэш info YouTube</b>\n"
+            f"   Записей: {info_stats['entries']}\n"
+            f"   Попаданий: {info_stats['hits']} ({info_stats['hit_rate']:.0%})\n"
+        )
+
+        dl_stats = media_downloader.get_stats()
+        lines.append(
+            f"🔗 <b>Объединение загрузок</b>\n"
+            f"   Запущено загрузок: {dl_stats['downloads_started']}\n"
+            f"   Объединено запросов: {dl_stats['downloads_coalesced']} ({dl_stats['coalesce_rate']:.0%})\n"
+            f"   Сейчас выполняется: {dl_stats['in_flight']}\n"
+        )
+
+        if dl_stats['transcodes'] or dl_stats['transcodes_failed']:
+            lines.append(
+                f"🎞 <b>Сжатие видео</b> (до {config.MAX_FILE_SIZE // (1024 * 1024)} MB)\n"
+                f"   Сжато: {dl_stats['transcodes']}, не удалось: {dl_stats['transcodes_failed']}\n"
+                f"   Сэкономлено: {dl_stats['transcode_saved_bytes'] / (1024 * 1024):.0f} MB\n"
+            )
+
+        sheets_stats = sheets_manager.queue.get_stats()
+        lines.append(
+            f"📊 <b>Запись в Google Sheets</b>\n"
+            f"   В очереди: {sheets_stats['pending']}, записано: {sheets_stats['flushed']}\n"
+            f"   Ошибок записи: {sheets_stats['errors']}, потеряно: {sheets_stats['dropped']}\n"
+        )
+
+        if dl_stats['timeouts'] or dl_stats['hung_workers']:
+            timeouts = ", ".join(
+                f"{platform} {count}" for platform, count in sorted(dl_stats['timeouts'].items())
+            )
+            lines.append(
+                f"⌛ <b>Остановлено по дедлайну</b> ({config.DOWNLOAD_TIMEOUT}с)\n"
+                f"   {timeouts or 'нет'}\n"
+                f"   Зависших воркеров: {dl_stats['hung_workers']}\n"
+            )
+
+        resume_stats = media_downloader.journal.get_stats()
+        lines.append(
+            f"♻️ <b>Докачка</b>\n"
+            f"   Продолжено загрузок: {resume_stats['resumed_jobs']} "
+            f"({resume_stats['resumed_bytes'] / (1024 * 1024):.1f} MB не скачивалось заново)\n"
+            f"   Возобновлено после перезапуска: {resume_stats['restored_jobs']}\n"
+            f"   Потеряно недокачанного: {resume_stats['wasted_bytes'] / (1024 * 1024):.1f} MB\n"
+        )
+
+        prefetch_stats = youtube_prefetcher.get_stats()
+        if prefetch_stats['enabled']:
+            lines.append(
+                f"⚡ <b>Предзагрузка YouTube</b>\n"
+                f"   Запущено: {prefetch_stats['started']}\n"
+                f"   Пригодилось: {prefetch_stats['used']}\n"
+                f"   Отменено: {prefetch_stats['cancelled']}\n"
+            )
+
+        breaker_stats = media_downloader.breaker.get_stats()
+        if breaker_stats:
+            lines.append("🧊 <b>Блокировки платформ</b>")
+            for platform, stats in sorted(breaker_stats.items()):
+                state = {"closed": "✅", "open": "⛔", "half_open": "🔍"}[stats['state']]
+                retry = (
+                    f", до {datetime.fromtimestamp(stats['retry_at']).strftime('%H:%M:%S')}"
+                    if stats['retry_at'] else ""
+                )
+                lines.append(
+                    f"   {state} {platform}: открывался {stats['opens']} раз, "
+                    f"отклонено {stats['rejected']}, недавних 429 {stats['recent_failures']}{retry}"
+                )
+            lines.append("")
+
+        lane_stats = media_downloader.scheduler.get_stats()
+        if lane_stats:
+            lines.append("🚦 <b>Очереди загрузок</b>")
+            for lane, stats in sorted(lane_stats.items()):
+                lines.append(
+                    f"   {lane}: {stats['active']}/{stats['workers']} активно, "
+                    f"в очереди {stats['queued']}, "
+                    f"ср. загрузка {stats['avg_duration']:.0f}с, "
+                    f"ср. ожидание {stats['avg_wait']:.0f}с"
+                    + (f", отклонено {stats['rejected']}" if stats['rejected'] else "")
+                )
+
+        speed_stats = progress_metrics.get_stats()
+        if speed_stats:
+            lines.append("\n📶 <b>Скорость скачивания</b>")
+            for platform, stats in sorted(speed_stats.items()):
+                lines.append(
+                    f"   {platform}: ср. {stats['avg_speed'] / (1024 * 1024):.1f} MB/с, "
+                    f"{stats['downloads']} загрузок, {stats['bytes'] / (1024 * 1024):.0f} MB"
+                    + (f", сейчас {stats['active']} ({stats['current_speed'] / (1024 * 1024):.1f} MB/с)"
+                       if stats['active'] else "")
+                )
+
         text = "\n".join(lines)
 
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -1227,7 +1348,7 @@ async def handle_payment_callback(callback: CallbackQuery) -> None:
 async def handle_back_to_premium_callback(callback: CallbackQuery) -> None:
     """Возврат к экрану Premium."""
     user_id = callback.from_user.id
-    daily_count = await sheets_manager.get_user_daily_requests(user_id)
+    daily_count = await user_quota.daily_requests(user_id)
 
     text = (
         "💎 <b>Premium подписка</b>\n\n"
@@ -1266,7 +1387,7 @@ async def handle_show_premium_callback(callback: CallbackQuery) -> None:
     user_id = callback.from_user.id
 
     # Проверяем текущий статус пользователя
-    is_premium = await sheets_manager.is_user_premium(user_id)
+    is_premium = await user_quota.is_premium(user_id)
 
     if is_premium:
         text = (
@@ -1282,7 +1403,7 @@ async def handle_show_premium_callback(callback: CallbackQuery) -> None:
         await callback.answer()
         return
 
-    daily_count = await sheets_manager.get_user_daily_requests(user_id)
+    daily_count = await user_quota.daily_requests(user_id)
 
     text = (
         "💎 <b>Premium подписка</b>\n\n"
@@ -1358,9 +1479,8 @@ async def receive_cookies_file(message: types.Message) -> None:
         
         status_msg = await message.answer("🔄 Обновляю cookies...")
         
-        success, result_message = await update_cookies(cookies_text)
-        
-        _waiting_for_cookies.discard(message.from_user.id)
+        account_name = _waiting_for_cookies.pop(message.from_user.id, MAIN_ACCOUNT)
+        success, result_message = await update_cookies(cookies_text, account_name)
         
         if success:
             await status_msg.edit_text(f"✅ {result_message}", parse_mode="HTML")
@@ -1389,9 +1509,8 @@ async def receive_cookies_text(message: types.Message) -> None:
     
     status_msg = await message.answer("🔄 Обновляю cookies...")
     
-    success, result_message = await update_cookies(cookies_text)
-    
-    _waiting_for_cookies.discard(message.from_user.id)
+    account_name = _waiting_for_cookies.pop(message.from_user.id, MAIN_ACCOUNT)
+    success, result_message = await update_cookies(cookies_text, account_name)
     
     if success:
         await status_msg.edit_text(f"✅ {result_message}", parse_mode="HTML")
@@ -1418,7 +1537,7 @@ async def admin_panel_callback(callback: CallbackQuery) -> None:
         "/users - 👥 Список пользователей\n"
         "/broadcast - 📢 Рассылка всем\n"
         "/checkinstagram - 🔍 Проверить Instagram\n"
-        "/setcookies - 🍪 Обновить cookies\n\n"
+        "/setcookies [аккаунт] - 🍪 Обновить cookies\n\n"
         "<b>Ссылки:</b>\n"
         "📊 <a href='https://docs.google.com/spreadsheets/d/1cQhOc-FyY5uF7cLC2nH0jht2pITrt0bc3swhvfhVUoI/'>Google Sheets</a>\n"
         "💬 <a href='https://t.me/c/3307715316/'>Супергруппа уведомлений</a>"
@@ -1488,41 +1607,10 @@ async def admin_stats_callback(callback: CallbackQuery) -> None:
 
     await callback.answer("📊 Получаю статистику...")
 
-    # Используем код из allstats_command
     try:
-        import asyncio
-        loop = asyncio.get_event_loop()
-
-        def get_stats():
-            data = sheets_manager.sheet.get_all_records()
-            if not data:
-                return None
-
-            total_users = len(set(record.get("user_id") for record in data if record.get("user_id")))
-            premium_users = len(set(
-                record.get("user_id") for record in data
-                if record.get("user_id") and record.get("is_premium") == "TRUE"
-            ))
-            total_requests = len([r for r in data if r.get("platform")])
-            successful = len([r for r in data if r.get("status") == "success"])
-
-            platforms = {}
-            for record in data:
-                platform = record.get("platform")
-                if platform:
-                    platforms[platform] = platforms.get(platform, 0) + 1
-
-            return {
-                "total_users": total_users,
-                "premium_users": premium_users,
-                "total_requests": total_requests,
-                "successful": successful,
-                "platforms": platforms
-            }
-
-        stats = await loop.run_in_executor(None, get_stats)
+        stats = await sheets_mirror.get_stats()
 
-        if not stats:
+        if not stats["total_users"] and not stats["total_requests"]:
             await callback.message.answer("❌ Нет данных для отображения статистики.")
             return
 
@@ -1563,51 +1651,23 @@ async def admin_users_callback(callback: CallbackQuery) -> None:
     await callback.answer("👥 Получаю список пользователей...")
 
     try:
-        import asyncio
-        loop = asyncio.get_event_loop()
-
-        def get_users():
-            data = sheets_manager.sheet.get_all_records()
-            if not data:
-                return []
-
-            users_dict = {}
-            for record in data:
-                user_id = record.get("user_id")
-                if not user_id:
-                    continue
-
-                if user_id not in users_dict:
-                    users_dict[user_id] = {
-                        "username": record.get("username", "н/д"),
-                        "first_name": record.get("first_name", ""),
-                        "last_name": record.get("last_name", ""),
-                        "is_premium": record.get("is_premium") == "TRUE",
-                        "first_seen": record.get("first_seen", ""),
-                        "request_count": 0
-                    }
-
-                if record.get("platform"):
-                    users_dict[user_id]["request_count"] += 1
-
-            return sorted(users_dict.items(), key=lambda x: x[1]["request_count"], reverse=True)
-
-        users = await loop.run_in_executor(None, get_users)
+        users = await sheets_mirror.get_users(limit=20, order="top")
 
         if not users:
             text = "👥 <b>Пользователи</b>\n\nПользователей пока нет."
         else:
             users_list = []
-            for i, (user_id, info) in enumerate(users[:20], 1):  # Показываем топ-20
+            for i, info in enumerate(users, 1):  # Показываем топ-20
                 name = info["first_name"] or info["username"] or "Без имени"
                 premium = "⭐" if info["is_premium"] else ""
                 users_list.append(
-                    f"{i}. {premium} <code>{user_id}</code> - {name} ({info['request_count']} зап.)"
+                    f"{i}. {premium} <code>{info['user_id']}</code> - {name} ({info['total_requests'] or 0} зап.)"
                 )
 
+            stats = await sheets_mirror.get_stats()
             text = (
                 f"👥 <b>Пользователи</b> (топ-20)\n\n"
-                f"Всего: {len(users)}\n\n" +
+                f"Всего: {stats['total_users']}\n\n" +
                 "\n".join(users_list)
             )
 
@@ -1673,7 +1733,7 @@ async def set_quality_callback(callback: CallbackQuery) -> None:
 
     # Проверяем Premium для 1080p
     if quality == "1080p":
-        is_premium = await sheets_manager.is_user_premium(user_id)
+        is_premium = await user_quota.is_premium(user_id)
         if not is_premium:
             await callback.answer(
                 "❌ Качество 1080p доступно только для Premium пользователей",
@@ -1822,6 +1882,17 @@ async def history_redownload_callback(callback: CallbackQuery) -> None:
             await callback.answer("❌ Элемент не найден", show_alert=True)
             return
 
+        # Файл уже отправлялся - пересылаем по file_id (работает и после удаления файла)
+        content_key = _history_content_key(item)
+        record = await get_registered_media(content_key)
+        if record:
+            kind = MEDIA_KIND_NAMES.get(record['files'][0]['type'], 'Файл')
+            if await send_registered_media(callback.message, content_key,
+                                           caption=f"📂 Из истории: {item['title'] or kind}",
+                                           record=record):
+                await callback.answer("✅ Отправлено")
+                return
+
         # Проверяем, существует ли файл на диске
         file_path = item.get('file_path')
         if file_path and os.path.exists(file_path):
@@ -1829,26 +1900,28 @@ async def history_redownload_callback(callback: CallbackQuery) -> None:
             try:
                 # Определяем тип файла
                 if file_path.endswith(('.mp4', '.mov', '.avi', '.webm')):
-                    await callback.message.answer_video(
+                    sent = await callback.message.answer_video(
                         types.FSInputFile(file_path),
                         caption=f"📂 Из истории: {item['title'] or 'Видео'}"
                     )
                 elif file_path.endswith(('.mp3', '.m4a', '.wav')):
-                    await callback.message.answer_audio(
+                    sent = await callback.message.answer_audio(
                         types.FSInputFile(file_path),
                         caption=f"📂 Из истории: {item['title'] or 'Аудио'}"
                     )
                 elif file_path.endswith(('.jpg', '.jpeg', '.png', '.webp')):
-                    await callback.message.answer_photo(
+                    sent = await callback.message.answer_photo(
                         types.FSInputFile(file_path),
                         caption=f"📂 Из истории: {item['title'] or 'Фото'}"
                     )
                 else:
-                    await callback.message.answer_document(
+                    sent = await callback.message.answer_document(
                         types.FSInputFile(file_path),
                         caption=f"📂 Из истории: {item['title'] or 'Файл'}"
                     )
 
+                await register_sent_media(content_key, sent)
+
                 await callback.answer("✅ Отправлено из кэша")
                 logger.info(f"Resent from cache: {file_path}")
             except Exception as e:
@@ -1879,6 +1952,9 @@ async def history_favorite_callback(callback: CallbackQuery) -> None:
 
         success = await db.add_to_favorites(download_id)
         if success:
+            # Файл избранного не вытесняется из хранилища
+            item = await db.get_download_by_id(download_id)
+            media_store.pin_favorite(item and item.get('file_path'))
             await callback.answer("⭐ Добавлено в избранное")
             # Обновляем сообщение
             await history_command(callback.message)
@@ -1903,6 +1979,8 @@ async def history_unfavorite_callback(callback: CallbackQuery) -> None:
 
         success = await db.remove_from_favorites(download_id)
         if success:
+            item = await db.get_download_by_id(download_id)
+            media_store.unpin_favorite(item and item.get('file_path'))
             await callback.answer("💔 Удалено из избранного")
             # Обновляем сообщение
             await history_command(callback.message)
@@ -2094,32 +2172,45 @@ async def fav_download_callback(callback: CallbackQuery) -> None:
             await callback.answer("❌ Элемент не найден", show_alert=True)
             return
 
+        # Файл уже отправлялся - пересылаем по file_id (работает и после удаления файла)
+        content_key = _history_content_key(item)
+        record = await get_registered_media(content_key)
+        if record:
+            kind = MEDIA_KIND_NAMES.get(record['files'][0]['type'], 'Файл')
+            if await send_registered_media(callback.message, content_key,
+                                           caption=f"⭐ Из избранного: {item['title'] or kind}",
+                                           record=record):
+                await callback.answer("✅ Отправлено")
+                return
+
         # Проверяем файл
         file_path = item.get('file_path')
         if file_path and os.path.exists(file_path):
             try:
                 # Отправляем из кэша
                 if file_path.endswith(('.mp4', '.mov', '.avi', '.webm')):
-                    await callback.message.answer_video(
+                    sent = await callback.message.answer_video(
                         types.FSInputFile(file_path),
                         caption=f"⭐ Из избранного: {item['title'] or 'Видео'}"
                     )
                 elif file_path.endswith(('.mp3', '.m4a', '.wav')):
-                    await callback.message.answer_audio(
+                    sent = await callback.message.answer_audio(
                         types.FSInputFile(file_path),
                         caption=f"⭐ Из избранного: {item['title'] or 'Аудио'}"
                     )
                 elif file_path.endswith(('.jpg', '.jpeg', '.png', '.webp')):
-                    await callback.message.answer_photo(
+                    sent = await callback.message.answer_photo(
                         types.FSInputFile(file_path),
                         caption=f"⭐ Из избранного: {item['title'] or 'Фото'}"
                     )
                 else:
-                    await callback.message.answer_document(
+                    sent = await callback.message.answer_document(
                         types.FSInputFile(file_path),
                         caption=f"⭐ Из избранного: {item['title'] or 'Файл'}"
                     )
 
+                await register_sent_media(content_key, sent)
+
                 await callback.answer("✅ Отправлено из кэша")
             except Exception as e:
                 logger.error(f"Failed to resend file: {e}")
@@ -2148,6 +2239,8 @@ async def fav_remove_callback(callback: CallbackQuery) -> None:
 
         success = await db.remove_from_favorites(download_id)
         if success:
+            item = await db.get_download_by_id(download_id)
+            media_store.unpin_favorite(item and item.get('file_path'))
             await callback.answer("💔 Удалено из избранного")
             # Обновляем список избранного
             await favorites_command(callback.message)
@@ -2446,30 +2539,42 @@ async def col_download_callback(callback: CallbackQuery) -> None:
             await callback.answer("❌ Элемент не найден", show_alert=True)
             return
 
+        # Файл уже отправлялся - пересылаем по file_id (работает и после удаления файла)
+        content_key = _history_content_key(item)
+        record = await get_registered_media(content_key)
+        if record:
+            kind = MEDIA_KIND_NAMES.get(record['files'][0]['type'], 'Файл')
+            if await send_registered_media(callback.message, content_key,
+                                           caption=f"📁 Из коллекции: {item['title'] or kind}",
+                                           record=record):
+                await callback.answer("✅ Отправлено")
+                return
+
         # Проверяем файл и отправляем
         file_path = item.get('file_path')
         if file_path and os.path.exists(file_path):
             try:
                 if file_path.endswith(('.mp4', '.mov', '.avi', '.webm')):
-                    await callback.message.answer_video(
+                    sent = await callback.message.answer_video(
                         types.FSInputFile(file_path),
                         caption=f"📁 Из коллекции: {item['title'] or 'Видео'}"
                     )
                 elif file_path.endswith(('.mp3', '.m4a', '.wav')):
-                    await callback.message.answer_audio(
+                    sent = await callback.message.answer_audio(
                         types.FSInputFile(file_path),
                         caption=f"📁 Из коллекции: {item['title'] or 'Аудио'}"
                     )
                 elif file_path.endswith(('.jpg', '.jpeg', '.png', '.webp')):
-                    await callback.message.answer_photo(
+                    sent = await callback.message.answer_photo(
                         types.FSInputFile(file_path),
                         caption=f"📁 Из коллекции: {item['title'] or 'Фото'}"
                     )
                 else:
-                    await callback.message.answer_document(
+                    sent = await callback.message.answer_document(
                         types.FSInputFile(file_path),
                         caption=f"📁 Из коллекции: {item['title'] or 'Файл'}"
                     )
+                await register_sent_media(content_key, sent)
                 await callback.answer("✅ Отправлено")
             except Exception as e:
                 logger.error(f"Failed to resend: {e}")
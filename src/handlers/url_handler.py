@@ -1,13 +1,24 @@
 """
 Handler для обработки сообщений с URL и загрузки медиа
 """
+import os
 import time
+from contextlib import contextmanager
+from dataclasses import asdict
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from src.utils.logger import get_logger
 from src.processors.url_processor import URLProcessor, Platform
-from src.downloaders.media_downloader import MediaDownloader
+from src.downloaders.media_downloader import media_downloader, DownloadInfo
+from src.downloaders.download_cache import download_cache, sent_content_key
+from src.downloaders.scheduler import QueueFullError
+from src.utils.circuit_breaker import CircuitOpenError
+from src.downloaders.deadline import DownloadTimeoutError, upload_within_deadline
+from src.downloaders.prefetch import youtube_prefetcher, VARIANT_AUDIO
+from src.utils.file_registry import (
+    get_registered_media, register_sent_media, send_registered_media
+)
 from src.utils.validators import MessageValidator
 from src.utils.text_helpers import safe_format_error
 from src.utils.translator import (
@@ -18,6 +29,7 @@ from src.localization.messages import (
     INVALID_MESSAGE, UNSUPPORTED_PLATFORM, PLATFORMS, CONTENT_TYPES
 )
 from src.utils.sheets import sheets_manager
+from src.utils.user_quota import user_quota
 from src.config import config
 from src.database.db_manager import get_db_manager
 from src.utils.error_messages import (
@@ -34,7 +46,6 @@ logger = get_logger(__name__)
 router = Router()
 
 url_processor = URLProcessor()
-media_downloader = MediaDownloader()
 
 # Импортируем файловые кэши
 from src.utils.cache import image_paths_cache, original_texts_cache
@@ -46,6 +57,148 @@ youtube_formats_cache = {}  # message_id -> {360: {...}, 480: {...}, ...}
 # Кэш для больших файлов
 large_files_cache = {}  # message_id -> {file_path, platform, user_id, ...}
 
+QUEUE_FULL_MESSAGE = "Сервер перегружен, попробуйте через пару минут"
+
+
+def format_eta(seconds: float) -> str:
+    """Форматирует ожидаемое время ожидания: ~45 сек / ~3 мин"""
+    if seconds < 60:
+        return f"~{max(1, int(seconds))} сек"
+    return f"~{int(round(seconds / 60))} мин"
+
+
+def queue_status_updater(status_msg: types.Message, header: str):
+    """Колбэк планировщика: показывает позицию в очереди в статусном сообщении"""
+    async def on_queued(position: int, eta: float):
+        await status_msg.edit_text(
+            f"{header}\n\n"
+            f"🚦 Позиция в очереди: {position}\n"
+            f"⏳ Ожидание: {format_eta(eta)}",
+            parse_mode="Markdown"
+        )
+    return on_queued
+
+
+# Последнее обновление статуса с прогрессом: chat_id -> time.monotonic()
+_progress_edit_times = {}
+# Загрузки с колбэком прогресса в чате: chat_id -> количество
+_progress_updaters = {}
+
+
+def format_size(size: float) -> str:
+    """Форматирует размер: 850 KB / 12.4 MB"""
+    if size < 1024 * 1024:
+        return f"{size / 1024:.0f} KB"
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def progress_status_updater(status_msg: types.Message, header: str):
+    """Колбэк прогресса: процент, скорость и ETA в статусном сообщении.
+
+    Telegram ограничивает частоту правок, поэтому в одном чате сообщение
+    обновляется не чаще раза в PROGRESS_UPDATE_INTERVAL секунд.
+    """
+    chat_id = status_msg.chat.id
+
+    async def on_progress(progress):
+        now = time.monotonic()
+        if now - _progress_edit_times.get(chat_id, 0) < config.PROGRESS_UPDATE_INTERVAL:
+            return
+        _progress_edit_times[chat_id] = now
+
+        if progress.percent is not None:
+            filled = int(progress.percent // 10)
+            lines = [f"{'▓' * filled}{'░' * (10 - filled)} {progress.percent:.0f}%"]
+        else:
+            lines = [f"📥 Скачано: {format_size(progress.downloaded)}"]
+        if progress.speed:
+            lines.append(f"⚡ Скорость: {format_size(progress.speed)}/с")
+        if progress.eta is not None:
+            lines.append(f"⏳ Осталось: {format_eta(progress.eta)}")
+
+        await status_msg.edit_text(f"{header}\n\n" + "\n".join(lines), parse_mode="Markdown")
+    return on_progress
+
+
+@contextmanager
+def progress_updates(status_msg: types.Message, header: str):
+    """Колбэк прогресса на время загрузки.
+
+    Когда в чате не остаётся загрузок, его запись в _progress_edit_times удаляется.
+    """
+    chat_id = status_msg.chat.id
+    _progress_updaters[chat_id] = _progress_updaters.get(chat_id, 0) + 1
+    try:
+        yield progress_status_updater(status_msg, header)
+    finally:
+        _progress_updaters[chat_id] -= 1
+        if not _progress_updaters[chat_id]:
+            del _progress_updaters[chat_id]
+            _progress_edit_times.pop(chat_id, None)
+
+
+def video_send_kwargs(download_result: DownloadInfo, file_path: str) -> dict:
+    """Размеры, длительность и превью видео для answer_video/InputMediaVideo"""
+    meta = (download_result.media_meta or {}).get(file_path) or {}
+    kwargs = {"supports_streaming": True}
+    for key in ("width", "height", "duration"):
+        if meta.get(key):
+            kwargs[key] = int(meta[key])
+    thumbnail = meta.get("thumbnail")
+    if thumbnail and os.path.exists(thumbnail):
+        kwargs["thumbnail"] = types.FSInputFile(thumbnail)
+    return kwargs
+
+
+async def fit_oversized_video(download_result: DownloadInfo, content_key: str,
+                              status_msg: types.Message, header: str) -> DownloadInfo:
+    """Пережимает видео больше лимита Telegram; если не вышло - возвращает оригинал"""
+    if not (config.TRANSCODE_OVERSIZED and download_result.success and download_result.file_path
+            and not download_result.is_carousel
+            and download_result.file_size > config.MAX_FILE_SIZE
+            and os.path.exists(download_result.file_path)):
+        return download_result
+
+    try:
+        await status_msg.edit_text(
+            f"{header}\n\n🎞 Видео больше {config.MAX_FILE_SIZE // (1024 * 1024)} MB, сжимаю...",
+            parse_mode="Markdown"
+        )
+    except Exception:
+        pass
+
+    try:
+        fitted = await media_downloader.fit_video(
+            download_result, content_key, on_queued=queue_status_updater(status_msg, header)
+        )
+    except QueueFullError:
+        return download_result
+    if not fitted.success:
+        logger.info(f"Video not fitted: {fitted.error_message}")
+        return download_result
+    return fitted
+
+
+async def send_within_deadline(coro, started_at: float, platform: str):
+    """Отправка файла, ограниченная остатком дедлайна запроса (таймауты - в статистике загрузчика)"""
+    try:
+        return await upload_within_deadline(coro, started_at, platform)
+    except DownloadTimeoutError:
+        media_downloader.record_upload_timeout(platform)
+        raise
+
+
+async def refetch_media(fetch) -> DownloadInfo:
+    """Загружает файл заново, когда Telegram отклонил сохранённый file_id.
+
+    Запись реестра к этому моменту уже удалена, а файл из неё мог быть
+    вытеснен из кэша, поэтому отправлять можно только результат новой загрузки.
+    """
+    download_result = await fetch()
+    if not (download_result.success and download_result.file_path) or download_result.is_too_large:
+        raise RuntimeError(download_result.error_message or "повторная загрузка не удалась")
+    return download_result
+
 
 @router.message(F.text.regexp(r'https?://'))
 async def handle_url_message(message: types.Message):
@@ -69,9 +222,10 @@ async def handle_url_message(message: types.Message):
         if user_id == config.ADMIN_ID:
             is_premium_user = True  # Админ всегда Premium
         else:
-            is_premium_user = await sheets_manager.is_user_premium(user_id)
+            quota = await user_quota.get(user_id)
+            is_premium_user = quota['is_premium']
             if not is_premium_user:
-                daily_count = await sheets_manager.get_user_daily_requests(user_id)
+                daily_count = quota['daily_requests']
                 if daily_count >= FREE_DAILY_LIMIT:
                     logger.info(f"User {user_id}: Daily limit reached ({daily_count}/{FREE_DAILY_LIMIT})")
                     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -133,17 +287,44 @@ async def handle_url_message(message: types.Message):
             )
 
             try:
-                # Загружаем медиа (используем url_info.url - может быть нормализован)
-                download_result = await media_downloader.download(
-                    url=url_info.url,
-                    content_type=url_info.content_type,
-                    platform=platform_name,
+                content_key = sent_content_key(
+                    url_info.platform.value, url_info.post_id, url_info.content_type
                 )
 
+                async def fetch() -> DownloadInfo:
+                    # Загружаем медиа (используем url_info.url - может быть нормализован)
+                    status_header = (
+                        f"{platform_emoji} *Загрузка с {platform_name}...*\n\n"
+                        f"📝 Тип: {content_type_text}"
+                    )
+                    with progress_updates(status_msg, status_header) as on_progress:
+                        result = await media_downloader.download(
+                            url=url_info.url,
+                            content_type=url_info.content_type,
+                            platform=platform_name,
+                            post_id=url_info.post_id,
+                            on_queued=queue_status_updater(status_msg, status_header),
+                            on_progress=on_progress,
+                        )
+                    if url_info.content_type in ["video", "reel", "shorts", "clip"]:
+                        result = await fit_oversized_video(
+                            result, content_key, status_msg, status_header
+                        )
+                    return result
+
+                # Пост уже отправлялся - файл перешлём по file_id, загрузка не нужна
+                registered = await get_registered_media(content_key)
+                if registered and registered.get("info"):
+                    download_result = DownloadInfo.from_dict(registered["info"])
+                else:
+                    registered = None
+                    download_result = await fetch()
+
                 await process_download_result(
                     message, status_msg, download_result, url, url_info,
                     platform_emoji, platform_name, user_id, username, start_time,
-                    daily_count=daily_count, is_premium=is_premium_user
+                    daily_count=daily_count, is_premium=is_premium_user,
+                    content_key=content_key, registered=registered, refetch=fetch
                 )
 
             except Exception as e:
@@ -168,6 +349,8 @@ async def handle_url_message(message: types.Message):
 
                 # Получаем понятное сообщение об ошибке
                 error_message, keyboard_data = format_error_with_retry(error_type, url)
+                if isinstance(e, CircuitOpenError):
+                    error_message += f"\n\n🕐 Повторите после {e.retry_at_text}"
 
                 # Создаем клавиатуру если нужна кнопка повтора
                 keyboard = None
@@ -285,6 +468,13 @@ async def handle_youtube_quality_selection(message: types.Message, url: str, pla
             "original_message_id": message.message_id
         }
 
+        # Пока пользователь выбирает, качаем в фоне 360p и аудио
+        def forget_selection(message_id=msg.message_id):
+            youtube_urls_cache.pop(message_id, None)
+            youtube_formats_cache.pop(message_id, None)
+
+        youtube_prefetcher.start(msg.message_id, url, on_expire=forget_selection)
+
         logger.info(f"User {user_id}: YouTube quality selection shown for {url}")
 
     except Exception as e:
@@ -314,7 +504,7 @@ async def handle_youtube_quality_callback(callback: CallbackQuery):
         username = cache_data.get("username", callback.from_user.username)
 
         # Проверяем Premium статус для HD качества
-        is_premium = await sheets_manager.is_user_premium(user_id)
+        is_premium = await user_quota.is_premium(user_id)
 
         # Если качество НЕ 360p и пользователь НЕ Premium - показываем PRO-экран
         if quality != 360 and not is_premium:
@@ -336,6 +526,7 @@ async def handle_youtube_quality_callback(callback: CallbackQuery):
             return
 
         # 360p бесплатно или Premium пользователь - скачиваем
+        youtube_prefetcher.choose(message_id, f"{quality}p")
         await callback.answer("⏳ Начинаю загрузку...")
 
         await callback.message.edit_text(
@@ -357,13 +548,42 @@ async def handle_youtube_quality_callback(callback: CallbackQuery):
             content_type=f"video_{quality}p"
         )
 
-        # Скачиваем видео
-        download_result = await media_downloader.download_youtube_quality(url, quality)
+        # Видео уже отправлялось - перешлём по file_id, иначе скачиваем
+        content_key = sent_content_key("youtube", url_processor.process(url).post_id, f"video_{quality}p")
+
+        async def fetch() -> DownloadInfo:
+            try:
+                status_header = f"🎥 *YouTube*\n\n⏳ Загрузка в {quality}p..."
+                with progress_updates(callback.message, status_header) as on_progress:
+                    result = await media_downloader.download_youtube_quality(
+                        url, quality,
+                        on_queued=queue_status_updater(callback.message, status_header),
+                        on_progress=on_progress,
+                    )
+                return await fit_oversized_video(
+                    result, content_key, callback.message, status_header
+                )
+            except QueueFullError:
+                return DownloadInfo(success=False, platform="YouTube",
+                                    error_message=QUEUE_FULL_MESSAGE)
+            except CircuitOpenError as e:
+                return DownloadInfo(success=False, platform="YouTube",
+                                    error_message=e.user_message)
+
+        registered = await get_registered_media(content_key)
+        if registered and registered.get("info"):
+            download_result = DownloadInfo.from_dict(registered["info"])
+        else:
+            registered = None
+            download_result = await fetch()
 
         if download_result.success and download_result.file_path:
             file_size_mb = download_result.file_size / (1024 * 1024)
             processing_time = time.time() - start_time
 
+            # Дневной лимит бесплатных скачиваний
+            await user_quota.record_success(user_id)
+
             # Логируем в Google Sheets
             await sheets_manager.log_request(
                 user_id=user_id,
@@ -425,12 +645,21 @@ async def handle_youtube_quality_callback(callback: CallbackQuery):
             except:
                 pass
 
-            # Отправляем видео
-            await callback.message.answer_video(
-                types.FSInputFile(download_result.file_path),
-                caption=caption,
-                parse_mode="Markdown"
-            )
+            # Отправляем видео: по file_id или загрузкой файла
+            # (файл защищён от вытеснения из кэша на время отправки)
+            if not (registered and await send_registered_media(
+                    callback.message, content_key, caption=caption,
+                    parse_mode="Markdown", record=registered)):
+                if registered:
+                    download_result = await refetch_media(fetch)
+                with download_cache.pinned([download_result.file_path]):
+                    sent = await send_within_deadline(callback.message.answer_video(
+                        types.FSInputFile(download_result.file_path),
+                        caption=caption,
+                        parse_mode="Markdown",
+                        **video_send_kwargs(download_result, download_result.file_path)
+                    ), start_time, "youtube")
+                await register_sent_media(content_key, sent, asdict(download_result))
 
             # Удаляем оригинальное сообщение с URL
             try:
@@ -474,6 +703,10 @@ async def handle_youtube_quality_callback(callback: CallbackQuery):
         youtube_urls_cache.pop(message_id, None)
         youtube_formats_cache.pop(message_id, None)
 
+    except DownloadTimeoutError as e:
+        # Статусное сообщение уже удалено - сообщаем отдельным
+        logger.warning(f"YouTube quality callback: {e}")
+        await callback.message.answer(f"⌛ {e.user_message}")
     except Exception as e:
         logger.error(f"Error in YouTube quality callback: {e}")
         await callback.answer(f"Ошибка: {safe_format_error(e, 50)}", show_alert=True)
@@ -533,6 +766,7 @@ async def handle_youtube_audio_callback(callback: CallbackQuery):
         user_id = cache_data.get("user_id", callback.from_user.id)
         username = cache_data.get("username", callback.from_user.username)
 
+        youtube_prefetcher.choose(message_id, VARIANT_AUDIO)
         await callback.answer("⏳ Начинаю загрузку аудио...")
 
         await callback.message.edit_text(
@@ -554,13 +788,39 @@ async def handle_youtube_audio_callback(callback: CallbackQuery):
             content_type="audio"
         )
 
-        # Скачиваем аудио
-        download_result = await media_downloader.download_youtube_audio(url)
+        # Аудио уже отправлялось - перешлём по file_id, иначе скачиваем
+        content_key = sent_content_key("youtube", url_processor.process(url).post_id, "audio")
+
+        async def fetch() -> DownloadInfo:
+            try:
+                status_header = "🎵 *YouTube*\n\n⏳ Загрузка аудио (MP3)..."
+                with progress_updates(callback.message, status_header) as on_progress:
+                    return await media_downloader.download_youtube_audio(
+                        url,
+                        on_queued=queue_status_updater(callback.message, status_header),
+                        on_progress=on_progress,
+                    )
+            except QueueFullError:
+                return DownloadInfo(success=False, platform="YouTube",
+                                    error_message=QUEUE_FULL_MESSAGE)
+            except CircuitOpenError as e:
+                return DownloadInfo(success=False, platform="YouTube",
+                                    error_message=e.user_message)
+
+        registered = await get_registered_media(content_key)
+        if registered and registered.get("info"):
+            download_result = DownloadInfo.from_dict(registered["info"])
+        else:
+            registered = None
+            download_result = await fetch()
 
         if download_result.success and download_result.file_path:
             file_size_mb = download_result.file_size / (1024 * 1024)
             processing_time = time.time() - start_time
 
+            # Дневной лимит бесплатных скачиваний
+            await user_quota.record_success(user_id)
+
             # Логируем в Google Sheets
             await sheets_manager.log_request(
                 user_id=user_id,
@@ -608,14 +868,22 @@ async def handle_youtube_audio_callback(callback: CallbackQuery):
             except:
                 pass
 
-            # Отправляем аудио
-            await callback.message.answer_audio(
-                types.FSInputFile(download_result.file_path),
-                title=download_result.title or "YouTube Audio",
-                performer=download_result.author,
-                caption=caption,
-                parse_mode="Markdown"
-            )
+            # Отправляем аудио: по file_id или загрузкой файла
+            # (файл защищён от вытеснения из кэша на время отправки)
+            if not (registered and await send_registered_media(
+                    callback.message, content_key, caption=caption,
+                    parse_mode="Markdown", record=registered)):
+                if registered:
+                    download_result = await refetch_media(fetch)
+                with download_cache.pinned([download_result.file_path]):
+                    sent = await send_within_deadline(callback.message.answer_audio(
+                        types.FSInputFile(download_result.file_path),
+                        title=download_result.title or "YouTube Audio",
+                        performer=download_result.author,
+                        caption=caption,
+                        parse_mode="Markdown"
+                    ), start_time, "youtube")
+                await register_sent_media(content_key, sent, asdict(download_result))
 
             # Удаляем оригинальное сообщение с URL
             try:
@@ -659,6 +927,10 @@ async def handle_youtube_audio_callback(callback: CallbackQuery):
         youtube_urls_cache.pop(message_id, None)
         youtube_formats_cache.pop(message_id, None)
 
+    except DownloadTimeoutError as e:
+        # Статусное сообщение уже удалено - сообщаем отдельным
+        logger.warning(f"YouTube audio callback: {e}")
+        await callback.message.answer(f"⌛ {e.user_message}")
     except Exception as e:
         logger.error(f"Error in YouTube audio callback: {e}")
         await callback.answer(f"Ошибка: {safe_format_error(e, 50)}", show_alert=True)
@@ -666,8 +938,14 @@ async def handle_youtube_audio_callback(callback: CallbackQuery):
 
 async def process_download_result(message, status_msg, download_result, url, url_info,
                                    platform_emoji, platform_name, user_id, username, start_time,
-                                   daily_count: int = 0, is_premium: bool = False):
-    """Обрабатывает результат загрузки и отправляет файл"""
+                                   daily_count: int = 0, is_premium: bool = False,
+                                   content_key: str = None, registered: dict = None,
+                                   refetch=None):
+    """Обрабатывает результат загрузки и отправляет файл.
+
+    registered - запись реестра file_id, из которой взят download_result;
+    refetch - загрузка файла, если Telegram отклонит сохранённый file_id.
+    """
 
     # Обработка слишком большого файла
     if download_result.success and download_result.is_too_large:
@@ -717,14 +995,7 @@ async def process_download_result(message, status_msg, download_result, url, url
                 reply_markup=keyboard
             )
 
-        # Удаляем файл если не Premium
-        if not is_premium and file_path:
-            try:
-                import os
-                os.remove(file_path)
-            except:
-                pass
-
+        # Файл не удаляем - он принадлежит кэшу загрузок (удаляется вытеснением MediaStore)
         return
 
     if download_result.success and download_result.file_path:
@@ -782,15 +1053,11 @@ async def process_download_result(message, status_msg, download_result, url, url
                     reply_markup=keyboard
                 )
 
-                # Удаляем файл
-                try:
-                    import os
-                    os.remove(file_path)
-                except:
-                    pass
-
             return
 
+        # Дневной лимит бесплатных скачиваний
+        await user_quota.record_success(user_id)
+
         # Логируем в Google Sheets
         await sheets_manager.log_request(
             user_id=user_id,
@@ -872,17 +1139,41 @@ async def process_download_result(message, status_msg, download_result, url, url
         except:
             pass
 
+        # Файлы защищены от вытеснения из кэша загрузок, пока идёт отправка
+        sent_paths = download_result.file_paths or [file_path]
+        download_cache.pin(sent_paths)
+
         # Отправляем файл(ы)
         try:
+            # Уже отправлялось - пересылаем по file_id без загрузки файла
+            sent_by_file_id = False
+            if registered:
+                sent_by_file_id = await send_registered_media(
+                    message, content_key, caption=caption if caption else None,
+                    parse_mode="Markdown", record=registered
+                )
+                if not sent_by_file_id:
+                    # Путь из записи реестра не проверен - отправляем только свежий файл
+                    download_result = await refetch_media(refetch)
+                    file_path = download_result.file_path
+                    fresh_paths = download_result.file_paths or [file_path]
+                    download_cache.pin(fresh_paths)
+                    sent_paths = sent_paths + fresh_paths
+            sent = None
+
+            if sent_by_file_id:
+                pass
+
             # Проверяем - это карусель?
-            if download_result.is_carousel and download_result.file_paths:
+            elif download_result.is_carousel and download_result.file_paths:
                 media_group = []
                 for i, fpath in enumerate(download_result.file_paths):
                     if fpath.endswith(('.mp4', '.mov', '.avi', '.webm')):
                         media_item = types.InputMediaVideo(
                             media=types.FSInputFile(fpath),
                             caption=caption if i == 0 else None,
-                            parse_mode="Markdown" if i == 0 else None
+                            parse_mode="Markdown" if i == 0 else None,
+                            **video_send_kwargs(download_result, fpath)
                         )
                     else:
                         media_item = types.InputMediaPhoto(
@@ -895,41 +1186,48 @@ async def process_download_result(message, status_msg, download_result, url, url
                 if len(media_group) > 10:
                     media_group = media_group[:10]
 
-                await message.answer_media_group(media_group)
+                sent = await send_within_deadline(
+                    message.answer_media_group(media_group), start_time, platform_name
+                )
 
             elif url_info.content_type in ["video", "reel", "shorts", "clip"]:
-                await message.answer_video(
+                sent = await send_within_deadline(message.answer_video(
                     types.FSInputFile(file_path),
                     caption=caption if caption else None,
-                    parse_mode="Markdown"
-                )
+                    parse_mode="Markdown",
+                    **video_send_kwargs(download_result, file_path)
+                ), start_time, platform_name)
             elif url_info.content_type == "audio":
-                await message.answer_audio(
+                sent = await send_within_deadline(message.answer_audio(
                     types.FSInputFile(file_path),
                     title=download_result.title or "Audio",
                     caption=caption if caption else None,
                     parse_mode="Markdown"
-                )
+                ), start_time, platform_name)
             elif url_info.content_type == "photo":
-                await message.answer_photo(
+                sent = await send_within_deadline(message.answer_photo(
                     types.FSInputFile(file_path),
                     caption=caption if caption else None,
                     parse_mode="Markdown"
-                )
+                ), start_time, platform_name)
             else:
-                await message.answer_document(
+                sent = await send_within_deadline(message.answer_document(
                     types.FSInputFile(file_path),
                     caption=caption if caption else None,
                     parse_mode="Markdown"
-                )
+                ), start_time, platform_name)
+
+            if not sent_by_file_id:
+                await register_sent_media(content_key, sent, asdict(download_result))
 
-            # Собираем пути к изображениям для OCR
+            # Собираем пути к изображениям для OCR (локальные файлы могли быть уже удалены)
             all_image_paths = []
             if download_result.is_carousel and download_result.file_paths:
                 all_image_paths = [p for p in download_result.file_paths
                                  if p.endswith(('.jpg', '.jpeg', '.png', '.webp'))]
             elif file_path.endswith(('.jpg', '.jpeg', '.png', '.webp')):
                 all_image_paths = [file_path]
+            all_image_paths = [p for p in all_image_paths if os.path.exists(p)]
 
             # Проверяем, есть ли текст на изображениях
             has_image_text = False
@@ -998,7 +1296,7 @@ async def process_download_result(message, status_msg, download_result, url, url
                         url=url,
                         platform=platform_name,
                         content_type=url_info.content_type,
-                        file_path=file_path if not download_result.is_carousel else None,
+                        file_path=download_result.shared_path(file_path) if not download_result.is_carousel else None,
                         file_size=int(file_size_mb * 1024 * 1024),
                         title=download_result.title or "",
                         author=download_result.author or "",
@@ -1039,12 +1337,18 @@ async def process_download_result(message, status_msg, download_result, url, url
 
                     await message.answer(limit_text, parse_mode="HTML", reply_markup=keyboard)
 
+        except DownloadTimeoutError as e:
+            # Отправка не уложилась в остаток дедлайна запроса
+            logger.warning(f"User {user_id}: {e}")
+            await message.answer(f"⌛ {e.user_message}")
         except Exception as e:
             logger.error(f"Error sending file: {str(e)}")
             await message.answer(
                 f"⚠️ Файл загружен, но не удалось отправить\n"
                 f"Ошибка: {str(e)[:100]}"
             )
+        finally:
+            download_cache.unpin(sent_paths)
 
     else:
         # Ошибка загрузки
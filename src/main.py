@@ -9,7 +9,10 @@ from src.config import config
 from src.handlers import start, help, url_handler, commands
 from src.utils.notifications import notification_manager
 from src.utils.sheets import sheets_manager
+from src.utils.user_quota import user_quota
+from src.utils.sheets_mirror import sheets_mirror
 from src.database.db_manager import init_database
+from src.downloaders.media_downloader import media_downloader
 
 logger = get_logger(__name__)
 
@@ -36,6 +39,18 @@ async def auto_update_ytdlp_loop() -> None:
         await asyncio.sleep(24 * 60 * 60)
         logger.info("Running scheduled yt-dlp update...")
         await asyncio.get_event_loop().run_in_executor(None, update_ytdlp)
+        # Процессы yt-dlp держат старую версию в памяти
+        media_downloader.restart_workers()
+
+
+async def blob_sweep_loop() -> None:
+    """Remove deduplication blobs nothing refers to any more."""
+    while True:
+        await asyncio.sleep(config.BLOB_SWEEP_INTERVAL)
+        try:
+            await media_downloader.sweep_blobs()
+        except Exception as e:
+            logger.warning(f"Blob sweep error: {e}")
 
 # Global bot reference for signal handlers
 _bot = None
@@ -58,9 +73,13 @@ async def main() -> None:
     bot = None
     try:
         # Initialize database
-        init_database(config.DATABASE_PATH)
+        db = init_database(config.DATABASE_PATH)
         logger.info(f"Database initialized at {config.DATABASE_PATH}")
 
+        # Файлы избранного не вытесняются из хранилища загрузок
+        media_downloader.store.set_favorites(await db.get_favorite_file_paths())
+        media_downloader.index_store()
+
         # Create bot instance
         bot, dp = await create_bot()
         _bot = bot
@@ -75,6 +94,13 @@ async def main() -> None:
         else:
             logger.warning("Google Sheets not available - stats will not be recorded")
 
+        # Премиум-статус из листа Users -> локальная БД (лимиты проверяются по БД)
+        user_quota.start()
+        # Отправка накопленных в spool строк и строки дня в лист Stats
+        sheets_manager.start()
+        # Локальная копия Users/Requests для админ-команд
+        sheets_mirror.start()
+
         # Register routers
         dp.include_router(start.router)
         dp.include_router(help.router)
@@ -87,6 +113,10 @@ async def main() -> None:
 
         # Start background yt-dlp auto-update (every 24h)
         asyncio.create_task(auto_update_ytdlp_loop())
+        asyncio.create_task(blob_sweep_loop())
+
+        # Докачиваем загрузки, прерванные прошлым перезапуском
+        media_downloader.resume_interrupted_jobs()
 
         await dp.start_polling(bot)
 
@@ -94,6 +124,12 @@ async def main() -> None:
         logger.error(f"Fatal error: {e}", exc_info=True)
         raise
     finally:
+        # Загрузки, отменённые остановкой, возобновятся после перезапуска
+        media_downloader.begin_shutdown()
+        user_quota.stop()
+        sheets_mirror.stop()
+        await sheets_manager.close()
+        await media_downloader.close()
         if bot:
             await close_bot(bot)
         logger.info("=" * 60)
@@ -0,0 +1,267 @@
+"""
+Circuit Breaker - общая для всех загрузок защита от блокировок платформ
+После серии ответов 429 / требований логина платформа считается
+заблокировавшей бота: новые запросы к ней не отправляются до времени
+retry_at, затем один пробный запрос проверяет, снята ли блокировка.
+Паузы между повторами - экспоненциальные со случайным разбросом и общие для
+всех задач платформы
+"""
+import asyncio
+import random
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Optional
+from src.utils.logger import get_logger
+from src.config import config
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Признаки того, что платформа ограничила бота (а не проблема с конкретным постом)
+THROTTLE_MARKERS = (
+    "429",
+    "too many requests",
+    "rate-limit",
+    "rate limit",
+    "login required",
+    "please log in",
+    "checkpoint_required",
+    "error 401",
+)
+
+
+def is_throttle_error(error: Any) -> bool:
+    """Ошибка означает rate limit или требование авторизации"""
+    text = str(error).lower()
+    return any(marker in text for marker in THROTTLE_MARKERS)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Экспоненциальная пауза со случайным разбросом (equal jitter).
+
+    Args:
+        attempt: Номер неудачной попытки подряд (с 1)
+        base: Пауза после первой неудачи
+        cap: Максимальная пауза
+
+    Returns:
+        Пауза в секундах из [delay/2, delay]
+    """
+    delay = min(cap, base * 2 ** max(0, attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class CircuitOpenError(Exception):
+    """Платформа временно заблокировала бота - запрос не отправлялся"""
+
+    def __init__(self, platform: str, retry_at: float):
+        self.platform = platform
+        self.retry_at = retry_at
+        super().__init__(
+            f"Circuit open for {platform}: too many requests, retry at "
+            f"{time.strftime('%H:%M:%S', time.localtime(retry_at))}"
+        )
+
+    @property
+    def retry_at_text(self) -> str:
+        """Время, после которого можно повторить (ЧЧ:ММ)"""
+        return time.strftime("%H:%M", time.localtime(self.retry_at))
+
+    @property
+    def user_message(self) -> str:
+        """Сообщение для пользователя"""
+        return f"Платформа временно ограничила запросы. Попробуйте после {self.retry_at_text}"
+
+
+class _Circuit:
+    """Состояние одной платформы"""
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures: Deque[float] = deque()  # Время недавних блокировок
+        self.consecutive = 0  # Блокировок подряд (для паузы между повторами)
+        self.resume_at = 0.0  # Общая пауза: до этого времени запросы не отправляются
+        self.retry_at = 0.0  # Когда открытый автомат пропустит пробный запрос
+        self.opens = 0  # Открытий подряд (для длительности блокировки)
+        self.probing = False
+
+        # Статистика
+        self.total_opens = 0
+        self.rejected = 0
+
+
+class CircuitBreaker:
+    """Автоматы по платформам"""
+
+    def __init__(self, threshold: int, window: float, cooldown: float, max_cooldown: float,
+                 backoff_base: float, backoff_max: float, max_defer: float):
+        """Инициализация.
+
+        Args:
+            threshold: Сколько блокировок за window открывают автомат
+            window: Окно подсчёта блокировок (сек)
+            cooldown: Длительность первого открытия (сек), дальше удваивается
+            max_cooldown: Максимальная длительность открытия (сек)
+            backoff_base: Пауза после первой блокировки (сек)
+            backoff_max: Максимальная пауза между повторами (сек)
+            max_defer: Если блокировка скоро закончится (сек) - ждём, а не отказываем
+        """
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_defer = max_defer
+        self._circuits: Dict[str, _Circuit] = defaultdict(_Circuit)
+
+    def check(self, platform: str) -> None:
+        """Быстрая проверка перед постановкой задачи в очередь.
+
+        Raises:
+            CircuitOpenError: Платформа заблокирована дольше, чем max_defer
+        """
+        circuit = self._circuits[platform.lower()]
+        if circuit.state == OPEN and circuit.retry_at - time.time() > self.max_defer:
+            circuit.rejected += 1
+            raise CircuitOpenError(platform.lower(), circuit.retry_at)
+
+    def available_at(self, platform: str) -> float:
+        """Время, с которого к платформе можно отправить запрос без ожидания.
+
+        Пробный запрос уже отправлен - остальные ждут его результата,
+        поэтому платформа считается занятой ещё секунду.
+        """
+        circuit = self._circuits.get(platform.lower())
+        if circuit is None:
+            return 0.0
+        if circuit.state == OPEN:
+            return circuit.retry_at
+        if circuit.state == HALF_OPEN:
+            return time.time() + 1.0 if circuit.probing else 0.0
+        return circuit.resume_at
+
+    async def acquire(self, platform: str) -> None:
+        """Ждёт, пока к платформе можно отправить запрос.
+
+        Общая пауза после блокировки выдерживается всегда; открытый автомат
+        ждём не дольше max_defer. Первый запрос после открытия становится
+        пробным, остальные ждут его результата.
+
+        Raises:
+            CircuitOpenError: Платформа заблокирована дольше, чем max_defer
+        """
+        name = platform.lower()
+        circuit = self._circuits[name]
+        deadline = time.time() + self.max_defer
+
+        while True:
+            now = time.time()
+            if circuit.state == OPEN:
+                if now >= circuit.retry_at:
+                    circuit.state = HALF_OPEN
+                    circuit.probing = True
+                    logger.info(f"Circuit half-open for {name}: sending probe request")
+                    return
+                if circuit.retry_at > deadline:
+                    circuit.rejected += 1
+                    raise CircuitOpenError(name, circuit.retry_at)
+                await asyncio.sleep(circuit.retry_at - now)
+                continue
+
+            if circuit.state == HALF_OPEN:
+                if not circuit.probing:
+                    circuit.probing = True
+                    return
+                if now >= deadline:
+                    circuit.rejected += 1
+                    raise CircuitOpenError(name, now + self.cooldown)
+                await asyncio.sleep(min(1.0, deadline - now))
+                continue
+
+            if now < circuit.resume_at:
+                await asyncio.sleep(circuit.resume_at - now)
+                continue
+            return
+
+    def record_success(self, platform: str) -> None:
+        """Запрос к платформе прошёл"""
+        name = platform.lower()
+        circuit = self._circuits[name]
+        if circuit.state != CLOSED:
+            logger.info(f"Circuit closed for {name}")
+        circuit.state = CLOSED
+        circuit.probing = False
+        circuit.failures.clear()
+        circuit.consecutive = 0
+        circuit.opens = 0
+
+    def record_failure(self, platform: str, error: Any) -> None:
+        """Запрос к платформе завершился ошибкой.
+
+        Ошибки, не связанные с блокировкой, состояние не меняют (кроме
+        освобождения пробного запроса).
+        """
+        name = platform.lower()
+        circuit = self._circuits[name]
+        if not is_throttle_error(error):
+            circuit.probing = False
+            return
+
+        now = time.time()
+        circuit.consecutive += 1
+        circuit.failures.append(now)
+        while circuit.failures and now - circuit.failures[0] > self.window:
+            circuit.failures.popleft()
+
+        if circuit.state == HALF_OPEN or len(circuit.failures) >= self.threshold:
+            self._open(name, circuit, now)
+        else:
+            # Все задачи платформы делают паузу вместе
+            delay = backoff_delay(circuit.consecutive, self.backoff_base, self.backoff_max)
+            circuit.resume_at = max(circuit.resume_at, now + delay)
+            logger.info(f"{name} throttled, pausing requests for {delay:.0f}s")
+
+    def _open(self, name: str, circuit: _Circuit, now: float) -> None:
+        # Каждое повторное открытие вдвое дольше; разброс - чтобы боты/процессы не вернулись разом
+        cooldown = min(self.max_cooldown, self.cooldown * 2 ** circuit.opens)
+        cooldown += random.uniform(0, cooldown / 4)
+        circuit.state = OPEN
+        circuit.probing = False
+        circuit.retry_at = now + cooldown
+        circuit.opens += 1
+        circuit.total_opens += 1
+        circuit.failures.clear()
+        logger.warning(f"Circuit opened for {name}: requests paused for {cooldown:.0f}s")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Состояние автоматов.
+
+        Returns:
+            Словарь: платформа -> {state, retry_at, recent_failures, opens, rejected}
+        """
+        return {
+            name: {
+                "state": circuit.state,
+                "retry_at": circuit.retry_at if circuit.state == OPEN else None,
+                "recent_failures": len(circuit.failures),
+                "opens": circuit.total_opens,
+                "rejected": circuit.rejected,
+            }
+            for name, circuit in self._circuits.items()
+        }
+
+
+# Singleton instance
+circuit_breaker = CircuitBreaker(
+    threshold=config.CIRCUIT_FAILURE_THRESHOLD,
+    window=config.CIRCUIT_WINDOW,
+    cooldown=config.CIRCUIT_COOLDOWN,
+    max_cooldown=config.CIRCUIT_MAX_COOLDOWN,
+    backoff_base=config.RETRY_BACKOFF_BASE,
+    backoff_max=config.RETRY_BACKOFF_MAX,
+    max_defer=config.CIRCUIT_MAX_DEFER,
+)
@@ -0,0 +1,196 @@
+"""
+Daily Stats - счётчики за текущий день для листа Stats
+Раньше строка Stats пересчитывалась из всей истории листов Requests и
+Users (get_all_records), и с каждым днём это становилось медленнее.
+Теперь счётчики увеличиваются по мере логирования запросов, хранятся
+в локальном JSON-файле (переживают перезапуск) и в таблицу уходит
+только одна строка дня - по таймеру.
+"""
+import asyncio
+import copy
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Изменения счётчиков за это время записываются на диск одним сохранением
+SAVE_DELAY = 5.0
+
+# Платформы с отдельной колонкой в листе Stats
+PLATFORMS = ("instagram", "youtube", "tiktok", "twitter", "vk")
+
+
+def _today() -> str:
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+def _empty_day(date: str) -> Dict[str, Any]:
+    return {
+        "date": date,
+        "new_users": 0,
+        "active_users": [],
+        "requests": 0,
+        "successful": 0,
+        "failed": 0,
+        "platforms": {platform: 0 for platform in PLATFORMS},
+        "total_mb": 0.0,
+        "ai_translations": 0,
+        "ai_rewrites": 0,
+        "ai_ocr": 0,
+    }
+
+
+class DailyStats:
+    """Инкрементальные дневные агрегаты"""
+
+    def __init__(self, path: Path):
+        """Инициализация.
+
+        Args:
+            path: JSON-файл со счётчиками текущего дня
+        """
+        self.path = path
+        state = self._load()
+        # Всего пользователей (None - ещё не известно, берётся из листа Users один раз)
+        self.total_users: Optional[int] = state.get("total_users")
+        self._day: Dict[str, Any] = state.get("day") or _empty_day(_today())
+        # Итоги прошедшего дня, ещё не отправленные в таблицу
+        self._previous: Optional[Dict[str, Any]] = state.get("previous")
+        self._active = set(self._day["active_users"])
+        # Отложенное сохранение (в цикле событий)
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self._write_lock = threading.Lock()
+        self._version = 0  # Номер снимка: запоздавшая запись не затирает более новую
+        self._written_version = 0
+
+    def _load(self) -> Dict[str, Any]:
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading daily stats: {e}")
+        return {}
+
+    def _snapshot(self) -> Tuple[int, Dict[str, Any]]:
+        self._version += 1
+        return self._version, {
+            "total_users": self.total_users,
+            "day": copy.deepcopy(self._day),
+            "previous": copy.deepcopy(self._previous),
+        }
+
+    def _write(self, snapshot: Tuple[int, Dict[str, Any]]) -> None:
+        version, data = snapshot
+        with self._write_lock:
+            if version < self._written_version:
+                return
+            self._written_version = version
+            try:
+                tmp_path = self.path.with_suffix(".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.error(f"Error saving daily stats: {e}")
+
+    def _save(self) -> None:
+        """Сохраняет счётчики: в цикле событий - через SAVE_DELAY в executor, иначе сразу"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(self._snapshot())
+            return
+        if self._save_handle is None:
+            self._save_handle = loop.call_later(SAVE_DELAY, self._save_later, loop)
+
+    def _save_later(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._save_handle = None
+        loop.run_in_executor(None, self._write, self._snapshot())
+
+    def flush(self) -> None:
+        """Немедленно сохраняет отложенные изменения (при остановке)"""
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+            self._write(self._snapshot())
+
+    def _current(self) -> Dict[str, Any]:
+        """Счётчики сегодняшнего дня (со сменой дня в полночь)"""
+        today = _today()
+        if self._day["date"] != today:
+            self._previous = self._day
+            self._day = _empty_day(today)
+            self._active = set()
+        return self._day
+
+    def record_request(self, user_id: int, platform: str, success: bool,
+                       file_size_mb: float = 0, ai_type: str = None) -> None:
+        """Учитывает запрос (те же поля, что пишутся в лист Requests)"""
+        day = self._current()
+        day["requests"] += 1
+        if success:
+            day["successful"] += 1
+        else:
+            day["failed"] += 1
+
+        platform = (platform or "").lower()
+        if platform in day["platforms"]:
+            day["platforms"][platform] += 1
+        day["total_mb"] += file_size_mb or 0
+
+        ai_type = (ai_type or "").lower()
+        if "translat" in ai_type:
+            day["ai_translations"] += 1
+        elif "rewrite" in ai_type:
+            day["ai_rewrites"] += 1
+        elif "ocr" in ai_type:
+            day["ai_ocr"] += 1
+
+        if user_id not in self._active:
+            self._active.add(user_id)
+            day["active_users"].append(user_id)
+        self._save()
+
+    def record_new_user(self) -> None:
+        """Учитывает нового пользователя"""
+        self._current()["new_users"] += 1
+        if self.total_users is not None:
+            self.total_users += 1
+        self._save()
+
+    def set_total_users(self, total: int) -> None:
+        self.total_users = total
+        self._save()
+
+    @staticmethod
+    def _row(day: Dict[str, Any], total_users: int) -> List[Any]:
+        platforms = day["platforms"]
+        return [
+            day["date"], total_users, day["new_users"], len(day["active_users"]),
+            day["requests"], day["successful"], day["failed"],
+            platforms["instagram"], platforms["youtube"], platforms["tiktok"],
+            platforms["twitter"], platforms["vk"],
+            round(day["total_mb"], 2), day["ai_translations"], day["ai_rewrites"], day["ai_ocr"]
+        ]
+
+    def pending_rows(self) -> List[List[Any]]:
+        """Строки для листа Stats: итоги вчера (если не отправлены) и сегодня"""
+        self._current()
+        total_users = self.total_users or 0
+        rows = []
+        if self._previous:
+            rows.append(self._row(self._previous, total_users))
+        rows.append(self._row(self._day, total_users))
+        return rows
+
+    def mark_pushed(self, dates: List[str]) -> None:
+        """Итоги прошедшего дня отправлены - больше не нужны"""
+        if self._previous and self._previous["date"] in dates:
+            self._previous = None
+            self._save()
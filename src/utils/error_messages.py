@@ -115,6 +115,22 @@ ERROR_MESSAGES: Dict[str, Dict[str, Any]] = {
         "retry_after": 120,
         "show_retry_button": True
     },
+    "queue_full": {
+        "emoji": "🚦",
+        "title": "Сервер перегружен",
+        "message": "Сейчас в очереди слишком много загрузок с этой платформы",
+        "suggestion": "Попробуйте через пару минут",
+        "retry_after": 60,
+        "show_retry_button": True
+    },
+    "platform_cooldown": {
+        "emoji": "🧊",
+        "title": "Платформа ограничила запросы",
+        "message": "Платформа временно ограничила запросы бота, загрузки с неё приостановлены",
+        "suggestion": "Попробуйте позже - другие платформы работают как обычно",
+        "retry_after": 300,
+        "show_retry_button": True
+    },
     "daily_limit_exceeded": {
         "emoji": "📊",
         "title": "Превышен дневной лимит",
@@ -137,6 +153,14 @@ def get_error_type_from_exception(error: Exception) -> str:
     """
     error_str = str(error).lower()
 
+    # Очередь загрузок переполнена
+    if "queue is full" in error_str:
+        return "queue_full"
+
+    # Circuit breaker: платформа заблокировала бота
+    if "circuit open" in error_str:
+        return "platform_cooldown"
+
     # Instagram errors
     if "429" in error_str or "too many requests" in error_str:
         return "instagram_rate_limit"
@@ -0,0 +1,135 @@
+"""
+Реестр Telegram file_id - повторная отправка медиа без загрузки файла
+После первой отправки Telegram возвращает file_id, по которому файл можно
+переслать любому пользователю одним API-вызовом (даже если локальный файл удалён)
+"""
+from typing import Any, Dict, List, Optional
+from aiogram import types
+from src.utils.logger import get_logger
+from src.database.db_manager import get_db_manager
+
+logger = get_logger(__name__)
+
+
+def extract_file_ids(sent) -> List[Dict[str, str]]:
+    """Извлекает file_id из отправленного сообщения или медиагруппы.
+
+    Args:
+        sent: Message или список Message (answer_media_group)
+
+    Returns:
+        Список {'type': ..., 'file_id': ...} в порядке отправки
+    """
+    messages = sent if isinstance(sent, list) else [sent]
+    files = []
+    for msg in messages:
+        if msg is None:
+            continue
+        if msg.video:
+            files.append({"type": "video", "file_id": msg.video.file_id})
+        elif msg.animation:
+            files.append({"type": "animation", "file_id": msg.animation.file_id})
+        elif msg.photo:
+            # Последний PhotoSize - максимальное разрешение
+            files.append({"type": "photo", "file_id": msg.photo[-1].file_id})
+        elif msg.audio:
+            files.append({"type": "audio", "file_id": msg.audio.file_id})
+        elif msg.document:
+            files.append({"type": "document", "file_id": msg.document.file_id})
+    return files
+
+
+async def get_registered_media(content_key: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Возвращает запись реестра для ключа контента (или None)"""
+    if not content_key:
+        return None
+    db = get_db_manager()
+    if not db:
+        return None
+    return await db.get_telegram_file(content_key)
+
+
+async def register_sent_media(content_key: Optional[str], sent,
+                              info: Optional[Dict[str, Any]] = None) -> None:
+    """Сохраняет file_id, полученные после первой отправки файла.
+
+    Args:
+        content_key: Ключ контента (platform:post_id:quality)
+        sent: Результат answer_video/answer_photo/answer_media_group/...
+        info: Поля DownloadInfo для формирования подписи при повторной отправке
+    """
+    if not content_key or sent is None:
+        return
+    db = get_db_manager()
+    if not db:
+        return
+
+    try:
+        files = extract_file_ids(sent)
+        if files:
+            await db.save_telegram_file(content_key, files, info)
+            logger.info(f"Registered {len(files)} file_id(s) for {content_key}")
+    except Exception as e:
+        logger.warning(f"Failed to register file_id for {content_key}: {e}")
+
+
+async def send_registered_media(message: types.Message, content_key: Optional[str],
+                                caption: Optional[str] = None,
+                                parse_mode: Optional[str] = None,
+                                record: Optional[Dict[str, Any]] = None) -> bool:
+    """Отправляет медиа по сохранённым file_id.
+
+    Args:
+        message: Сообщение, в чат которого отправляем
+        content_key: Ключ контента (platform:post_id:quality)
+        caption: Подпись
+        parse_mode: Режим разметки подписи
+        record: Уже полученная запись реестра (чтобы не читать БД повторно)
+
+    Returns:
+        True если отправлено, False если file_id нет или Telegram его отклонил
+    """
+    if record is None:
+        record = await get_registered_media(content_key)
+    if not record or not record.get("files"):
+        return False
+
+    files = record["files"]
+    info = record.get("info") or {}
+
+    try:
+        if len(files) > 1:
+            media_group = []
+            for i, item in enumerate(files[:10]):
+                media_cls = types.InputMediaVideo if item["type"] == "video" else types.InputMediaPhoto
+                media_group.append(media_cls(
+                    media=item["file_id"],
+                    caption=caption if i == 0 else None,
+                    parse_mode=parse_mode if i == 0 else None
+                ))
+            await message.answer_media_group(media_group)
+        else:
+            item = files[0]
+            file_id = item["file_id"]
+            if item["type"] == "video":
+                await message.answer_video(file_id, caption=caption, parse_mode=parse_mode)
+            elif item["type"] == "animation":
+                await message.answer_animation(file_id, caption=caption, parse_mode=parse_mode)
+            elif item["type"] == "photo":
+                await message.answer_photo(file_id, caption=caption, parse_mode=parse_mode)
+            elif item["type"] == "audio":
+                await message.answer_audio(file_id, caption=caption, parse_mode=parse_mode,
+                                           title=info.get("title"), performer=info.get("author"))
+            else:
+                await message.answer_document(file_id, caption=caption, parse_mode=parse_mode)
+
+        logger.info(f"Sent {content_key} by file_id (no upload)")
+        return True
+
+    except Exception as e:
+        # file_id мог стать недействительным - забываем его и отправляем файл заново
+        logger.warning(f"Failed to send {content_key} by file_id: {e}")
+        db = get_db_manager()
+        if db:
+            await db.delete_telegram_file(content_key)
+        return False
@@ -0,0 +1,225 @@
+"""
+Instagram Accounts - пул аккаунтов (файлов cookies) для запросов к Instagram
+Одного аккаунта хватает на один запрос в 5 секунд, поэтому запросы
+распределяются по нескольким аккаунтам. У каждого аккаунта своя полоса
+rate limiter и свой circuit breaker (пауза после 429 / требования логина),
+а оценка здоровья учитывает недавние блокировки. Задача получает самый
+здоровый свободный аккаунт, при равенстве - давно не использованный
+(round-robin).
+
+Аккаунты: основной файл instagram_cookies.txt (аккаунт "main") и
+<INSTAGRAM_ACCOUNTS_DIR>/<имя>.txt
+"""
+import asyncio
+import re
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from src.utils.logger import get_logger
+from src.utils.rate_limiter import RateLimiter, rate_limiter
+from src.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, circuit_breaker, is_throttle_error
+from src.config import config
+
+logger = get_logger(__name__)
+
+MAIN_ACCOUNT = "main"
+PLATFORM = "instagram"
+# Вес последнего результата в оценке здоровья
+HEALTH_DECAY = 0.2
+LOGIN_MARKERS = ("login", "redirect", "checkpoint_required", "error 401")
+
+
+def is_login_error(error: Any) -> bool:
+    """Instagram перенаправил на логин - cookies аккаунта устарели"""
+    text = str(error).lower()
+    return any(marker in text for marker in LOGIN_MARKERS)
+
+
+class InstagramAccount:
+    """Аккаунт пула: файл cookies и его состояние"""
+
+    def __init__(self, name: str, cookies_file: Path):
+        self.name = name
+        self.cookies_file = cookies_file
+        self.score = 1.0  # 1 - запросы проходят, ближе к 0 - частые блокировки
+        self.in_use = 0
+        self.last_used = 0.0
+        self.needs_login = False
+
+        # Статистика
+        self.requests = 0
+        self.throttled = 0
+
+    @property
+    def lane(self) -> str:
+        """Ключ rate limiter и circuit breaker аккаунта"""
+        return f"{PLATFORM}:{self.name}"
+
+
+# Аккаунт запроса, который сейчас выполняется (cookies для yt-dlp/gallery-dl)
+current_account: ContextVar[Optional[InstagramAccount]] = ContextVar("current_account", default=None)
+
+
+class InstagramAccountPool:
+    """Пул аккаунтов Instagram"""
+
+    def __init__(self, main_cookies: Path, accounts_dir: Path, limiter: RateLimiter,
+                 breaker: CircuitBreaker, max_defer: float):
+        """Инициализация пула.
+
+        Args:
+            main_cookies: Основной файл cookies (аккаунт "main")
+            accounts_dir: Директория с cookies дополнительных аккаунтов
+            limiter: Rate limiter (интервал полосы аккаунта - как у instagram)
+            breaker: Circuit breaker (пауза после блокировки - по аккаунту)
+            max_defer: Сколько ждать освобождения аккаунта, прежде чем отказать
+        """
+        self.main_cookies = main_cookies
+        self.accounts_dir = accounts_dir
+        self.limiter = limiter
+        self.breaker = breaker
+        self.max_defer = max_defer
+        self._accounts: Dict[str, InstagramAccount] = {}
+        self.reload()
+
+    def reload(self) -> None:
+        """Перечитывает список файлов cookies (состояние известных аккаунтов сохраняется)"""
+        files = {}
+        if self.main_cookies.exists():
+            files[MAIN_ACCOUNT] = self.main_cookies
+        if self.accounts_dir.is_dir():
+            for path in sorted(self.accounts_dir.glob("*.txt")):
+                files.setdefault(path.stem, path)
+        self._accounts = {
+            name: self._accounts.get(name) or InstagramAccount(name, path)
+            for name, path in files.items()
+        }
+        logger.info(f"Instagram account pool: {', '.join(self._accounts) or 'no cookies'}")
+
+    @property
+    def accounts(self) -> List[InstagramAccount]:
+        return list(self._accounts.values())
+
+    def get(self, name: str) -> Optional[InstagramAccount]:
+        return self._accounts.get(name)
+
+    def cookies_path(self, name: str) -> Path:
+        """Куда сохранять cookies аккаунта"""
+        if name == MAIN_ACCOUNT:
+            return self.main_cookies
+        return self.accounts_dir / f"{name}.txt"
+
+    @staticmethod
+    def valid_name(name: str) -> bool:
+        return bool(re.fullmatch(r"[A-Za-z0-9_-]{1,32}", name))
+
+    def _pick(self, now: float) -> Optional[InstagramAccount]:
+        """Самый здоровый свободный аккаунт из доступных сейчас"""
+        ready = [a for a in self._accounts.values() if self.breaker.available_at(a.lane) <= now]
+        if not ready:
+            return None
+        # Оценка округляется: мелкие различия не ломают очередность
+        return min(ready, key=lambda a: (a.needs_login, a.in_use, -round(a.score, 1), a.last_used))
+
+    def _retry_at(self) -> float:
+        return min(self.breaker.available_at(a.lane) for a in self._accounts.values())
+
+    def check(self) -> None:
+        """Быстрая проверка перед постановкой задачи в очередь.
+
+        Raises:
+            CircuitOpenError: Все аккаунты заблокированы дольше, чем max_defer
+        """
+        if self._accounts and self._pick(time.time()) is None:
+            retry_at = self._retry_at()
+            if retry_at - time.time() > self.max_defer:
+                raise CircuitOpenError(PLATFORM, retry_at)
+
+    async def acquire(self) -> Optional[InstagramAccount]:
+        """Выбирает аккаунт для запроса и выдерживает интервал его полосы.
+
+        Returns:
+            Аккаунт (вернуть через release) или None, если cookies нет
+
+        Raises:
+            CircuitOpenError: Все аккаунты заблокированы дольше, чем max_defer
+        """
+        if not self._accounts:
+            # Без cookies - анонимные запросы с общим интервалом
+            await self.limiter.wait_if_needed(PLATFORM)
+            return None
+
+        deadline = time.time() + self.max_defer
+        while True:
+            now = time.time()
+            account = self._pick(now)
+            if account is not None:
+                break
+            retry_at = self._retry_at()
+            if retry_at > deadline:
+                raise CircuitOpenError(PLATFORM, retry_at)
+            await asyncio.sleep(retry_at - now)
+
+        account.in_use += 1
+        account.last_used = now
+        try:
+            await self.limiter.wait_if_needed(account.lane)
+        except BaseException:
+            account.in_use -= 1
+            raise
+        return account
+
+    def release(self, account: Optional[InstagramAccount]) -> None:
+        """Запрос с аккаунтом завершён"""
+        if account is not None:
+            account.in_use -= 1
+
+    def record(self, account: Optional[InstagramAccount], error: Any = None) -> None:
+        """Учитывает результат запроса в оценке здоровья аккаунта.
+
+        Ошибки, не связанные с блокировкой (удалённый пост и т.п.), оценку не меняют.
+        """
+        if account is None:
+            return
+        account.requests += 1
+        if error is None:
+            account.score += (1 - account.score) * HEALTH_DECAY
+            account.needs_login = False
+        elif is_throttle_error(error) or is_login_error(error):
+            account.score *= 1 - HEALTH_DECAY * 2
+            account.throttled += 1
+            if is_login_error(error):
+                account.needs_login = True
+                logger.warning(f"Instagram account {account.name} requires login")
+
+    def cookie_args(self) -> List[str]:
+        """Аргументы gallery-dl с cookies аккаунта текущего запроса"""
+        account = current_account.get()
+        return ["--cookies", str(account.cookies_file)] if account is not None else []
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Состояние аккаунтов"""
+        now = time.time()
+        return [
+            {
+                "name": account.name,
+                "score": account.score,
+                "in_use": account.in_use,
+                "requests": account.requests,
+                "throttled": account.throttled,
+                "needs_login": account.needs_login,
+                "cooldown": max(0.0, self.breaker.available_at(account.lane) - now),
+            }
+            for account in self._accounts.values()
+        ]
+
+
+# Singleton instance
+instagram_accounts = InstagramAccountPool(
+    config.INSTAGRAM_COOKIES_FILE,
+    config.INSTAGRAM_ACCOUNTS_DIR,
+    limiter=rate_limiter,
+    breaker=circuit_breaker,
+    max_defer=config.CIRCUIT_MAX_DEFER,
+)
@@ -1,40 +1,36 @@
 """Instagram health check module."""
 import asyncio
-import subprocess
-from pathlib import Path
 from typing import Optional, Tuple
 from src.utils.logger import get_logger
 from src.config import config
+from src.downloaders.gallery_dl_runner import GalleryDlTimeout, run_gallery_dl
+from src.utils.instagram_accounts import MAIN_ACCOUNT, InstagramAccount, instagram_accounts
 
 logger = get_logger(__name__)
 
-COOKIES_FILE = Path("/opt/uspsocdowloader/instagram_cookies.txt")
 TEST_URL = "https://www.instagram.com/instagram/"  # Official Instagram account
 
 
-async def check_instagram_connection() -> Tuple[bool, str]:
+async def check_account(account: InstagramAccount) -> Tuple[bool, str]:
     """
-    Check if Instagram cookies are valid.
+    Check if cookies of one pool account are valid.
     Returns: (is_working, message)
     """
     try:
-        if not COOKIES_FILE.exists():
+        if not account.cookies_file.exists():
             return False, "Файл cookies не найден"
-        
-        loop = asyncio.get_event_loop()
-        
-        def run_check():
-            result = subprocess.run(
-                ["gallery-dl", "-g", "--cookies", str(COOKIES_FILE), TEST_URL],
-                capture_output=True, text=True, timeout=30
-            )
-            return result
-        
-        result = await loop.run_in_executor(None, run_check)
-        
-        if result.returncode == 0 and result.stdout.strip():
+
+        await instagram_accounts.limiter.wait_if_needed(account.lane)
+        result = await run_gallery_dl(
+            ["-g", "--cookies", str(account.cookies_file), TEST_URL],
+            timeout=30, json_output=False
+        )
+
+        if result.ok:
+            instagram_accounts.record(account)
             return True, "Instagram подключение работает"
-        
+
+        instagram_accounts.record(account, result.stderr)
         stderr = result.stderr.lower()
         if "login" in stderr or "redirect" in stderr:
             return False, "Cookies устарели - требуется авторизация"
@@ -42,16 +38,38 @@ async def check_instagram_connection() -> Tuple[bool, str]:
             return False, "429 Too Many Requests - превышен лимит запросов"
         else:
             return False, f"Ошибка: {result.stderr[:100]}"
-            
-    except subprocess.TimeoutExpired:
+
+    except GalleryDlTimeout:
         return False, "Таймаут проверки (30 сек)"
     except Exception as e:
         return False, f"Ошибка проверки: {str(e)[:100]}"
 
 
-async def update_cookies(cookies_content: str) -> Tuple[bool, str]:
+async def check_instagram_connection() -> Tuple[bool, str]:
+    """
+    Check every account in the pool.
+    Returns: (is_working - at least one account works, message)
+    """
+    instagram_accounts.reload()
+    accounts = instagram_accounts.accounts
+    if not accounts:
+        return False, "Файл cookies не найден"
+
+    results = await asyncio.gather(*[check_account(account) for account in accounts])
+    if len(accounts) == 1:
+        return results[0]
+
+    working = sum(1 for ok, _ in results if ok)
+    lines = [
+        f"{'🟢' if ok else '🔴'} <b>{account.name}</b>: {message}"
+        for account, (ok, message) in zip(accounts, results)
+    ]
+    return working > 0, f"Рабочих аккаунтов: {working}/{len(accounts)}\n\n" + "\n".join(lines)
+
+
+async def update_cookies(cookies_content: str, account_name: str = MAIN_ACCOUNT) -> Tuple[bool, str]:
     """
-    Update Instagram cookies file.
+    Update cookies file of a pool account (a new name adds an account).
     Returns: (success, message)
     """
     try:
@@ -76,14 +94,17 @@ async def update_cookies(cookies_content: str) -> Tuple[bool, str]:
             return False, "В cookies не найден sessionid - невалидный формат"
         
         # Write to file
-        COOKIES_FILE.write_text("\n".join(valid_lines) + "\n")
-        logger.info("Instagram cookies updated")
+        cookies_file = instagram_accounts.cookies_path(account_name)
+        cookies_file.parent.mkdir(parents=True, exist_ok=True)
+        cookies_file.write_text("\n".join(valid_lines) + "\n")
+        instagram_accounts.reload()
+        logger.info(f"Instagram cookies updated for account {account_name}")
         
         # Test new cookies
-        is_working, message = await check_instagram_connection()
+        is_working, message = await check_account(instagram_accounts.get(account_name))
         
         if is_working:
-            return True, "Cookies обновлены и проверены - Instagram работает!"
+            return True, f"Cookies аккаунта {account_name} обновлены и проверены - Instagram работает!"
         else:
             return False, f"Cookies сохранены, но проверка не прошла: {message}"
             
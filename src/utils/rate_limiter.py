@@ -45,7 +45,7 @@ class RateLimiter:
         platform_lower = platform.lower()
 
         async with self.locks[platform_lower]:
-            min_interval = self.min_intervals.get(platform_lower, 1.0)
+            min_interval = self._interval(platform_lower)
             last = self.last_request[platform_lower]
 
             wait_time = 0.0
@@ -71,6 +71,12 @@ class RateLimiter:
 
             return wait_time
 
+    def _interval(self, key: str) -> float:
+        """Интервал полосы; у полосы аккаунта ("instagram:main") - как у платформы"""
+        if key in self.min_intervals:
+            return self.min_intervals[key]
+        return self.min_intervals.get(key.split(":", 1)[0], 1.0)
+
     async def acquire(self, platform: str) -> None:
         """Получить доступ для запроса (alias для wait_if_needed).
 
@@ -94,7 +100,7 @@ class RateLimiter:
                 "platform": platform,
                 "request_count": self.request_counts[platform_lower],
                 "total_wait_time": self.wait_times[platform_lower],
-                "min_interval": self.min_intervals.get(platform_lower, 1.0),
+                "min_interval": self._interval(platform_lower),
                 "last_request": self.last_request.get(platform_lower, 0)
             }
 
@@ -157,7 +163,7 @@ class RateLimiter:
             if last == 0:
                 return True
 
-            min_interval = self.min_intervals.get(platform_lower, 1.0)
+            min_interval = self._interval(platform_lower)
             elapsed = time.time() - last
 
             if elapsed >= min_interval:
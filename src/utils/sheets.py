@@ -6,6 +6,7 @@ import json
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 import asyncio
+import time
 from pathlib import Path
 
 try:
@@ -16,6 +17,9 @@ except ImportError:
     GSPREAD_AVAILABLE = False
 
 from src.utils.logger import get_logger
+from src.utils.sheets_queue import SheetsWriteQueue
+from src.utils.daily_stats import DailyStats
+from src.config import config
 
 logger = get_logger(__name__)
 
@@ -33,6 +37,11 @@ CREDENTIALS_PATH = os.getenv("GOOGLE_CREDENTIALS_PATH", "/opt/uspsocdowloader/cr
 CREDENTIALS_JSON = os.getenv("GOOGLE_CREDENTIALS_JSON", "")
 
 
+def credentials_configured() -> bool:
+    """Заданы ли учётные данные сервисного аккаунта (JSON или файл)"""
+    return bool(CREDENTIALS_JSON) or Path(CREDENTIALS_PATH).exists()
+
+
 class GoogleSheetsManager:
     """Менеджер для работы с Google Sheets"""
 
@@ -47,6 +56,29 @@ class GoogleSheetsManager:
         self.spreadsheet = None
         self._initialized = False
         self._lock = asyncio.Lock()
+        # Без gspread или учётных данных строки не копятся в spool и фоновые задачи не запускаются
+        self.enabled = GSPREAD_AVAILABLE and credentials_configured()
+        # Запросы и ошибки пишутся через очередь, а не по строке на сообщение
+        self.queue = SheetsWriteQueue(
+            config.SHEETS_SPOOL_PATH,
+            self._append_rows,
+            batch_size=config.SHEETS_BATCH_SIZE,
+            flush_interval=config.SHEETS_FLUSH_INTERVAL,
+            max_rows=config.SHEETS_QUEUE_MAX_ROWS,
+        )
+        # Счётчики листа Stats ведутся локально, в таблицу - по таймеру
+        self.daily_stats = DailyStats(config.DAILY_STATS_PATH)
+        self._stats_rows: Dict[str, int] = {}  # date -> номер строки в листе Stats
+        self._stats_task: Optional[asyncio.Task] = None
+        # Индекс листа Users: user_id -> номер строки и total_requests (вместо find)
+        self._users_lock = asyncio.Lock()
+        self._user_rows: Dict[int, int] = {}
+        self._user_requests: Dict[int, int] = {}
+        self._user_index_loaded = 0.0  # monotonic; 0 - индекс нужно построить
+        # Накопленные обновления: user_id -> (last_seen, +запросов), пишутся одним batch_update
+        self._user_updates: Dict[int, tuple] = {}
+        self._user_seen: Dict[int, float] = {}  # Последний /start (для подавления повторов)
+        self._users_task: Optional[asyncio.Task] = None
 
     async def init(self) -> bool:
         """Инициализация подключения к Google Sheets"""
@@ -133,45 +165,78 @@ class GoogleSheetsManager:
                            first_name: str = None, last_name: str = None,
                            language: str = None, is_premium: bool = False,
                            is_bot: bool = False, referrer_id: int = None) -> bool:
-        """Регистрирует нового пользователя или обновляет существующего"""
+        """Регистрирует нового пользователя или обновляет существующего.
+
+        Новый пользователь дописывается в лист сразу. Для известного
+        last_seen и счётчик запросов копятся локально и уходят в таблицу
+        пачкой (flush_user_updates); повторный /start в течение
+        SHEETS_USER_DEBOUNCE секунд не учитывается.
+        """
         if not await self.init():
             return False
 
         try:
             loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                self._sync_register_user,
-                user_id, username, first_name, last_name, language,
-                is_premium, is_bot, referrer_id
-            )
+            async with self._users_lock:
+                if (not self._user_index_loaded or
+                        time.monotonic() - self._user_index_loaded > config.SHEETS_USERS_INDEX_TTL):
+                    await loop.run_in_executor(None, self._sync_load_user_index)
+
+                now = time.monotonic()
+                last_seen = self._user_seen.get(user_id)
+                self._user_seen[user_id] = now
+
+                if user_id in self._user_rows:
+                    if last_seen is not None and now - last_seen < config.SHEETS_USER_DEBOUNCE:
+                        return True
+                    _, added = self._user_updates.get(user_id, (None, 0))
+                    self._user_updates[user_id] = (
+                        datetime.now().strftime("%Y-%m-%d %H:%M:%S"), added + 1
+                    )
+                    return True
+
+                await loop.run_in_executor(
+                    None,
+                    self._sync_register_user,
+                    user_id, username, first_name, last_name, language,
+                    is_premium, is_bot, referrer_id
+                )
+            self.daily_stats.record_new_user()
             return True
         except Exception as e:
             logger.error(f"Error registering user {user_id}: {e}")
             return False
 
+    def _sync_load_user_index(self):
+        """Строит индекс листа Users (один запрос: колонки user_id и total_requests)"""
+        ws = self.spreadsheet.worksheet(self.SHEET_USERS)
+        ids, requests = ws.batch_get(["A2:A", "H2:H"])
+
+        rows: Dict[int, int] = {}
+        counts: Dict[int, int] = {}
+        for i, cells in enumerate(ids):
+            if not cells or not str(cells[0]).isdigit():
+                continue
+            user_id = int(cells[0])
+            rows[user_id] = i + 2
+            try:
+                counts[user_id] = int(requests[i][0]) if i < len(requests) and requests[i] else 0
+            except ValueError:
+                counts[user_id] = 0
+
+        self._user_rows = rows
+        self._user_requests = counts
+        self._user_index_loaded = time.monotonic()
+        logger.info(f"Users sheet index loaded: {len(rows)} users")
+
     def _sync_register_user(self, user_id: int, username: str, first_name: str,
                            last_name: str, language: str, is_premium: bool,
                            is_bot: bool, referrer_id: int):
-        """Синхронная регистрация пользователя"""
+        """Синхронная регистрация нового пользователя"""
         ws = self.spreadsheet.worksheet(self.SHEET_USERS)
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        # Check if user exists
-        try:
-            cell = ws.find(str(user_id), in_column=1)
-            if cell:
-                # Update last_seen and increment requests
-                row = cell.row
-                ws.update_cell(row, 7, now)  # last_seen
-                current_requests = ws.cell(row, 8).value or "0"
-                ws.update_cell(row, 8, int(current_requests) + 1)
-                return
-        except Exception as e:  # Cell not found or other error
-            pass
-
-        # New user
-        ws.append_row([
+        result = ws.append_row([
             str(user_id),
             username or "",
             first_name or "",
@@ -187,48 +252,123 @@ class GoogleSheetsManager:
             ""
         ])
 
-    _request_counter = 0  # Counter for auto-updating stats
-    
+        row = self._appended_row(result)
+        if row:
+            self._user_rows[user_id] = row
+            self._user_requests[user_id] = 1
+        else:
+            # Номер строки неизвестен - индекс перестраивается при следующей регистрации
+            self._user_index_loaded = 0.0
+
+    async def flush_user_updates(self) -> bool:
+        """Записывает накопленные last_seen/total_requests одним batch_update"""
+        if not self._user_updates:
+            return True
+        if not await self.init():
+            return False
+
+        async with self._users_lock:
+            updates, self._user_updates = self._user_updates, {}
+            try:
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(None, self._sync_flush_user_updates, updates)
+            except Exception as e:
+                # Повтор при следующей отправке (новых обновлений под блокировкой не было)
+                self._user_updates = updates
+                logger.error(f"Error updating users: {e}")
+                return False
+
+            # Отметки /start старше окна подавления больше не нужны
+            threshold = time.monotonic() - config.SHEETS_USER_DEBOUNCE
+            self._user_seen = {
+                user_id: seen for user_id, seen in self._user_seen.items() if seen >= threshold
+            }
+            return True
+
+    def _sync_flush_user_updates(self, updates: Dict[int, tuple]):
+        """Синхронная пакетная запись обновлений пользователей"""
+        data = []
+        totals = {}
+        for user_id, (last_seen, added) in updates.items():
+            row = self._user_rows.get(user_id)
+            if row is None:
+                continue
+            totals[user_id] = self._user_requests.get(user_id, 0) + added
+            # G - last_seen, H - total_requests
+            data.append({"range": f"G{row}:H{row}", "values": [[last_seen, totals[user_id]]]})
+
+        if data:
+            ws = self.spreadsheet.worksheet(self.SHEET_USERS)
+            ws.batch_update(data)
+        self._user_requests.update(totals)
+
+    async def _periodic_user_flush(self):
+        while True:
+            try:
+                await asyncio.sleep(config.SHEETS_FLUSH_INTERVAL)
+                await self.flush_user_updates()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in users updater: {e}")
+
+    async def _append_rows(self, sheet: str, rows: List[List[Any]]) -> None:
+        """Записывает пачку строк в лист (вызывается очередью записи)"""
+        if not await self.init():
+            raise ConnectionError("Google Sheets not available")
+
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self._sync_append_rows, sheet, rows)
+
+    def _sync_append_rows(self, sheet: str, rows: List[List[Any]]):
+        """Синхронная запись пачки строк одним запросом"""
+        ws = self.spreadsheet.worksheet(sheet)
+        ws.append_rows(rows)
+
+    def start(self):
+        """Запускает фоновую запись строк, обновлений Users и листа Stats"""
+        if not self.enabled:
+            logger.warning("Google Sheets credentials not configured - rows will not be queued")
+            return
+        self.queue.start()
+        if self._stats_task is None or self._stats_task.done():
+            self._stats_task = asyncio.create_task(self._periodic_stats_update())
+        if self._users_task is None or self._users_task.done():
+            self._users_task = asyncio.create_task(self._periodic_user_flush())
+
+    async def _periodic_stats_update(self):
+        while True:
+            try:
+                await asyncio.sleep(config.SHEETS_STATS_INTERVAL)
+                await self.update_daily_stats()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in daily stats updater: {e}")
+
+    async def close(self):
+        """Дописывает накопленные строки и статистику перед остановкой"""
+        for task in (self._stats_task, self._users_task):
+            if task and not task.done():
+                task.cancel()
+        if self.enabled:
+            await self.queue.close()
+        if self._initialized:
+            await self.flush_user_updates()
+            await self.update_daily_stats()
+        self.daily_stats.flush()
+
     async def log_request(self, user_id: int, username: str, platform: str,
                          content_type: str, url: str, success: bool,
                          file_size_mb: float = 0, duration_sec: float = 0,
                          error_message: str = None, processing_time: float = 0,
                          ai_used: bool = False, ai_type: str = None) -> bool:
-        """Логирует запрос пользователя"""
-        if not await self.init():
+        """Логирует запрос пользователя (строка уходит в очередь записи)"""
+        if not self.enabled:
             return False
 
-        try:
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                self._sync_log_request,
-                user_id, username, platform, content_type, url, success,
-                file_size_mb, duration_sec, error_message, processing_time,
-                ai_used, ai_type
-            )
-            
-            # Auto-update daily stats every 10 requests
-            GoogleSheetsManager._request_counter += 1
-            if GoogleSheetsManager._request_counter >= 10:
-                GoogleSheetsManager._request_counter = 0
-                await self.update_daily_stats()
-            
-            return True
-        except Exception as e:
-            logger.error(f"Error logging request: {e}")
-            return False
-
-    def _sync_log_request(self, user_id: int, username: str, platform: str,
-                         content_type: str, url: str, success: bool,
-                         file_size_mb: float, duration_sec: float,
-                         error_message: str, processing_time: float,
-                         ai_used: bool, ai_type: str):
-        """Синхронное логирование запроса"""
-        ws = self.spreadsheet.worksheet(self.SHEET_REQUESTS)
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        ws.append_row([
+        self.queue.enqueue(self.SHEET_REQUESTS, [
             now,
             str(user_id),
             username or "",
@@ -243,33 +383,18 @@ class GoogleSheetsManager:
             "yes" if ai_used else "no",
             ai_type or ""
         ])
+        self.daily_stats.record_request(user_id, platform, success, file_size_mb, ai_type)
+        return True
 
     async def log_error(self, user_id: int, error_type: str, error_message: str,
                        url: str = None, platform: str = None,
                        traceback: str = None) -> bool:
-        """Логирует ошибку"""
-        if not await self.init():
-            return False
-
-        try:
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                self._sync_log_error,
-                user_id, error_type, error_message, url, platform, traceback
-            )
-            return True
-        except Exception as e:
-            logger.error(f"Error logging error: {e}")
+        """Логирует ошибку (строка уходит в очередь записи)"""
+        if not self.enabled:
             return False
 
-    def _sync_log_error(self, user_id: int, error_type: str, error_message: str,
-                       url: str, platform: str, traceback: str):
-        """Синхронное логирование ошибки"""
-        ws = self.spreadsheet.worksheet(self.SHEET_ERRORS)
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        ws.append_row([
+        self.queue.enqueue(self.SHEET_ERRORS, [
             now,
             str(user_id),
             error_type or "",
@@ -278,6 +403,7 @@ class GoogleSheetsManager:
             platform or "",
             (traceback or "")[:1000]
         ])
+        return True
 
     async def get_user_stats(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Получает статистику пользователя"""
@@ -314,153 +440,113 @@ class GoogleSheetsManager:
 
 
     async def update_daily_stats(self) -> bool:
-        """Обновляет ежедневную статистику на основе данных из Requests"""
+        """Отправляет строку дня в лист Stats (счётчики ведутся локально)"""
         if not await self.init():
             return False
 
         try:
             loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, self._sync_update_daily_stats)
+            if self.daily_stats.total_users is None:
+                # Один раз: дальше счётчик растёт при регистрации новых пользователей
+                total = await loop.run_in_executor(None, self._sync_count_users)
+                self.daily_stats.set_total_users(total)
+            rows = self.daily_stats.pending_rows()
+            await loop.run_in_executor(None, self._sync_update_daily_stats, rows)
+            self.daily_stats.mark_pushed([row[0] for row in rows])
             return True
         except Exception as e:
             logger.error(f"Error updating daily stats: {e}")
             return False
 
-    def _sync_update_daily_stats(self):
-        """Синхронное обновление ежедневной статистики"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        
-        # Get all requests
-        requests_ws = self.spreadsheet.worksheet(self.SHEET_REQUESTS)
-        requests_data = requests_ws.get_all_records()
-        
-        # Get users count
-        users_ws = self.spreadsheet.worksheet(self.SHEET_USERS)
-        users_data = users_ws.get_all_records()
-        total_users = len(users_data)
-        
-        # Filter today's requests
-        today_requests = [r for r in requests_data if r.get('timestamp', '').startswith(today)]
-        
-        # Calculate stats
-        total_requests = len(today_requests)
-        successful = len([r for r in today_requests if r.get('success') == 'yes'])
-        failed = len([r for r in today_requests if r.get('success') == 'no'])
-        
-        # Platform breakdown
-        platforms = {'instagram': 0, 'youtube': 0, 'tiktok': 0, 'twitter': 0, 'vk': 0}
-        total_mb = 0
-        ai_translations = 0
-        ai_rewrites = 0
-        ai_ocr = 0
-        active_users = set()
-        
-        for r in today_requests:
-            platform = (r.get('platform') or '').lower()
-            if platform in platforms:
-                platforms[platform] += 1
-            
-            try:
-                total_mb += float(r.get('file_size_mb') or 0)
-            except:
-                pass
-            
-            ai_type = r.get('ai_type', '').lower()
-            if 'translat' in ai_type:
-                ai_translations += 1
-            elif 'rewrite' in ai_type:
-                ai_rewrites += 1
-            elif 'ocr' in ai_type:
-                ai_ocr += 1
-            
-            active_users.add(r.get('user_id'))
-        
-        # Count new users today
-        new_users = len([u for u in users_data if u.get('first_seen', '').startswith(today)])
-        
-        # Stats worksheet
+    def _sync_count_users(self) -> int:
+        """Число пользователей в листе Users (одна колонка, без заголовка)"""
+        ws = self.spreadsheet.worksheet(self.SHEET_USERS)
+        return max(0, len(ws.col_values(1)) - 1)
+
+    def _sync_update_daily_stats(self, rows: List[List[Any]]):
+        """Синхронная запись строк дня в лист Stats"""
         stats_ws = self.spreadsheet.worksheet(self.SHEET_STATS)
-        
-        # Check if today's row exists
-        cell = stats_ws.find(today, in_column=1)
-        row_data = [
-            today, total_users, new_users, len(active_users), total_requests,
-            successful, failed, platforms['instagram'], platforms['youtube'],
-            platforms['tiktok'], platforms['twitter'], platforms['vk'],
-            round(total_mb, 2), ai_translations, ai_rewrites, ai_ocr
-        ]
-        
-        if cell:
-            # Update existing row
-            row = cell.row
-            stats_ws.update(f'A{row}:P{row}', [row_data])
-        else:
-            # Add new row
-            stats_ws.append_row(row_data)
-        
-        logger.info(f"Updated daily stats for {today}: {total_requests} requests, {successful} successful")
 
+        for row_data in rows:
+            date = row_data[0]
+            row = self._stats_rows.get(date)
+            if row is None:
+                # Check if the day's row exists
+                cell = stats_ws.find(date, in_column=1)
+                if cell:
+                    row = cell.row
+            if row:
+                # Update existing row
+                stats_ws.update(f'A{row}:P{row}', [row_data])
+            else:
+                # Add new row
+                result = stats_ws.append_row(row_data)
+                row = self._appended_row(result)
+            if row:
+                self._stats_rows[date] = row
+
+        logger.info(f"Updated daily stats for {rows[-1][0]}: {rows[-1][4]} requests, {rows[-1][5]} successful")
+
+    @staticmethod
+    def _appended_row(result: Any) -> Optional[int]:
+        """Номер строки из ответа append_row (updates.updatedRange, напр. 'Stats!A12:P12')"""
+        try:
+            updated_range = result["updates"]["updatedRange"]
+            return int(updated_range.rsplit(":", 1)[-1].lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+        except Exception:
+            return None
 
+    async def read_ranges(self, sheet: str, ranges: List[str]) -> List[List[List[str]]]:
+        """Читает диапазоны листа одним запросом (batch_get).
 
-    async def get_user_daily_requests(self, user_id: int) -> int:
-        """Возвращает количество успешных запросов пользователя за сегодня."""
+        Returns:
+            Значения по каждому диапазону (пустые хвосты строк API не возвращает)
+        """
         if not await self.init():
-            return 0
-
-        try:
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(
-                None,
-                self._sync_get_user_daily_requests,
-                user_id
-            )
-        except Exception as e:
-            logger.error(f"Error getting daily requests for {user_id}: {e}")
-            return 0
-
-    def _sync_get_user_daily_requests(self, user_id: int) -> int:
-        """Синхронное получение количества запросов за сегодня."""
-        today = datetime.now().strftime("%Y-%m-%d")
-        ws = self.spreadsheet.worksheet(self.SHEET_REQUESTS)
-        requests = ws.get_all_records()
-        
-        count = 0
-        for r in requests:
-            if (str(r.get('user_id')) == str(user_id) and 
-                r.get('timestamp', '').startswith(today) and
-                r.get('success') == 'yes'):
-                count += 1
-        
-        return count
-
-    async def is_user_premium(self, user_id: int) -> bool:
-        """Проверяет, является ли пользователь премиум."""
+            raise ConnectionError("Google Sheets not available")
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._sync_read_ranges, sheet, ranges)
+
+    def _sync_read_ranges(self, sheet: str, ranges: List[str]) -> List[List[List[str]]]:
+        ws = self.spreadsheet.worksheet(sheet)
+        # Диапазон ниже последней строки листа API отклоняет (exceeds grid limits)
+        in_grid = [r for r in ranges if self._range_start_row(r) <= ws.row_count]
+        values = iter(ws.batch_get(in_grid) if in_grid else [])
+        return [list(next(values)) if r in in_grid else [] for r in ranges]
+
+    @staticmethod
+    def _range_start_row(a1_range: str) -> int:
+        """Первая строка диапазона A1 ('A12:M' -> 12)"""
+        start = a1_range.split(":", 1)[0]
+        digits = start.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+        return int(digits) if digits else 1
+
+    async def get_premium_user_ids(self) -> Optional[List[int]]:
+        """Возвращает ID премиум-пользователей из листа Users.
+
+        Одно чтение листа для синхронизации локальной БД (премиум-статус
+        выставляется в таблице вручную); None - таблица недоступна.
+        """
         if not await self.init():
-            return False
+            return None
 
         try:
             loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(
-                None,
-                self._sync_is_user_premium,
-                user_id
-            )
+            return await loop.run_in_executor(None, self._sync_get_premium_user_ids)
         except Exception as e:
-            logger.error(f"Error checking premium for {user_id}: {e}")
-            return False
+            logger.error(f"Error reading premium users: {e}")
+            return None
 
-    def _sync_is_user_premium(self, user_id: int) -> bool:
-        """Синхронная проверка премиум статуса."""
+    def _sync_get_premium_user_ids(self) -> List[int]:
+        """Синхронное чтение премиум-пользователей."""
         ws = self.spreadsheet.worksheet(self.SHEET_USERS)
-        try:
-            cell = ws.find(str(user_id), in_column=1)
-            if cell:
-                row = ws.row_values(cell.row)
-                # Column 11 (index 10) is is_premium
-                return len(row) > 10 and row[10].lower() == 'yes'
-        except Exception:
-            pass
-        return False
+        user_ids = []
+        # Column 11 (index 10) is is_premium
+        for row in ws.get_all_values()[1:]:
+            if len(row) > 10 and row[10].lower() == 'yes' and row[0].isdigit():
+                user_ids.append(int(row[0]))
+        return user_ids
 
 
 # Singleton instance
@@ -0,0 +1,130 @@
+"""
+Sheets Mirror - локальная копия листов Users и Requests для админ-команд
+Раньше /allstats, /users, /broadcast и кнопки админ-панели скачивали
+листы целиком на каждое нажатие. Теперь фоновая задача периодически
+дописывает в SQLite только новые строки (смещение по номеру строки
+хранится в БД), а у Users дополнительно обновляет изменяемые колонки
+(last_seen, total_requests, is_premium). Админ-команды читают копию
+индексированными запросами.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+from src.utils.logger import get_logger
+from src.utils.sheets import sheets_manager
+from src.database.db_manager import get_db_manager
+from src.config import config
+
+logger = get_logger(__name__)
+
+SHEET_USERS = sheets_manager.SHEET_USERS
+SHEET_REQUESTS = sheets_manager.SHEET_REQUESTS
+
+
+class SheetsMirror:
+    """Периодическая инкрементальная синхронизация листов в SQLite"""
+
+    def __init__(self, sync_interval: int, chunk_rows: int):
+        """Инициализация.
+
+        Args:
+            sync_interval: Период синхронизации (сек)
+            chunk_rows: Строк за один запрос (первая синхронизация большого листа)
+        """
+        self.sync_interval = sync_interval
+        self.chunk_rows = chunk_rows
+        self.last_sync: Optional[float] = None  # time.time() последней успешной синхронизации
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def sync(self) -> bool:
+        """Дописывает новые строки Users и Requests в локальную копию"""
+        db = get_db_manager()
+        if db is None:
+            return False
+
+        async with self._lock:
+            try:
+                await self._sync_users(db)
+                await self._sync_requests(db)
+            except Exception as e:
+                logger.error(f"Error syncing Google Sheets mirror: {e}")
+                return False
+            self.last_sync = time.time()
+            return True
+
+    async def _sync_users(self, db) -> None:
+        synced = await db.get_sheet_synced_rows(SHEET_USERS)
+        start_row = synced + 2  # Строка 1 - заголовок
+        # Новые строки и изменяемые колонки всех строк - одним запросом
+        new_rows, activity, premium = await sheets_manager.read_ranges(
+            SHEET_USERS, [f"A{start_row}:M", "G2:H", "K2:K"]
+        )
+        if new_rows and not await db.add_mirror_users(start_row, new_rows):
+            raise RuntimeError("users mirror write failed")
+        if not await db.update_mirror_users(activity, premium):
+            raise RuntimeError("users mirror refresh failed")
+
+    async def _sync_requests(self, db) -> None:
+        # Лист только дописывается - читаются строки после смещения, порциями
+        while True:
+            synced = await db.get_sheet_synced_rows(SHEET_REQUESTS)
+            start_row = synced + 2
+            end_row = start_row + self.chunk_rows - 1
+            rows, = await sheets_manager.read_ranges(SHEET_REQUESTS, [f"A{start_row}:M{end_row}"])
+            if not rows:
+                return
+            if not await db.add_mirror_requests(start_row, rows):
+                raise RuntimeError("requests mirror write failed")
+            if len(rows) < self.chunk_rows:
+                return
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Итоги по пользователям и запросам (из локальной копии)"""
+        db = get_db_manager()
+        if db is None:
+            return {"total_users": 0, "premium_users": 0, "total_requests": 0,
+                    "successful": 0, "platforms": {}}
+        return await db.get_mirror_stats()
+
+    async def get_users(self, limit: int = 10, order: str = "recent") -> List[Dict[str, Any]]:
+        db = get_db_manager()
+        if db is None:
+            return []
+        return await db.get_mirror_users(limit, order)
+
+    async def get_user_ids(self) -> List[int]:
+        db = get_db_manager()
+        if db is None:
+            return []
+        return await db.get_mirror_user_ids()
+
+    def synced_at(self) -> str:
+        """Время последней синхронизации для подписи в админ-командах"""
+        if self.last_sync is None:
+            return "ещё не выполнялась"
+        return time.strftime("%H:%M:%S", time.localtime(self.last_sync))
+
+    async def _periodic_sync(self):
+        """Фоновая синхронизация (первая - сразу)"""
+        while True:
+            try:
+                await self.sync()
+                await asyncio.sleep(self.sync_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in Google Sheets mirror: {e}")
+                await asyncio.sleep(self.sync_interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._periodic_sync())
+
+    def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+
+# Singleton instance
+sheets_mirror = SheetsMirror(config.SHEETS_MIRROR_INTERVAL, config.SHEETS_MIRROR_CHUNK)
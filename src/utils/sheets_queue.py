@@ -0,0 +1,233 @@
+"""
+Sheets Write Queue - отложенная пакетная запись строк в Google Sheets
+Строки (запросы, ошибки) сразу пишутся в локальный spool-файл (JSON Lines)
+и ставятся в очередь, а обработчик сообщения не ждёт Google API. Фоновая
+задача отправляет их пачками (append_rows) - каждые batch_size строк или
+раз в flush_interval секунд. Отправленные строки удаляются из spool, поэтому
+после падения процесса неотправленное дописывается при следующем запуске.
+Ошибка отправки (в том числе исчерпание квоты Sheets API) - экспоненциальная
+пауза и повтор той же пачки.
+"""
+import asyncio
+import json
+import os
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from src.utils.logger import get_logger
+from src.utils.circuit_breaker import backoff_delay
+
+logger = get_logger(__name__)
+
+# Признаки исчерпания квоты Sheets API (лимит на запросы в минуту)
+QUOTA_MARKERS = ("429", "quota", "resource_exhausted", "rate limit")
+# Пауза после исчерпания квоты - квота считается поминутно
+QUOTA_BACKOFF_BASE = 60.0
+ERROR_BACKOFF_BASE = 5.0
+BACKOFF_MAX = 10 * 60.0
+# Доля max_rows: сколько вытесненных строк может остаться в spool до его перезаписи
+SPOOL_COMPACT_RATIO = 0.1
+
+FlushFn = Callable[[str, List[List[Any]]], Awaitable[None]]
+
+
+def is_quota_error(error: Any) -> bool:
+    text = str(error).lower()
+    return any(marker in text for marker in QUOTA_MARKERS)
+
+
+class SheetsWriteQueue:
+    """Очередь строк для листов с локальным spool-файлом"""
+
+    def __init__(self, spool_path: Path, flush: FlushFn, batch_size: int,
+                 flush_interval: float, max_rows: int):
+        """Инициализация очереди.
+
+        Args:
+            spool_path: Файл неотправленных строк
+            flush: Корутина записи пачки строк в лист: flush(sheet, rows)
+            batch_size: Отправлять, как только набралось столько строк
+            flush_interval: Отправлять накопленное не реже, чем раз в N секунд
+            max_rows: Предел очереди и spool (при превышении теряются самые
+                старые строки; в spool они остаются до перезаписи - не больше
+                max_rows * SPOOL_COMPACT_RATIO строк)
+        """
+        self.spool_path = spool_path
+        self._flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self._compact_after = max(1, int(max_rows * SPOOL_COMPACT_RATIO))
+        # Строки в spool, уже вытесненные из очереди
+        self._spool_stale = 0
+
+        # Статистика
+        self.flushed_rows = 0
+        self.flush_errors = 0
+        self.dropped_rows = 0
+
+        rows = self._load()
+        if len(rows) > max_rows:
+            self.dropped_rows = len(rows) - max_rows
+            logger.warning(f"Sheets spool over limit, dropped {self.dropped_rows} oldest rows")
+            rows = rows[-max_rows:]
+        # (номер, лист, строка): отправленные строки удаляются по номеру, т.к.
+        # во время отправки из головы очереди могут вытесняться старые строки
+        self._pending: Deque[Tuple[int, str, List[Any]]] = deque(
+            (seq, sheet, row) for seq, (sheet, row) in enumerate(rows)
+        )
+        self._next_seq = len(self._pending)
+        if self.dropped_rows:
+            self._rewrite_spool()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Отправка пачек идёт под блокировкой: close не прерывает начатую отправку
+        self._flush_lock = asyncio.Lock()
+        self._closed = False
+        self._failures = 0
+
+    def _load(self) -> List[Tuple[str, List[Any]]]:
+        """Строки, не отправленные до перезапуска"""
+        rows = []
+        if not self.spool_path.exists():
+            return rows
+        try:
+            with open(self.spool_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                        rows.append((item["sheet"], item["row"]))
+                    except (ValueError, KeyError):
+                        # Строка, недописанная при падении
+                        continue
+        except Exception as e:
+            logger.error(f"Error loading sheets spool: {e}")
+        if rows:
+            logger.info(f"Loaded {len(rows)} unsent Google Sheets rows from spool")
+        return rows
+
+    def _rewrite_spool(self) -> None:
+        """Оставляет в spool только неотправленные строки"""
+        try:
+            tmp_path = self.spool_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for _, sheet, row in self._pending:
+                    f.write(json.dumps({"sheet": sheet, "row": row}, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.spool_path)
+            self._spool_stale = 0
+        except Exception as e:
+            logger.error(f"Error rewriting sheets spool: {e}")
+
+    def enqueue(self, sheet: str, row: List[Any]) -> None:
+        """Ставит строку в очередь (без сетевых запросов).
+
+        Args:
+            sheet: Название листа
+            row: Значения ячеек
+        """
+        try:
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"sheet": sheet, "row": row}, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logger.error(f"Error writing sheets spool: {e}")
+        self._pending.append((self._next_seq, sheet, row))
+        self._next_seq += 1
+
+        if len(self._pending) > self.max_rows:
+            self._pending.popleft()
+            self.dropped_rows += 1
+            self._spool_stale += 1
+            if self._spool_stale >= self._compact_after:
+                # Отправка не проходит - spool не должен расти без предела
+                self._rewrite_spool()
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        self.start()
+
+    def start(self) -> None:
+        """Запускает фоновую отправку (если ещё не запущена)"""
+        if not self._closed and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        """Фоновая отправка пачек"""
+        while not self._closed:
+            try:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                delay = await self.flush()
+                if delay:
+                    await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in sheets writer: {e}")
+
+    async def flush(self) -> float:
+        """Отправляет накопленные строки пачками по листам.
+
+        Returns:
+            Пауза перед следующей попыткой (0 - всё отправлено)
+        """
+        async with self._flush_lock:
+            return await self._flush_pending()
+
+    async def _flush_pending(self) -> float:
+        while self._pending:
+            batch = list(islice(self._pending, self.batch_size))
+            sheet = batch[0][1]
+            sent_ids = {seq for seq, name, _ in batch if name == sheet}
+            rows = [row for seq, _, row in batch if seq in sent_ids]
+            try:
+                await self._flush(sheet, rows)
+            except Exception as e:
+                self._failures += 1
+                self.flush_errors += 1
+                base = QUOTA_BACKOFF_BASE if is_quota_error(e) else ERROR_BACKOFF_BASE
+                delay = backoff_delay(self._failures, base, BACKOFF_MAX)
+                logger.warning(
+                    f"Failed to write {len(rows)} rows to {sheet}, retry in {delay:.0f}s: {str(e)[:100]}"
+                )
+                return delay
+
+            self._failures = 0
+            self.flushed_rows += len(rows)
+            # Отправленные строки - из очереди и spool
+            self._pending = deque(item for item in self._pending if item[0] not in sent_ids)
+            self._rewrite_spool()
+        return 0.0
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Останавливает фоновую отправку и пытается отправить остаток.
+
+        Начатая отправка доводится до конца: пачка, прерванная посреди
+        append_rows, могла уже попасть в лист, но остаться в spool, и ушла бы
+        повторно.
+        """
+        try:
+            await asyncio.wait_for(self._stop_and_flush(), timeout)
+        except Exception as e:
+            logger.warning(f"Unsent Google Sheets rows kept in spool: {e}")
+
+    async def _stop_and_flush(self) -> None:
+        self._closed = True
+        if self._task and not self._task.done():
+            # Под блокировкой задача не внутри отправки - отмена прерывает только ожидание
+            async with self._flush_lock:
+                self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._pending:
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Статистика очереди"""
+        return {
+            "pending": len(self._pending),
+            "flushed": self.flushed_rows,
+            "errors": self.flush_errors,
+            "dropped": self.dropped_rows,
+        }
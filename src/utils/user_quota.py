@@ -0,0 +1,97 @@
+"""
+User Quota - премиум-статус и дневной лимит бесплатных скачиваний
+Проверка выполняется на каждое сообщение со ссылкой, поэтому данные
+хранятся в локальной SQLite (одна строка по первичному ключу), а не
+читаются из Google Sheets. Счётчик увеличивается атомарным upsert и
+обнуляется с началом нового дня без обхода таблиц. Премиум-статус
+по-прежнему выставляется в листе Users - он периодически
+синхронизируется в БД фоновой задачей.
+"""
+import asyncio
+from typing import Any, Dict, Optional
+from src.utils.logger import get_logger
+from src.utils.sheets import sheets_manager
+from src.database.db_manager import get_db_manager
+from src.config import config
+
+logger = get_logger(__name__)
+
+
+class UserQuota:
+    """Премиум-статус и дневные счётчики пользователей"""
+
+    def __init__(self, sync_interval: int):
+        """Инициализация.
+
+        Args:
+            sync_interval: Период синхронизации премиум-статуса из Google Sheets (сек)
+        """
+        self.sync_interval = sync_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def get(self, user_id: int) -> Dict[str, Any]:
+        """Премиум-статус и успешные скачивания за сегодня (один запрос к БД).
+
+        Returns:
+            {'is_premium': bool, 'daily_requests': int}
+        """
+        db = get_db_manager()
+        if db is None:
+            return {'is_premium': False, 'daily_requests': 0}
+        return await db.get_user_quota(user_id)
+
+    async def is_premium(self, user_id: int) -> bool:
+        return (await self.get(user_id))['is_premium']
+
+    async def daily_requests(self, user_id: int) -> int:
+        return (await self.get(user_id))['daily_requests']
+
+    async def record_success(self, user_id: int) -> int:
+        """Учитывает успешное скачивание.
+
+        Returns:
+            Скачиваний за сегодня с учётом этого
+        """
+        db = get_db_manager()
+        if db is None:
+            return 0
+        return await db.increment_daily_requests(user_id)
+
+    async def sync_premium(self) -> bool:
+        """Переносит премиум-статус из листа Users в БД"""
+        db = get_db_manager()
+        if db is None:
+            return False
+        user_ids = await sheets_manager.get_premium_user_ids()
+        if user_ids is None:
+            # Таблица недоступна - остаётся прошлый список
+            return False
+        if await db.set_premium_users(user_ids):
+            logger.info(f"Premium users synced from Google Sheets: {len(user_ids)}")
+            return True
+        return False
+
+    async def _periodic_sync(self):
+        """Фоновая синхронизация премиум-статуса"""
+        while True:
+            try:
+                await self.sync_premium()
+                await asyncio.sleep(self.sync_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error syncing premium users: {e}")
+                await asyncio.sleep(self.sync_interval)
+
+    def start(self):
+        """Запускает синхронизацию (первая - сразу)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._periodic_sync())
+
+    def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+
+# Singleton instance
+user_quota = UserQuota(config.PREMIUM_SYNC_INTERVAL)
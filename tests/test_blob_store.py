@@ -0,0 +1,70 @@
+"""
+Тесты для дедупликации файлов загрузок
+"""
+import os
+import pytest
+from src.downloaders import blob_store as blob_module
+from src.downloaders.blob_store import BlobStore, hash_file
+
+
+def write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+class TestBlobStore:
+    """Тесты для BlobStore"""
+
+    def test_duplicate_replaced_with_hardlink(self, tmp_path):
+        """Тест что повтор содержимого становится ссылкой на один blob"""
+        store = BlobStore(tmp_path / "blobs")
+        first = write(tmp_path / "job1" / "Title_abc.mp4", b"video")
+        second = write(tmp_path / "job2" / "abc_720p.mp4", b"video")
+
+        blob = store.adopt(first)
+        assert store.adopt(second) == blob
+        assert blob.endswith(".mp4")
+
+        assert os.stat(first).st_ino == os.stat(second).st_ino == os.stat(blob).st_ino
+        assert os.stat(blob).st_nlink == 3
+        assert store.get_stats()["deduplicated"] == 1
+        assert store.get_stats()["saved_mb"] > 0
+
+    def test_streamed_digest_used_unless_file_rewritten(self, tmp_path, monkeypatch):
+        """Тест что хэш из потока не пересчитывается, а после перезаписи файла - пересчитывается"""
+        store = BlobStore(tmp_path / "blobs")
+        photo = write(tmp_path / "job" / "photo_0.jpg", b"photo")
+        video = write(tmp_path / "job" / "video.mp4", b"original")
+        store.remember(photo, hash_file(photo))
+        store.remember(video, hash_file(video))
+        # Remux: файл заменён новым
+        write(tmp_path / "job" / "video.tmp", b"remuxed")
+        os.replace(tmp_path / "job" / "video.tmp", video)
+
+        hashed = []
+        real_hash = blob_module.hash_file
+        monkeypatch.setattr(blob_module, "hash_file", lambda path: hashed.append(path) or real_hash(path))
+
+        store.adopt(photo)
+        blob = store.adopt(video)
+
+        assert hashed == [video]
+        assert os.path.basename(blob) == hash_file(video) + ".mp4"
+
+    def test_sweep_removes_unreferenced_blobs(self, tmp_path):
+        """Тест что blob удаляется вместе с последним файлом загрузки, кроме избранного и истории"""
+        store = BlobStore(tmp_path / "blobs")
+        kept = write(tmp_path / "job" / "a.jpg", b"a")
+        gone = write(tmp_path / "job" / "b.jpg", b"b")
+        favorite = write(tmp_path / "job" / "c.jpg", b"c")
+        blobs = [store.adopt(path) for path in (kept, gone, favorite)]
+        os.remove(gone)
+        os.remove(favorite)
+
+        assert store.sweep(lambda path: path == blobs[2]) == [blobs[1]]
+        assert [os.path.exists(blob) for blob in blobs] == [True, False, True]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
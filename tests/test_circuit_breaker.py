@@ -0,0 +1,94 @@
+"""
+Тесты для circuit breaker платформ
+"""
+import asyncio
+import pytest
+from src.utils.circuit_breaker import (
+    CircuitBreaker, CircuitOpenError, backoff_delay, is_throttle_error
+)
+
+
+def make_breaker(**overrides):
+    params = dict(threshold=3, window=60, cooldown=60, max_cooldown=600,
+                  backoff_base=0.01, backoff_max=0.02, max_defer=0.5)
+    params.update(overrides)
+    return CircuitBreaker(**params)
+
+
+class TestCircuitBreaker:
+    """Тесты для CircuitBreaker"""
+
+    def test_opens_after_threshold(self):
+        """Тест что серия 429 открывает автомат и новые задачи отклоняются"""
+        breaker = make_breaker()
+        for _ in range(3):
+            breaker.record_failure("instagram", "HTTP Error 429: Too Many Requests")
+
+        with pytest.raises(CircuitOpenError) as exc_info:
+            breaker.check("instagram")
+        assert exc_info.value.retry_at > 0
+        assert breaker.get_stats()["instagram"]["state"] == "open"
+        # Другие платформы не затронуты
+        breaker.check("tiktok")
+
+    def test_other_errors_do_not_open(self):
+        """Тест что ошибки конкретного поста не считаются блокировкой"""
+        breaker = make_breaker(threshold=1)
+        breaker.record_failure("instagram", "This post is private")
+        breaker.check("instagram")
+        assert not is_throttle_error("Video unavailable")
+        assert is_throttle_error("Login required to access this content")
+
+    def test_half_open_single_probe(self):
+        """Тест что после паузы проходит один пробный запрос, успех закрывает автомат"""
+        breaker = make_breaker(threshold=1, cooldown=0.05, max_cooldown=0.05, max_defer=1)
+        breaker.record_failure("x", "429")
+
+        async def run():
+            first = await asyncio.wait_for(breaker.acquire("x"), 1)
+            assert breaker.get_stats()["x"]["state"] == "half_open"
+            waiting = asyncio.ensure_future(breaker.acquire("x"))
+            await asyncio.sleep(0.05)
+            assert not waiting.done()
+            breaker.record_success("x")
+            await asyncio.wait_for(waiting, 2)
+            return first
+
+        asyncio.run(run())
+        assert breaker.get_stats()["x"]["state"] == "closed"
+
+    def test_failed_probe_reopens_longer(self):
+        """Тест что неудачная проба снова открывает автомат на больший срок"""
+        breaker = make_breaker(threshold=1, cooldown=0.01, max_cooldown=100, max_defer=1)
+        breaker.record_failure("vk", "429")
+
+        async def run():
+            await breaker.acquire("vk")
+            breaker.record_failure("vk", "429 Too Many Requests")
+
+        asyncio.run(run())
+        assert breaker.get_stats()["vk"]["state"] == "open"
+        assert breaker.get_stats()["vk"]["opens"] == 2
+
+    def test_long_open_rejected_without_waiting(self):
+        """Тест что при долгой блокировке acquire сразу отказывает"""
+        breaker = make_breaker(threshold=1, cooldown=60)
+        breaker.record_failure("instagram", "429")
+
+        async def run():
+            with pytest.raises(CircuitOpenError):
+                await asyncio.wait_for(breaker.acquire("instagram"), 0.2)
+
+        asyncio.run(run())
+        assert breaker.get_stats()["instagram"]["rejected"] == 1
+
+    def test_backoff_is_exponential_with_jitter(self):
+        """Тест экспоненциальной паузы с разбросом"""
+        for attempt, cap in ((1, 10), (3, 10), (10, 10)):
+            delay = backoff_delay(attempt, base=1, cap=cap)
+            expected = min(cap, 2 ** (attempt - 1))
+            assert expected / 2 <= delay <= expected
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
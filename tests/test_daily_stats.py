@@ -0,0 +1,74 @@
+"""
+Тесты для дневных счётчиков листа Stats
+"""
+import asyncio
+import pytest
+from src.utils import daily_stats
+from src.utils.daily_stats import DailyStats
+
+
+class TestDailyStats:
+    """Тесты для DailyStats"""
+
+    def test_counts_requests_incrementally(self, tmp_path):
+        """Тест что строка дня собирается из счётчиков без чтения истории"""
+        stats = DailyStats(tmp_path / "daily_stats.json")
+        stats.set_total_users(10)
+        stats.record_new_user()
+        stats.record_request(1, "Instagram", True, 2.5)
+        stats.record_request(1, "youtube", False)
+        stats.record_request(2, "tiktok", True, 1.25, ai_type="translation")
+
+        row = stats.pending_rows()[-1]
+        assert row[1:7] == [11, 1, 2, 3, 2, 1]
+        assert row[7:12] == [1, 1, 1, 0, 0]
+        assert row[12:] == [3.75, 1, 0, 0]
+
+    def test_counters_survive_restart(self, tmp_path):
+        """Тест что счётчики дня сохраняются на диск"""
+        path = tmp_path / "daily_stats.json"
+        stats = DailyStats(path)
+        stats.record_request(1, "vk", True)
+
+        restarted = DailyStats(path)
+        restarted.record_request(1, "vk", True)
+        row = restarted.pending_rows()[-1]
+        assert row[3] == 1  # active_users
+        assert row[4] == 2  # total_requests
+        assert restarted.total_users is None
+
+    def test_day_rollover_keeps_previous_until_pushed(self, tmp_path, monkeypatch):
+        """Тест что итоги прошедшего дня отправляются перед обнулением"""
+        monkeypatch.setattr(daily_stats, "_today", lambda: "2026-01-01")
+        stats = DailyStats(tmp_path / "daily_stats.json")
+        stats.record_request(1, "youtube", True)
+
+        monkeypatch.setattr(daily_stats, "_today", lambda: "2026-01-02")
+        stats.record_request(2, "youtube", True)
+        rows = stats.pending_rows()
+        assert [(row[0], row[4]) for row in rows] == [("2026-01-01", 1), ("2026-01-02", 1)]
+
+        stats.mark_pushed([row[0] for row in rows])
+        assert [row[0] for row in stats.pending_rows()] == ["2026-01-02"]
+
+    def test_saves_deferred_inside_event_loop(self, tmp_path, monkeypatch):
+        """Тест что в цикле событий счётчики пишутся один раз за SAVE_DELAY, а flush - сразу"""
+        monkeypatch.setattr(daily_stats, "SAVE_DELAY", 0.01)
+        path = tmp_path / "daily_stats.json"
+        stats = DailyStats(path)
+
+        async def run():
+            stats.record_request(1, "vk", True)
+            stats.record_request(2, "vk", True)
+            assert not path.exists()
+            await asyncio.sleep(0.05)
+            assert DailyStats(path).pending_rows()[-1][4] == 2
+            stats.record_request(3, "vk", True)
+            stats.flush()
+
+        asyncio.run(run())
+        assert DailyStats(path).pending_rows()[-1][4] == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
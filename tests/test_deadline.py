@@ -0,0 +1,62 @@
+"""
+Тесты для дедлайнов загрузок
+"""
+import asyncio
+import time
+import pytest
+from src.config import config
+from src.downloaders.deadline import (
+    DownloadTimeoutError, JobDeadline, upload_timeout, upload_within_deadline
+)
+
+
+class TestJobDeadline:
+    """Тесты для JobDeadline"""
+
+    def test_hooks_abort_only_after_cancel(self):
+        """Тест что хуки yt-dlp прерывают загрузку только после отмены"""
+        deadline = JobDeadline(60)
+        opts = deadline.apply({"progress_hooks": [print], "quiet": True})
+
+        assert opts["progress_hooks"][0] is print
+        assert len(opts["progress_hooks"]) == 2
+        assert opts["match_filter"]({"id": "1"}) is None
+        deadline.ytdlp_hook({"status": "downloading"})
+
+        deadline.cancel()
+        with pytest.raises(Exception):
+            deadline.ytdlp_hook({"status": "downloading"})
+        with pytest.raises(Exception):
+            opts["postprocessor_hooks"][0]({"status": "started"})
+
+    def test_remaining_never_negative(self):
+        """Тест оставшегося времени"""
+        deadline = JobDeadline(0)
+        assert deadline.remaining() == 0
+
+
+class TestUploadDeadline:
+    """Тесты для отправки с дедлайном"""
+
+    def test_upload_gets_at_least_minimum(self, monkeypatch):
+        """Тест что отправка получает остаток дедлайна, но не меньше минимума"""
+        monkeypatch.setattr(config, "DOWNLOAD_TIMEOUT", 300)
+        monkeypatch.setattr(config, "UPLOAD_MIN_TIMEOUT", 60)
+
+        assert upload_timeout(time.time() - 100) == pytest.approx(200, abs=1)
+        assert upload_timeout(time.time() - 1000) == 60
+
+    def test_slow_upload_raises_timeout(self, monkeypatch):
+        """Тест что зависшая отправка прерывается с DownloadTimeoutError"""
+        monkeypatch.setattr(config, "DOWNLOAD_TIMEOUT", 0)
+        monkeypatch.setattr(config, "UPLOAD_MIN_TIMEOUT", 0.05)
+
+        with pytest.raises(DownloadTimeoutError) as exc_info:
+            asyncio.run(upload_within_deadline(asyncio.sleep(10), time.time(), "vk"))
+
+        assert exc_info.value.stage == "upload"
+        assert "timeout" in str(exc_info.value).lower()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
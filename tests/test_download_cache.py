@@ -0,0 +1,139 @@
+"""
+Тесты для кэша загрузок
+"""
+import time
+import pytest
+from src.downloaders.download_cache import (
+    DownloadCache, InfoDictCache, make_content_key, sent_content_key
+)
+from src.processors.url_processor import URLProcessor
+
+
+class TestDownloadCache:
+    """Тесты для DownloadCache"""
+
+    def _make_file(self, tmp_path, name: str, size: int) -> str:
+        path = tmp_path / name
+        path.write_bytes(b"x" * size)
+        return str(path)
+
+    def test_make_content_key(self):
+        """Тест построения ключа контента"""
+        assert make_content_key("Instagram", "ABC123", "reel") == "instagram:ABC123:reel"
+        assert make_content_key("youtube", "dQw4w9WgXcQ", None) == "youtube:dQw4w9WgXcQ:default"
+        assert make_content_key("TikTok", None, "video") is None
+
+    def test_history_key_matches_send_key(self):
+        """Тест что повторная отправка из истории находит file_id первой отправки YouTube"""
+        url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+        url_info = URLProcessor().process(url)
+        # Ключ при отправке видео в выбранном качестве (url_handler)
+        send_key = sent_content_key("youtube", url_info.post_id, "video_360p")
+        # Ключ записи истории (commands): тип контента как в истории
+        history_key = sent_content_key(url_info.platform.value, url_info.post_id, "video_360p")
+
+        assert send_key == history_key == make_content_key("youtube", "dQw4w9WgXcQ", "360p")
+        assert sent_content_key("youtube", "dQw4w9WgXcQ", "audio") == "youtube:dQw4w9WgXcQ:audio"
+        assert sent_content_key("Instagram", "ABC123", "video") == "instagram:ABC123:video"
+
+    def test_put_and_get(self, tmp_path):
+        """Тест сохранения и получения записи"""
+        cache = DownloadCache(tmp_path / "index.json", ttl=60, max_bytes=1024 * 1024)
+        file_path = self._make_file(tmp_path, "video.mp4", 100)
+
+        cache.put("tiktok:1:video", {"success": True, "file_path": file_path, "file_size": 100})
+        data = cache.get("tiktok:1:video")
+
+        assert data is not None
+        assert data["file_path"] == file_path
+        assert cache.hits == 1
+
+    def test_index_persisted(self, tmp_path):
+        """Тест что индекс переживает перезапуск"""
+        index_path = tmp_path / "index.json"
+        file_path = self._make_file(tmp_path, "video.mp4", 100)
+
+        DownloadCache(index_path, ttl=60, max_bytes=1024).put(
+            "x:1:video", {"success": True, "file_path": file_path})
+        cache = DownloadCache(index_path, ttl=60, max_bytes=1024)
+
+        assert cache.get("x:1:video") is not None
+
+    def test_expired_entry_removed(self, tmp_path):
+        """Тест что просроченная запись удаляется вместе с файлом"""
+        cache = DownloadCache(tmp_path / "index.json", ttl=60, max_bytes=1024)
+        file_path = self._make_file(tmp_path, "video.mp4", 100)
+
+        cache.put("vk:1:video", {"success": True, "file_path": file_path})
+        cache._entries["vk:1:video"]["created"] = time.time() - 120
+
+        assert cache.get("vk:1:video") is None
+        assert not (tmp_path / "video.mp4").exists()
+
+    def test_missing_file_invalidates_entry(self, tmp_path):
+        """Тест что запись без файла на диске считается промахом"""
+        cache = DownloadCache(tmp_path / "index.json", ttl=60, max_bytes=1024)
+        file_path = self._make_file(tmp_path, "photo.jpg", 10)
+
+        cache.put("instagram:1:photo", {"success": True, "file_path": file_path})
+        (tmp_path / "photo.jpg").unlink()
+
+        assert cache.get("instagram:1:photo") is None
+        assert cache.get_stats()["entries"] == 0
+
+    def test_size_eviction_skips_pinned(self, tmp_path):
+        """Тест вытеснения по размеру: отправляемые файлы не удаляются"""
+        cache = DownloadCache(tmp_path / "index.json", ttl=60, max_bytes=250)
+        first = self._make_file(tmp_path, "first.mp4", 100)
+        second = self._make_file(tmp_path, "second.mp4", 100)
+        third = self._make_file(tmp_path, "third.mp4", 100)
+
+        cache.put("x:1:video", {"success": True, "file_path": first})
+        cache.put("x:2:video", {"success": True, "file_path": second})
+
+        with cache.pinned([first]):
+            cache.put("x:3:video", {"success": True, "file_path": third})
+
+        assert cache.get("x:1:video") is not None
+        assert cache.get("x:2:video") is None
+        assert cache.get("x:3:video") is not None
+        assert cache.total_size() <= 250
+
+
+
+class TestInfoDictCache:
+    """Тесты для InfoDictCache"""
+
+    def test_put_and_get(self):
+        """Тест что info dict из запроса форматов доступен загрузке"""
+        cache = InfoDictCache(ttl=60, max_entries=10)
+        cache.put("dQw4w9WgXcQ", {"id": "dQw4w9WgXcQ", "formats": []})
+
+        assert cache.get("dQw4w9WgXcQ")["id"] == "dQw4w9WgXcQ"
+        assert cache.get("other") is None
+        assert cache.get_stats()["hits"] == 1
+
+    def test_expired_entry(self):
+        """Тест что устаревший info dict не используется"""
+        cache = InfoDictCache(ttl=60, max_entries=10)
+        cache.put("id1", {"id": "id1"})
+        cache._entries["id1"] = (time.time() - 120, {"id": "id1"})
+
+        assert cache.get("id1") is None
+        assert cache.get_stats()["entries"] == 0
+
+    def test_lru_limit(self):
+        """Тест вытеснения давно не использованных записей"""
+        cache = InfoDictCache(ttl=60, max_entries=2)
+        cache.put("a", {"id": "a"})
+        cache.put("b", {"id": "b"})
+        cache.get("a")
+        cache.put("c", {"id": "c"})
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
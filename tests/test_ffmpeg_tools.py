@@ -0,0 +1,127 @@
+"""
+Тесты для пережатия видео
+"""
+import asyncio
+import struct
+import pytest
+from src.downloaders import ffmpeg_tools
+from src.downloaders.ffmpeg_tools import plan_bitrate, transcode_args
+
+MB = 1024 * 1024
+
+
+class TestPlanBitrate:
+    """Тесты выбора битрейта"""
+
+    def test_short_video_keeps_resolution(self):
+        """Тест что короткому видео хватает битрейта без уменьшения кадра"""
+        bitrate, height = plan_bitrate(60, 50 * MB)
+        assert bitrate > 2_500_000
+        assert height is None
+
+    def test_long_video_downscaled(self):
+        """Тест что с ростом длительности кадр уменьшается"""
+        _, height_4min = plan_bitrate(4 * 60, 50 * MB)
+        _, height_15min = plan_bitrate(15 * 60, 50 * MB)
+        assert height_4min == 720
+        assert height_15min == 360
+
+    def test_budget_respected(self):
+        """Тест что битрейт видео и аудио укладывается в бюджет"""
+        duration = 300
+        bitrate, _ = plan_bitrate(duration, 50 * MB)
+        assert (bitrate + ffmpeg_tools.AUDIO_BITRATE) * duration / 8 <= 50 * MB
+
+    def test_too_long_video_not_fitted(self):
+        """Тест что очень длинное видео не пережимается"""
+        assert plan_bitrate(3 * 60 * 60, 50 * MB) is None
+        assert plan_bitrate(0, 50 * MB) is None
+
+
+class TestTranscode:
+    """Тесты запуска ffmpeg"""
+
+    def test_args_include_faststart_and_scale(self, tmp_path):
+        """Тест аргументов ffmpeg"""
+        args = transcode_args(tmp_path / "in.webm", tmp_path / "out.mp4", 800_000, 480)
+        assert args[args.index("-movflags") + 1] == "+faststart"
+        assert args[args.index("-b:v") + 1] == "800000"
+        assert "min(480,ih)" in args[args.index("-vf") + 1]
+        assert args[-1] == str(tmp_path / "out.mp4")
+
+    def test_retry_with_lower_bitrate_when_output_too_large(self, tmp_path, monkeypatch):
+        """Тест повторного пережатия, если размер не уложился в бюджет"""
+        source = tmp_path / "video.mp4"
+        source.write_bytes(b"x")
+        bitrates = []
+
+        async def fake_run(program, args):
+            bitrates.append(int(args[args.index("-b:v") + 1]))
+            size = 12 * MB if len(bitrates) == 1 else 9 * MB
+            (tmp_path / "video.fit.mp4").write_bytes(b"x" * size)
+            return ""
+
+        monkeypatch.setattr(ffmpeg_tools, "_run", fake_run)
+        output = asyncio.run(ffmpeg_tools.fit_video(source, 10 * MB, duration=60))
+
+        assert output == tmp_path / "video.fit.mp4"
+        assert len(bitrates) == 2
+        assert bitrates[1] < bitrates[0]
+
+
+
+def write_atoms(path, *kinds):
+    """Пишет MP4 из пустых атомов верхнего уровня"""
+    with open(path, "wb") as f:
+        for kind in kinds:
+            payload = b"\0" * 16
+            f.write(struct.pack(">I4s", 8 + len(payload), kind.encode()) + payload)
+
+
+class TestFaststart:
+    """Тесты переноса moov в начало файла"""
+
+    def test_atom_order_detected(self, tmp_path):
+        """Тест определения порядка moov/mdat"""
+        write_atoms(tmp_path / "fast.mp4", "ftyp", "moov", "mdat")
+        write_atoms(tmp_path / "slow.mp4", "ftyp", "mdat", "moov")
+        (tmp_path / "garbage.mp4").write_bytes(b"abc")
+
+        assert ffmpeg_tools.moov_before_mdat(tmp_path / "fast.mp4") is True
+        assert ffmpeg_tools.moov_before_mdat(tmp_path / "slow.mp4") is False
+        assert ffmpeg_tools.moov_before_mdat(tmp_path / "garbage.mp4") is None
+
+    def test_remux_only_when_moov_at_end(self, tmp_path, monkeypatch):
+        """Тест что remux запускается только для файлов с moov в конце"""
+        calls = []
+
+        async def fake_run(program, args):
+            calls.append(args)
+            write_atoms(args[-1], "ftyp", "moov", "mdat")
+            return ""
+
+        monkeypatch.setattr(ffmpeg_tools, "_run", fake_run)
+        write_atoms(tmp_path / "fast.mp4", "ftyp", "moov", "mdat")
+        write_atoms(tmp_path / "slow.mp4", "ftyp", "mdat", "moov")
+
+        assert asyncio.run(ffmpeg_tools.faststart(tmp_path / "fast.mp4")) is False
+        assert asyncio.run(ffmpeg_tools.faststart(tmp_path / "slow.mp4")) is True
+
+        assert len(calls) == 1
+        assert "copy" in calls[0]
+        assert ffmpeg_tools.moov_before_mdat(tmp_path / "slow.mp4") is True
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["fast.mp4", "slow.mp4"]
+
+    def test_probe_parses_dimensions_and_duration(self, tmp_path, monkeypatch):
+        """Тест разбора вывода ffprobe"""
+        async def fake_run(program, args):
+            return '{"streams": [{"width": 1280, "height": 720}], "format": {"duration": "12.5"}}'
+
+        monkeypatch.setattr(ffmpeg_tools, "_run", fake_run)
+        meta = asyncio.run(ffmpeg_tools.probe_video(tmp_path / "video.mp4"))
+
+        assert meta == {"width": 1280, "height": 720, "duration": 12.5}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
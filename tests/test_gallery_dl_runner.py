@@ -0,0 +1,96 @@
+"""
+Тесты для запуска gallery-dl
+"""
+import asyncio
+import json
+import sys
+import pytest
+from src.downloaders import gallery_dl_runner
+from src.downloaders.gallery_dl_runner import (
+    GalleryDlTimeout, JsonArrayStreamParser, run_gallery_dl
+)
+
+
+class TestJsonArrayStreamParser:
+    """Тесты для JsonArrayStreamParser"""
+
+    def test_items_returned_as_soon_as_complete(self):
+        """Тест что элементы отдаются до закрывающей скобки массива"""
+        text = json.dumps([[2, {"username": "user"}], [3, "https://a/1.jpg", {}]], indent=2)
+        parser = JsonArrayStreamParser()
+        cut = text.index("[\n    3")
+
+        first = parser.feed(text[:cut])
+        second = parser.feed(text[cut:])
+        parser.close()
+
+        assert first == [[2, {"username": "user"}]]
+        assert second == [[3, "https://a/1.jpg", {}]]
+
+    def test_byte_by_byte_feed(self):
+        """Тест разбора при чтении по одному символу"""
+        data = [[3, "https://a/1.jpg"], [3, "https://a/2.jpg"], 42]
+        parser = JsonArrayStreamParser()
+        items = []
+        for char in json.dumps(data):
+            items.extend(parser.feed(char))
+
+        assert items == data
+
+    def test_not_an_array(self):
+        """Тест что не-массив считается ошибкой разбора"""
+        with pytest.raises(json.JSONDecodeError):
+            JsonArrayStreamParser().feed('{"error": true}')
+
+    def test_unterminated_array(self):
+        """Тест что обрезанный вывод обнаруживается"""
+        parser = JsonArrayStreamParser()
+        parser.feed('[[2, {}], [3, "https://a')
+        with pytest.raises(json.JSONDecodeError):
+            parser.close()
+
+
+class TestRunGalleryDl:
+    """Тесты для run_gallery_dl (вместо gallery-dl запускается python)"""
+
+    @pytest.fixture(autouse=True)
+    def fake_gallery_dl(self, monkeypatch):
+        monkeypatch.setattr(gallery_dl_runner, "GALLERY_DL", sys.executable)
+
+    def test_json_items_streamed(self):
+        """Тест потокового получения JSON-элементов"""
+        script = "import json; print(json.dumps([[2, {'a': 1}], [3, 'https://x/1.jpg']]))"
+        seen = []
+
+        result = asyncio.run(run_gallery_dl(["-c", script], timeout=10, on_item=seen.append))
+
+        assert result.ok
+        assert seen == [[2, {"a": 1}], [3, "https://x/1.jpg"]]
+
+    def test_lines_mode_and_stderr(self):
+        """Тест построчного режима (-g) и чтения stderr"""
+        script = "import sys; print('https://x/1.jpg'); print('https://x/2.jpg'); sys.stderr.write('warn'); sys.exit(1)"
+
+        result = asyncio.run(run_gallery_dl(["-c", script], timeout=10, json_output=False))
+
+        assert result.items == ["https://x/1.jpg", "https://x/2.jpg"]
+        assert result.returncode == 1
+        assert result.stderr == "warn"
+        assert not result.ok
+
+    def test_timeout_kills_process(self):
+        """Тест что процесс убивается по таймауту"""
+        script = "import time; print('[', flush=True); time.sleep(30)"
+
+        async def run():
+            loop = asyncio.get_event_loop()
+            started = loop.time()
+            with pytest.raises(GalleryDlTimeout):
+                await run_gallery_dl(["-c", script], timeout=0.5)
+            return loop.time() - started
+
+        assert asyncio.run(run()) < 5
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,91 @@
+"""
+Тесты для пула аккаунтов Instagram
+"""
+import asyncio
+import pytest
+from src.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.utils.instagram_accounts import InstagramAccountPool
+from src.utils.rate_limiter import RateLimiter
+
+
+def make_pool(tmp_path, names=("main", "second"), cooldown=60, max_defer=0.5):
+    accounts_dir = tmp_path / "accounts"
+    accounts_dir.mkdir()
+    for name in names:
+        path = tmp_path / "instagram_cookies.txt" if name == "main" else accounts_dir / f"{name}.txt"
+        path.write_text("# cookies\n")
+    limiter = RateLimiter()
+    limiter.set_interval("instagram", 0)
+    breaker = CircuitBreaker(threshold=1, window=60, cooldown=cooldown, max_cooldown=cooldown,
+                             backoff_base=0.01, backoff_max=0.02, max_defer=max_defer)
+    return InstagramAccountPool(tmp_path / "instagram_cookies.txt", accounts_dir,
+                                limiter=limiter, breaker=breaker, max_defer=max_defer)
+
+
+class TestInstagramAccountPool:
+    """Тесты для InstagramAccountPool"""
+
+    def test_round_robin_between_healthy_accounts(self, tmp_path):
+        """Тест что запросы чередуются между здоровыми аккаунтами"""
+        pool = make_pool(tmp_path)
+
+        async def run():
+            names = []
+            for _ in range(4):
+                account = await pool.acquire()
+                names.append(account.name)
+                pool.record(account)
+                pool.release(account)
+                await asyncio.sleep(0.01)
+            return names
+
+        assert asyncio.run(run()) == ["main", "second", "main", "second"]
+
+    def test_busy_account_not_shared(self, tmp_path):
+        """Тест что одновременные запросы получают разные аккаунты"""
+        pool = make_pool(tmp_path)
+
+        async def run():
+            first = await pool.acquire()
+            second = await pool.acquire()
+            return first.name, second.name
+
+        assert sorted(asyncio.run(run())) == ["main", "second"]
+
+    def test_throttled_account_cools_down(self, tmp_path):
+        """Тест что после 429 аккаунт пропускается, а когда заблокированы все - отказ"""
+        pool = make_pool(tmp_path)
+        main = pool.get("main")
+        pool.breaker.record_failure(main.lane, "HTTP Error 429: Too Many Requests")
+        pool.record(main, "HTTP Error 429: Too Many Requests")
+        assert main.score < 1
+
+        async def run():
+            account = await pool.acquire()
+            pool.release(account)
+            return account.name
+
+        assert asyncio.run(run()) == "second"
+
+        pool.breaker.record_failure("instagram:second", "login required")
+        pool.record(pool.get("second"), "login required")
+        assert pool.get("second").needs_login
+        with pytest.raises(CircuitOpenError):
+            pool.check()
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(pool.acquire())
+
+    def test_no_cookies_anonymous(self, tmp_path):
+        """Тест что без файлов cookies запросы идут без аккаунта"""
+        pool = make_pool(tmp_path, names=())
+        assert asyncio.run(pool.acquire()) is None
+        assert pool.cookie_args() == []
+
+    def test_account_lane_uses_platform_interval(self):
+        """Тест что полоса аккаунта наследует интервал платформы"""
+        limiter = RateLimiter()
+        assert limiter.get_stats("instagram:second")["min_interval"] == 5.0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
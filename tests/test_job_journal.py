@@ -0,0 +1,49 @@
+"""
+Тесты для журнала незавершённых загрузок
+"""
+import time
+import pytest
+from src.downloaders.job_journal import DownloadJournal, partial_bytes
+
+
+class TestDownloadJournal:
+    """Тесты для DownloadJournal"""
+
+    def test_interrupted_jobs_survive_restart(self, tmp_path):
+        """Тест что незавершённая загрузка видна после перезапуска"""
+        path = tmp_path / "jobs.json"
+        journal = DownloadJournal(path, max_age=3600)
+        journal.start("youtube:abc:720p", {"kind": "youtube_quality", "url": "u", "quality": 720})
+        journal.start("tiktok:1:video", {"kind": "download", "url": "t"})
+        journal.finish("tiktok:1:video")
+
+        restarted = DownloadJournal(path, max_age=3600)
+        jobs = restarted.interrupted()
+
+        assert [key for key, _ in jobs] == ["youtube:abc:720p"]
+        assert jobs[0][1]["quality"] == 720
+        # Журнал забран - повторный перезапуск не запустит загрузку ещё раз
+        assert DownloadJournal(path, max_age=3600).interrupted() == []
+
+    def test_old_jobs_dropped(self, tmp_path):
+        """Тест что слишком старые загрузки не возобновляются"""
+        journal = DownloadJournal(tmp_path / "jobs.json", max_age=60)
+        journal.start("vk:1:video", {"kind": "download"})
+        journal._jobs["vk:1:video"]["started"] = time.time() - 120
+
+        assert journal.interrupted() == []
+        assert journal.get_stats()["pending"] == 0
+
+    def test_partial_bytes_counts_only_partial_files(self, tmp_path):
+        """Тест подсчёта недокачанных данных"""
+        (tmp_path / "video.mp4.part").write_bytes(b"x" * 100)
+        (tmp_path / "video.mp4.part-Frag3").write_bytes(b"x" * 10)
+        (tmp_path / "video.mp4.ytdl").write_bytes(b"{}")
+        (tmp_path / "audio.m4a").write_bytes(b"x" * 1000)
+
+        assert partial_bytes(tmp_path) == 112
+        assert partial_bytes(tmp_path / "missing") == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
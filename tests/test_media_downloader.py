@@ -2,6 +2,7 @@
 Тесты для Media Downloader
 """
 import os
+import shutil
 import pytest
 import asyncio
 from pathlib import Path
@@ -99,6 +100,24 @@ class TestMediaDownloader:
         # Файл должен быть удален функцией
         pass
 
+    def test_oversized_video_kept_for_transcoder(self, tmp_path, monkeypatch):
+        """Большое видео остаётся для пережатия, большое аудио удаляется"""
+        monkeypatch.setattr(config, "TRANSCODE_OVERSIZED", True)
+        self.downloader.MAX_FILE_SIZES = {"video": 10, "audio": 10}
+        video = tmp_path / "big.mp4"
+        audio = tmp_path / "big.mp3"
+        video.write_bytes(b"x" * 100)
+        audio.write_bytes(b"x" * 100)
+
+        assert self.downloader._check_file_size(video, "video") is False
+        assert self.downloader._check_file_size(audio, "audio") is False
+        assert video.exists()
+        assert not audio.exists()
+
+        monkeypatch.setattr(config, "TRANSCODE_OVERSIZED", False)
+        assert self.downloader._check_file_size(video, "video") is False
+        assert not video.exists()
+
     def test_ydl_opts_base_configuration(self):
         """Тест базовой конфигурации yt-dlp"""
         opts = self.downloader.YDL_OPTS_BASE
@@ -154,6 +173,344 @@ class TestMediaDownloader:
         except Exception as e:
             pytest.fail(f"cleanup_old_files raised {type(e).__name__}")
 
+    def test_single_flight_coalesces_concurrent_downloads(self):
+        """Тест что одновременные запросы одного контента выполняют одну загрузку"""
+        calls = []
+
+        async def fake_download():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return DownloadInfo(success=True, file_path="/tmp/video.mp4", platform="TikTok")
+
+        async def run():
+            return await asyncio.gather(*[
+                self.downloader._single_flight("tiktok:123:video", fake_download)
+                for _ in range(5)
+            ])
+
+        results = asyncio.run(run())
+
+        assert len(calls) == 1
+        assert all(r.file_path == "/tmp/video.mp4" for r in results)
+        assert self.downloader.downloads_coalesced == 4
+        assert self.downloader.get_stats()["in_flight"] == 0
+
+    def test_job_dirs_are_unique(self):
+        """Тест что каждая загрузка получает свою директорию"""
+        first = self.downloader._make_job_dir("video")
+        second = self.downloader._make_job_dir("video")
+        try:
+            assert first != second
+            assert first.parent == self.downloader.DOWNLOAD_DIRS["video"]
+        finally:
+            self.downloader._remove_job_dir(first)
+            self.downloader._remove_job_dir(second)
+
+    def test_resumable_job_dir_keeps_partial_data(self):
+        """Тест что повторная попытка получает ту же директорию с .part-файлами"""
+        from src.downloaders.job_journal import current_job_key
+
+        token = current_job_key.set("youtube:resume-test:720p")
+        try:
+            first = self.downloader._make_job_dir("video", resumable=True)
+            (first / "video.mp4.part").write_bytes(b"x" * 100)
+            self.downloader._remove_job_dir(first)
+            resumed_before = self.downloader.journal.resumed_bytes
+
+            second = self.downloader._make_job_dir("video", resumable=True)
+
+            assert second == first
+            assert (second / "video.mp4.part").exists()
+            assert self.downloader.journal.resumed_bytes == resumed_before + 100
+        finally:
+            current_job_key.reset(token)
+            shutil.rmtree(first, ignore_errors=True)
+
+    def test_deadline_stops_hung_download(self, monkeypatch):
+        """Тест что зависшая загрузка останавливается по дедлайну и удаляет свои файлы"""
+        from src.downloaders.job_journal import current_job_key
+        job_dirs = []
+
+        async def hung_download():
+            job_dir = self.downloader._make_job_dir("video", resumable=True)
+            (job_dir / "video.mp4.part").write_bytes(b"x" * 100)
+            job_dirs.append(job_dir)
+            await asyncio.sleep(10)
+
+        async def run():
+            current_job_key.set("tiktok:deadline-test:video")
+            return await self.downloader._run_with_deadline("TikTok", hung_download)
+
+        monkeypatch.setattr(config, "DOWNLOAD_TIMEOUT", 0.05)
+        result = asyncio.run(run())
+
+        assert result.success is False
+        assert result.platform == "TikTok"
+        assert not job_dirs[0].exists()
+        assert self.downloader.get_stats()["timeouts"] == {"tiktok": 1}
+
+    def test_process_pool_job_limited_by_deadline(self, monkeypatch):
+        """Тест что задача пула процессов ждётся не дольше остатка дедлайна и не повторяется"""
+        timeouts = []
+
+        class FakePool:
+            hung = 0
+
+            async def run(self, url, ydl_opts, download=True, info=None, timeout=None):
+                timeouts.append(timeout)
+                raise asyncio.TimeoutError()
+
+        monkeypatch.setattr(self.downloader, "process_pool", FakePool())
+        monkeypatch.setattr(config, "DOWNLOAD_TIMEOUT", 60)
+
+        async def run():
+            return await self.downloader._run_with_deadline(
+                "TikTok", lambda: self.downloader.download_video("https://tiktok.com/v/1", "TikTok")
+            )
+
+        result = asyncio.run(run())
+
+        assert result.success is False
+        assert len(timeouts) == 1
+        assert 0 < timeouts[0] <= 60
+        assert self.downloader.get_stats()["timeouts"] == {"tiktok": 1}
+
+    def test_upload_timeouts_counted_per_lane(self):
+        """Таймауты отправки видны в статистике рядом с таймаутами загрузки"""
+        self.downloader.record_upload_timeout("YouTube")
+        self.downloader.record_upload_timeout("YouTube")
+        assert self.downloader.get_stats()["timeouts"]["youtube:upload"] == 2
+
+    def test_cancelled_download_kept_in_journal_only_on_shutdown(self, tmp_path, monkeypatch):
+        """Тест что отменённая загрузка возобновляется после перезапуска, только если отменила её остановка бота"""
+        from src.downloaders.job_journal import DownloadJournal
+        monkeypatch.setattr(self.downloader, "journal", DownloadJournal(tmp_path / "jobs.json", max_age=3600))
+
+        async def hung_download():
+            await asyncio.sleep(10)
+
+        async def cancel(key):
+            task = asyncio.create_task(self.downloader._cached_download(
+                key, hung_download, platform="TikTok", job={"kind": "download", "url": "u"}
+            ))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel("tiktok:cancel-test:video"))
+        assert self.downloader.journal.get_stats()["pending"] == 0
+
+        self.downloader.begin_shutdown()
+        asyncio.run(cancel("tiktok:shutdown-test:video"))
+        assert [key for key, _ in self.downloader.journal.interrupted()] == ["tiktok:shutdown-test:video"]
+
+    def test_collect_output_paths_from_requested_downloads(self, tmp_path):
+        """Тест что пути берутся из requested_downloads, включая элементы плейлиста"""
+        first = tmp_path / "a.mp4"
+        second = tmp_path / "b.mp4"
+        first.write_bytes(b"x")
+        second.write_bytes(b"x")
+        (tmp_path / "unrelated.mp4").write_bytes(b"x")
+
+        info = {
+            "_type": "playlist",
+            "entries": [
+                {"requested_downloads": [{"filepath": str(first)}]},
+                {"requested_downloads": [{"filepath": str(second)}]},
+            ],
+        }
+
+        assert self.downloader._collect_output_paths(info, tmp_path) == [str(first), str(second)]
+
+    def test_collect_output_paths_falls_back_to_job_dir(self, tmp_path):
+        """Тест поиска файлов только в директории загрузки"""
+        (tmp_path / "video.mp4").write_bytes(b"x")
+        (tmp_path / "video.mp4.part").write_bytes(b"x")
+
+        paths = self.downloader._collect_output_paths({"id": "1"}, tmp_path)
+
+        assert paths == [str(tmp_path / "video.mp4")]
+
+    def test_fetch_many_streams_files_in_order(self, tmp_path):
+        """Тест параллельной потоковой загрузки фото через общий HTTP-клиент"""
+        from aiohttp import web
+
+        async def handler(request):
+            name = request.match_info["name"]
+            if name == "missing":
+                return web.Response(status=404)
+            return web.Response(body=name.encode() * 1000)
+
+        async def run():
+            app = web.Application()
+            app.router.add_get("/{name}", handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = runner.addresses[0][1]
+            try:
+                items = [
+                    (f"http://127.0.0.1:{port}/{name}", str(tmp_path / f"{name}.jpg"))
+                    for name in ("a", "missing", "c")
+                ]
+                return await self.downloader._fetch_many(items)
+            finally:
+                await self.downloader.close()
+                await runner.cleanup()
+
+        sizes = asyncio.run(run())
+
+        assert sizes == [1000, None, 1000]
+        assert (tmp_path / "c.jpg").read_bytes() == b"c" * 1000
+        assert not (tmp_path / "missing.jpg").exists()
+
+    def test_instagram_entry_uses_account_from_pool(self, tmp_path, monkeypatch):
+        """Тест что элемент плейлиста Instagram качается от аккаунта пула (cookies, оценка аккаунта)"""
+        from src.utils.circuit_breaker import CircuitBreaker
+        from src.utils.instagram_accounts import InstagramAccountPool, current_account
+        from src.utils.rate_limiter import RateLimiter
+
+        (tmp_path / "instagram_cookies.txt").write_text("# cookies\n")
+        limiter = RateLimiter()
+        limiter.set_interval("instagram", 0)
+        pool = InstagramAccountPool(tmp_path / "instagram_cookies.txt", tmp_path / "accounts",
+                                    limiter=limiter, max_defer=0.5,
+                                    breaker=CircuitBreaker(threshold=1, window=60, cooldown=60, max_cooldown=60,
+                                                           backoff_base=0.01, backoff_max=0.02, max_defer=0.5))
+        monkeypatch.setattr(self.downloader, "accounts", pool)
+        monkeypatch.setattr(self.downloader, "breaker", pool.breaker)
+        used = []
+
+        async def fake_run_ydl(url, ydl_opts, download=True, info=None):
+            used.append(current_account.get())
+            return {"requested_downloads": []}
+
+        monkeypatch.setattr(self.downloader, "_run_ydl", fake_run_ydl)
+        asyncio.run(self.downloader._download_entry(0, {"webpage_url": "https://i/1"}, {}, "Instagram"))
+
+        assert [account.name for account in used] == ["main"]
+        assert pool.get("main").requests == 1
+        assert not pool.get("main").in_use
+
+    def test_instagram_photo_fallback_uses_account_from_pool(self, tmp_path, monkeypatch):
+        """Тест что пост Instagram без видео качается через gallery-dl с cookies аккаунта пула"""
+        from src.downloaders import media_downloader as module
+        from src.downloaders.gallery_dl_runner import GalleryDlResult
+        from src.utils.circuit_breaker import CircuitBreaker
+        from src.utils.instagram_accounts import InstagramAccountPool
+        from src.utils.rate_limiter import RateLimiter
+
+        cookies = tmp_path / "instagram_cookies.txt"
+        cookies.write_text("# cookies\n")
+        limiter = RateLimiter()
+        limiter.set_interval("instagram", 0)
+        pool = InstagramAccountPool(cookies, tmp_path / "accounts", limiter=limiter, max_defer=0.5,
+                                    breaker=CircuitBreaker(threshold=1, window=60, cooldown=60, max_cooldown=60,
+                                                           backoff_base=0.01, backoff_max=0.02, max_defer=0.5))
+        monkeypatch.setattr(self.downloader, "accounts", pool)
+        monkeypatch.setattr(self.downloader, "breaker", pool.breaker)
+        calls = []
+
+        async def fake_download_with_retry(url, ydl_opts, **kwargs):
+            raise Exception("ERROR: [Instagram] 123: No video formats found!")
+
+        async def fake_run_gallery_dl(args, **kwargs):
+            calls.append(args)
+            return GalleryDlResult(returncode=1, stderr="HTTP Error 429: Too Many Requests")
+
+        monkeypatch.setattr(self.downloader, "_download_with_retry", fake_download_with_retry)
+        monkeypatch.setattr(module, "run_gallery_dl", fake_run_gallery_dl)
+        result = asyncio.run(self.downloader.download_video("https://instagram.com/p/1", "Instagram"))
+
+        assert result.success is False
+        assert calls == [["-j", "--cookies", str(cookies), "https://instagram.com/p/1"]]
+        assert pool.get("main").requests == 1
+        assert pool.get("main").throttled == 1
+
+    def test_twitter_photo_respects_open_circuit(self, monkeypatch):
+        """Тест что gallery-dl не запускается, пока платформа заблокировала бота"""
+        from src.downloaders import media_downloader as module
+        from src.utils.circuit_breaker import CircuitBreaker
+
+        breaker = CircuitBreaker(threshold=1, window=60, cooldown=60, max_cooldown=60,
+                                 backoff_base=0.01, backoff_max=0.02, max_defer=0)
+        breaker.record_failure("x", "HTTP Error 429: Too Many Requests")
+        monkeypatch.setattr(self.downloader, "breaker", breaker)
+        calls = []
+
+        async def fake_run_gallery_dl(args, **kwargs):
+            calls.append(args)
+
+        monkeypatch.setattr(module, "run_gallery_dl", fake_run_gallery_dl)
+        result = asyncio.run(self.downloader.download_twitter_photo("https://x.com/a/status/1", "X"))
+
+        assert result.success is False
+        assert "ограничила запросы" in result.error_message
+        assert calls == []
+
+    def test_oversized_playlist_removes_job_dir(self, monkeypatch):
+        """Тест что плейлист из одних слишком больших видео не оставляет директорию загрузки"""
+        entries = [{"title": f"clip{i}", "webpage_url": f"https://x/{i}"} for i in range(2)]
+        job_dirs = []
+
+        async def fake_download_with_retry(url, ydl_opts, download=True, info=None, platform=None):
+            job_dirs.append(Path(ydl_opts["outtmpl"]).parent)
+            return {"_type": "playlist", "entries": entries, "title": "post"}
+
+        async def fake_download_entry(index, entry, ydl_opts, platform=None):
+            path = ydl_opts["outtmpl"].replace("%(title).50s", entry["title"]).replace("%(ext)s", "mp4")
+            Path(path).write_bytes(b"v" * (2 * 1024 * 1024))
+            return [path]
+
+        monkeypatch.setattr(self.downloader, "_download_with_retry", fake_download_with_retry)
+        monkeypatch.setattr(self.downloader, "_download_entry", fake_download_entry)
+        monkeypatch.setattr(self.downloader, "MAX_FILE_SIZES", {"video": 1024 * 1024})
+
+        result = asyncio.run(self.downloader.download_video("https://x.com/a/status/1", "X"))
+
+        assert result.success is False
+        assert "максимум 1 MB" in result.error_message
+        assert not job_dirs[0].exists()
+
+    def test_carousel_entries_downloaded_in_parallel(self, monkeypatch):
+        """Тест параллельной загрузки карусели: порядок сохраняется, ошибка слайда не мешает остальным"""
+        entries = [
+            {"title": f"clip{i}", "formats": [{"format_id": "mp4"}], "webpage_url": f"https://x/{i}"}
+            for i in range(4)
+        ]
+        running = 0
+        peak = 0
+
+        async def fake_run_ydl(url, ydl_opts, download=True, info=None):
+            nonlocal running, peak
+            if not download:
+                return {"entries": entries, "webpage_url": url}
+            running += 1
+            peak = max(peak, running)
+            try:
+                await asyncio.sleep(0.01 * (4 - int(url.rsplit("/", 1)[1])))
+                if url.endswith("/1"):
+                    raise Exception("HTTP Error 403")
+                path = ydl_opts["outtmpl"].replace("%(ext)s", "mp4")
+                Path(path).write_bytes(b"v")
+                return {"requested_downloads": [{"filepath": path}]}
+            finally:
+                running -= 1
+
+        monkeypatch.setattr(self.downloader, "_run_ydl", fake_run_ydl)
+        monkeypatch.setattr(config, "CAROUSEL_CONCURRENCY", 3)
+
+        result = asyncio.run(self.downloader.download_carousel("https://x/post", "X"))
+        try:
+            assert result.success
+            assert [Path(p).name for p in result.file_paths] == ["clip0_0.mp4", "clip2_2.mp4", "clip3_3.mp4"]
+            assert result.file_size == 3
+            assert peak == 3
+        finally:
+            self.downloader._remove_job_dir(Path(result.file_path).parent)
+
     def test_download_dirs_permissions(self):
         """Тест что директории доступны для записи"""
         for dir_path in self.downloader.DOWNLOAD_DIRS.values():
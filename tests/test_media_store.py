@@ -0,0 +1,134 @@
+"""
+Тесты для хранилища файлов загрузок
+"""
+import asyncio
+import os
+import time
+import pytest
+from src.downloaders import media_store as media_store_module
+from src.downloaders.media_store import MediaStore, result_paths
+
+
+def make_file(path, size, age=0):
+    """Создаёт файл размера size с временем изменения age секунд назад"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+class TestMediaStore:
+    """Тесты для MediaStore"""
+
+    def make_store(self, tmp_path, busy=()):
+        return MediaStore(tmp_path / "index.json", max_bytes=1000, high_watermark=0.9,
+                          low_watermark=0.7, is_busy=lambda path: path in busy)
+
+    def test_evicts_least_recently_used_to_low_watermark(self, tmp_path):
+        """Тест что при превышении верхней отметки удаляются самые старые файлы"""
+        store = self.make_store(tmp_path)
+        old = make_file(tmp_path / "a" / "old.mp4", 300)
+        used = make_file(tmp_path / "b" / "used.mp4", 300)
+        store.track([old])
+        store.track([used])
+        store._files[old]["last_access"] -= 100
+        store._files[used]["last_access"] -= 50
+        store.touch([used])
+
+        store.track([make_file(tmp_path / "c" / "new.mp4", 400)])
+
+        assert not os.path.exists(old)
+        assert not (tmp_path / "a").exists()
+        assert os.path.exists(used)
+        assert store.total_size() == 700
+        assert store.get_stats()["evicted_files"] == 1
+
+    def test_favorites_and_busy_files_not_evicted(self, tmp_path):
+        """Тест что избранное и отправляемые файлы не вытесняются"""
+        favorite = make_file(tmp_path / "fav.mp4", 400)
+        sending = make_file(tmp_path / "sending.mp4", 400)
+        store = self.make_store(tmp_path, busy={sending})
+        store.track([favorite, sending])
+        store.pin_favorite(favorite)
+
+        store.track([make_file(tmp_path / "new.mp4", 200)])
+
+        assert os.path.exists(favorite)
+        assert os.path.exists(sending)
+        assert os.path.exists(tmp_path / "new.mp4")
+
+    def test_index_persisted_and_files_deleted_elsewhere_dropped(self, tmp_path):
+        """Тест что индекс переживает перезапуск, а удалённые в обход файлы не занимают бюджет"""
+        store = self.make_store(tmp_path)
+        gone = make_file(tmp_path / "gone.mp4", 500)
+        store.track([gone])
+        store.pin_favorite(gone)
+        os.remove(gone)
+        store.unpin_favorite(gone)
+
+        reloaded = self.make_store(tmp_path)
+        assert reloaded.total_size() == 500
+
+        reloaded.track([make_file(tmp_path / "new.mp4", 450)])
+        assert reloaded.total_size() == 450
+
+    def test_scan_builds_index_once(self, tmp_path):
+        """Тест что обход директорий выполняется только без индекса"""
+        root = tmp_path / "videos"
+        make_file(root / "job" / "video.mp4", 100, age=60)
+        make_file(root / "job" / "video.mp4.part", 50)
+        store = self.make_store(tmp_path)
+
+        store.scan([root])
+        assert store.get_stats()["files"] == 1
+
+        make_file(root / "job2" / "other.mp4", 100)
+        store.scan([root])
+        assert store.get_stats()["files"] == 1
+
+    def test_hardlinks_counted_once_and_evicted_together(self, tmp_path):
+        """Тест что жёсткие ссылки (файл загрузки + blob) занимают бюджет один раз и удаляются вместе"""
+        store = self.make_store(tmp_path)
+        job = make_file(tmp_path / "job" / "video.mp4", 400)
+        blob = str(tmp_path / "blobs" / "ab" / "abcd.mp4")
+        os.makedirs(os.path.dirname(blob))
+        os.link(job, blob)
+        store.track([job, blob])
+        assert store.total_size() == 400
+        store._files[job]["last_access"] -= 100
+        store._files[blob]["last_access"] -= 100
+
+        store.track([make_file(tmp_path / "new" / "new.mp4", 550)])
+
+        assert not os.path.exists(job)
+        assert not os.path.exists(blob)
+        assert store.total_size() == 550
+
+    def test_saves_deferred_inside_event_loop(self, tmp_path, monkeypatch):
+        """Тест что в цикле событий индекс пишется один раз за SAVE_DELAY, а flush - сразу"""
+        monkeypatch.setattr(media_store_module, "SAVE_DELAY", 0.01)
+        store = self.make_store(tmp_path)
+        first = make_file(tmp_path / "first.mp4", 100)
+        second = make_file(tmp_path / "second.mp4", 100)
+
+        async def run():
+            store.track([first])
+            store.touch([first])
+            assert not (tmp_path / "index.json").exists()
+            await asyncio.sleep(0.05)
+            assert self.make_store(tmp_path).get_stats()["files"] == 1
+            store.track([second])
+            store.flush()
+
+        asyncio.run(run())
+        assert self.make_store(tmp_path).get_stats()["files"] == 2
+
+    def test_result_paths_include_thumbnails(self):
+        """Тест что превью видео учитываются вместе с файлом"""
+        info = {"file_path": "/d/v.mp4", "media_meta": {"/d/v.mp4": {"thumbnail": "/d/v.thumb.jpg"}}}
+        assert result_paths(info) == ["/d/v.mp4", "/d/v.thumb.jpg"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
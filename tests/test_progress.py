@@ -0,0 +1,84 @@
+"""
+Тесты для прогресса загрузок
+"""
+import asyncio
+import threading
+import pytest
+from src.downloaders.progress import DownloadProgress, ProgressMetrics
+
+
+class TestDownloadProgress:
+    """Тесты для DownloadProgress"""
+
+    def test_ytdlp_hook_aggregates_files(self):
+        """Тест что прогресс видео и аудио дорожек суммируется"""
+        async def run():
+            progress = DownloadProgress("youtube", interval=0, metrics=ProgressMetrics())
+            progress.ytdlp_hook({"status": "downloading", "filename": "v.mp4",
+                                 "downloaded_bytes": 300, "total_bytes": 800})
+            progress.ytdlp_hook({"status": "finished", "filename": "a.m4a", "total_bytes": 200})
+            return progress.snapshot()
+
+        snapshot = asyncio.run(run())
+        assert snapshot.downloaded == 500
+        assert snapshot.total == 1000
+        assert snapshot.percent == 50
+
+    def test_unknown_total_has_no_percent(self):
+        """Тест что без размера файла процент не показывается"""
+        async def run():
+            progress = DownloadProgress("x", interval=0, metrics=ProgressMetrics())
+            progress.add_total(None)
+            progress.add_bytes(1024)
+            return progress.snapshot()
+
+        snapshot = asyncio.run(run())
+        assert snapshot.downloaded == 1024
+        assert snapshot.percent is None
+
+    def test_updates_throttled_and_delivered_from_thread(self):
+        """Тест что хук из потока доставляет в event loop не больше одного обновления за интервал"""
+        received = []
+
+        async def on_progress(snapshot):
+            received.append(snapshot.downloaded)
+
+        async def run():
+            progress = DownloadProgress("tiktok", interval=60, metrics=ProgressMetrics())
+            progress.subscribe(on_progress)
+
+            def hook_calls():
+                for done in range(1, 6):
+                    progress.ytdlp_hook({"status": "downloading", "filename": "v.mp4",
+                                         "downloaded_bytes": done * 100, "total_bytes": 500})
+
+            thread = threading.Thread(target=hook_calls)
+            thread.start()
+            thread.join()
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+        assert len(received) == 1
+
+    def test_finish_records_metrics(self):
+        """Тест что итог загрузки попадает в метрики платформы"""
+        metrics = ProgressMetrics()
+
+        async def run():
+            progress = DownloadProgress("vk", interval=0, metrics=metrics)
+            assert metrics.get_stats()["vk"]["active"] == 1
+            progress.add_bytes(1000)
+            await asyncio.sleep(0.01)
+            progress.add_bytes(1000)
+            progress.finish()
+
+        asyncio.run(run())
+        stats = metrics.get_stats()["vk"]
+        assert stats["downloads"] == 1
+        assert stats["bytes"] == 2000
+        assert stats["avg_speed"] > 0
+        assert stats["active"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,191 @@
+"""
+Тесты для планировщика загрузок
+"""
+import asyncio
+import pytest
+from src.downloaders.scheduler import DownloadScheduler, QueueFullError
+
+
+class TestDownloadScheduler:
+    """Тесты для DownloadScheduler"""
+
+    def test_lane_limits_concurrency(self):
+        """Тест что полоса не превышает лимит одновременных загрузок"""
+        scheduler = DownloadScheduler({"tiktok": 2}, default_workers=1, max_queue=10)
+        running = 0
+        peak = 0
+
+        async def job():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return True
+
+        async def run():
+            return await asyncio.gather(*[scheduler.run("TikTok", job) for _ in range(6)])
+
+        assert all(asyncio.run(run()))
+        assert peak == 2
+        assert scheduler.get_stats()["tiktok"]["completed"] == 6
+
+    def test_slow_lane_does_not_block_other_lane(self):
+        """Тест что долгая загрузка YouTube не задерживает TikTok"""
+        scheduler = DownloadScheduler({"youtube": 1, "tiktok": 1}, default_workers=1, max_queue=10)
+        order = []
+
+        async def slow():
+            await asyncio.sleep(0.1)
+            order.append("youtube")
+
+        async def fast():
+            order.append("tiktok")
+
+        async def run():
+            await asyncio.gather(
+                scheduler.run("youtube", slow),
+                scheduler.run("youtube", slow),
+                scheduler.run("tiktok", fast),
+            )
+
+        asyncio.run(run())
+        assert order[0] == "tiktok"
+
+    def test_queue_full_rejected(self):
+        """Тест что переполненная очередь отклоняет новые задачи"""
+        scheduler = DownloadScheduler({}, default_workers=1, max_queue=1)
+
+        async def job():
+            await asyncio.sleep(0.05)
+
+        async def run():
+            return await asyncio.gather(
+                *[scheduler.run("vk", job) for _ in range(3)],
+                return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+        errors = [r for r in results if isinstance(r, QueueFullError)]
+        assert len(errors) == 1
+        assert scheduler.get_stats()["vk"]["rejected"] == 1
+
+    def test_queue_position_reported(self):
+        """Тест что ожидающие задачи получают свою позицию и ETA"""
+        scheduler = DownloadScheduler({"x": 1}, default_workers=1, max_queue=10,
+                                      default_duration=10)
+        positions = []
+
+        async def job():
+            await asyncio.sleep(0.01)
+
+        async def on_position(position, eta):
+            positions.append((position, eta))
+
+        async def run():
+            await asyncio.gather(
+                scheduler.run("twitter", job),
+                scheduler.run("twitter", job),
+                scheduler.run("twitter", job, on_position=on_position),
+            )
+
+        asyncio.run(run())
+        assert positions[0] == (2, 20)
+        assert positions[-1][0] == 1
+
+    def test_cancelled_job_leaves_queue(self):
+        """Тест что отменённая задача освобождает место в очереди"""
+        scheduler = DownloadScheduler({}, default_workers=1, max_queue=10)
+
+        async def job():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def run():
+            first = asyncio.ensure_future(scheduler.run("vk", job))
+            waiting = asyncio.ensure_future(scheduler.run("vk", job))
+            await asyncio.sleep(0.01)
+            waiting.cancel()
+            await asyncio.sleep(0)
+            assert scheduler.get_stats()["vk"]["queued"] == 0
+            return await first
+
+        assert asyncio.run(run()) == "done"
+        assert scheduler.get_stats()["vk"]["active"] == 0
+
+    def test_low_priority_runs_after_normal(self):
+        """Тест что фоновая задача пропускает вперёд обычные"""
+        scheduler = DownloadScheduler({"youtube": 1}, default_workers=1, max_queue=10)
+        order = []
+
+        def job(name):
+            async def run():
+                await asyncio.sleep(0.01)
+                order.append(name)
+            return run
+
+        async def run():
+            first = asyncio.ensure_future(scheduler.run("youtube", job("first")))
+            await asyncio.sleep(0)
+            background = asyncio.ensure_future(
+                scheduler.run("youtube", job("prefetch"), low_priority=True)
+            )
+            await asyncio.sleep(0)
+            user = asyncio.ensure_future(scheduler.run("youtube", job("user")))
+            await asyncio.gather(first, background, user)
+
+        asyncio.run(run())
+        assert order == ["first", "user", "prefetch"]
+
+    def test_low_priority_evicted_when_full(self):
+        """Тест что обычная задача вытесняет фоновую из полной очереди"""
+        scheduler = DownloadScheduler({}, default_workers=1, max_queue=1)
+
+        async def job():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        async def run():
+            first = asyncio.ensure_future(scheduler.run("vk", job))
+            await asyncio.sleep(0)
+            background = asyncio.ensure_future(scheduler.run("vk", job, low_priority=True))
+            await asyncio.sleep(0)
+            user = asyncio.ensure_future(scheduler.run("vk", job))
+            return await asyncio.gather(first, background, user, return_exceptions=True)
+
+        first, background, user = asyncio.run(run())
+        assert first == "done"
+        assert isinstance(background, QueueFullError)
+        assert user == "done"
+        assert scheduler.get_stats()["vk"]["rejected"] == 0
+
+    def test_promote_moves_job_ahead(self):
+        """Тест что promote поднимает фоновую задачу, которую ждёт пользователь"""
+        scheduler = DownloadScheduler({"youtube": 1}, default_workers=1, max_queue=10)
+        order = []
+
+        def job(name):
+            async def run():
+                await asyncio.sleep(0.01)
+                order.append(name)
+            return run
+
+        async def run():
+            first = asyncio.ensure_future(scheduler.run("youtube", job("first")))
+            await asyncio.sleep(0)
+            other = asyncio.ensure_future(
+                scheduler.run("youtube", job("other"), low_priority=True, key="a")
+            )
+            wanted = asyncio.ensure_future(
+                scheduler.run("youtube", job("wanted"), low_priority=True, key="b")
+            )
+            await asyncio.sleep(0)
+            scheduler.promote("b")
+            await asyncio.gather(first, other, wanted)
+
+        asyncio.run(run())
+        assert order == ["first", "wanted", "other"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
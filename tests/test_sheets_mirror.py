@@ -0,0 +1,108 @@
+"""
+Тесты для локальной копии листов Google Sheets
+"""
+import asyncio
+import pytest
+from src.database.db_manager import DatabaseManager
+from src.utils import sheets_mirror as mirror_module
+from src.utils.sheets_mirror import SheetsMirror
+
+
+class FakeSheets:
+    """Листы в памяти: отвечает на batch_get-диапазоны вида A{n}:M[{m}], G2:H, K2:K"""
+
+    def __init__(self, users, requests):
+        self.sheets = {"Users": users, "Requests": requests}
+        self.requested = []
+
+    async def read_ranges(self, sheet, ranges):
+        self.requested.append((sheet, ranges))
+        rows = self.sheets[sheet]
+        result = []
+        for a1 in ranges:
+            if a1 == "G2:H":
+                result.append([r[6:8] for r in rows])
+            elif a1 == "K2:K":
+                result.append([r[10:11] for r in rows])
+            else:
+                start, _, end = a1[1:].partition(":M")
+                start = int(start) - 2
+                end = int(end) - 1 if end else len(rows)
+                result.append(rows[start:end])
+        return result
+
+
+def user_row(user_id, requests, premium="no"):
+    return [str(user_id), f"user{user_id}", f"Name{user_id}", "", "ru",
+            "2026-01-01", "2026-01-01", str(requests), "active", "", premium, "no", ""]
+
+
+def request_row(user_id, platform, success="yes"):
+    return ["2026-01-01 10:00:00", str(user_id), "", platform, "video", "", success]
+
+
+@pytest.fixture
+def mirror(tmp_path, monkeypatch):
+    db = DatabaseManager(tmp_path / "bot.db")
+    sheets = FakeSheets([user_row(1, 3, "yes"), user_row(2, 7)],
+                        [request_row(1, "YouTube"), request_row(2, "tiktok", "no")])
+    monkeypatch.setattr(mirror_module, "get_db_manager", lambda: db)
+    monkeypatch.setattr(mirror_module, "sheets_manager", sheets)
+    return SheetsMirror(sync_interval=60, chunk_rows=2), sheets
+
+
+class TestSheetsMirror:
+    """Тесты для SheetsMirror"""
+
+    def test_stats_from_mirror(self, mirror):
+        """Тест что итоги и списки пользователей читаются из копии"""
+        mirror, _ = mirror
+        assert asyncio.run(mirror.sync())
+
+        stats = asyncio.run(mirror.get_stats())
+        assert stats == {"total_users": 2, "premium_users": 1, "total_requests": 2,
+                         "successful": 1, "platforms": {"youtube": 1, "tiktok": 1}}
+        top = asyncio.run(mirror.get_users(limit=1, order="top"))
+        assert top[0]["user_id"] == 2
+        recent = asyncio.run(mirror.get_users(order="recent"))
+        assert [u["user_id"] for u in recent] == [2, 1]
+        assert asyncio.run(mirror.get_user_ids()) == [1, 2]
+
+    def test_incremental_sync_reads_only_new_rows(self, mirror):
+        """Тест что повторная синхронизация читает строки после смещения"""
+        mirror, sheets = mirror
+        asyncio.run(mirror.sync())
+
+        sheets.sheets["Users"].append(user_row(3, 1))
+        sheets.sheets["Users"][0][7] = "10"  # total_requests изменился на месте
+        sheets.sheets["Users"][1][10] = "yes"
+        sheets.sheets["Requests"].append(request_row(3, "vk"))
+        sheets.requested.clear()
+        asyncio.run(mirror.sync())
+
+        assert sheets.requested == [
+            ("Users", ["A4:M", "G2:H", "K2:K"]),
+            ("Requests", ["A4:M5"]),
+        ]
+        stats = asyncio.run(mirror.get_stats())
+        assert stats["total_users"] == 3
+        assert stats["premium_users"] == 2
+        assert stats["total_requests"] == 3
+        top = asyncio.run(mirror.get_users(limit=1, order="top"))
+        assert top[0]["total_requests"] == 10
+
+    def test_failed_refresh_fails_sync(self, mirror, monkeypatch):
+        """Тест что ошибка обновления колонок Users не считается успешной синхронизацией"""
+        mirror, _ = mirror
+        db = mirror_module.get_db_manager()
+
+        async def failed_update(activity, premium):
+            return False
+
+        monkeypatch.setattr(db, "update_mirror_users", failed_update)
+        assert asyncio.run(mirror.sync()) is False
+        assert mirror.last_sync is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,212 @@
+"""
+Тесты для очереди записи в Google Sheets
+"""
+import asyncio
+import pytest
+from src.utils.sheets_queue import SheetsWriteQueue, QUOTA_BACKOFF_BASE, ERROR_BACKOFF_BASE
+
+
+class FakeSheet:
+    """Запоминает отправленные пачки, может падать по запросу"""
+
+    def __init__(self):
+        self.batches = []
+        self.error = None
+
+    async def __call__(self, sheet, rows):
+        if self.error:
+            raise self.error
+        self.batches.append((sheet, list(rows)))
+
+
+def make_queue(tmp_path, flush, batch_size=3):
+    return SheetsWriteQueue(tmp_path / "spool.jsonl", flush, batch_size=batch_size,
+                            flush_interval=60, max_rows=100)
+
+
+class TestSheetsWriteQueue:
+    """Тесты для SheetsWriteQueue"""
+
+    def test_flushes_in_batches_per_sheet(self, tmp_path):
+        """Тест что строки уходят пачками, сгруппированными по листам"""
+        sheet = FakeSheet()
+
+        async def run():
+            queue = make_queue(tmp_path, sheet)
+            for i in range(4):
+                queue.enqueue("Requests", [i])
+            queue.enqueue("Errors", ["e"])
+            assert await queue.flush() == 0
+            await queue.close()
+            return queue
+
+        queue = asyncio.run(run())
+        assert sheet.batches == [
+            ("Requests", [[0], [1], [2]]),
+            ("Requests", [[3]]),
+            ("Errors", [["e"]]),
+        ]
+        assert queue.get_stats()["pending"] == 0
+        assert queue.get_stats()["flushed"] == 5
+        assert (tmp_path / "spool.jsonl").read_text() == ""
+
+    def test_spool_survives_restart(self, tmp_path):
+        """Тест что неотправленные строки подхватываются после перезапуска"""
+        sheet = FakeSheet()
+        sheet.error = ConnectionError("offline")
+
+        async def fill():
+            queue = make_queue(tmp_path, sheet, batch_size=10)
+            queue.enqueue("Requests", ["a", 1])
+            queue.enqueue("Errors", ["b"])
+            queue._task.cancel()
+
+        asyncio.run(fill())
+
+        sheet.error = None
+        restarted = make_queue(tmp_path, sheet)
+        assert restarted.get_stats()["pending"] == 2
+        assert asyncio.run(restarted.flush()) == 0
+        assert sheet.batches == [("Requests", [["a", 1]]), ("Errors", [["b"]])]
+
+    def test_failed_flush_keeps_rows_and_backs_off(self, tmp_path):
+        """Тест что при ошибке строки остаются, а пауза после квоты длиннее"""
+        sheet = FakeSheet()
+        queue = make_queue(tmp_path, sheet)
+        queue._pending.append((0, "Requests", ["x"]))
+
+        sheet.error = ConnectionError("connection reset")
+        delay = asyncio.run(queue.flush())
+        assert ERROR_BACKOFF_BASE / 2 <= delay < QUOTA_BACKOFF_BASE / 2
+
+        sheet.error = Exception("APIError: [429]: Quota exceeded for quota metric 'Write requests'")
+        delay = asyncio.run(queue.flush())
+        assert delay >= QUOTA_BACKOFF_BASE
+        assert queue.get_stats()["pending"] == 1
+        assert queue.get_stats()["errors"] == 2
+
+        sheet.error = None
+        assert asyncio.run(queue.flush()) == 0
+        assert sheet.batches == [("Requests", [["x"]])]
+
+    def test_rows_dropped_during_flush_do_not_remove_unsent(self, tmp_path):
+        """Тест что вытеснение старых строк во время отправки не теряет новые"""
+        sent = []
+
+        async def run():
+            async def slow_flush(sheet, rows):
+                if not sent:
+                    # Пока первая пачка отправляется, очередь переполняется
+                    for i in range(3):
+                        queue.enqueue("Requests", [f"new{i}"])
+                sent.append(list(rows))
+
+            queue = SheetsWriteQueue(tmp_path / "spool.jsonl", slow_flush, batch_size=10,
+                                     flush_interval=60, max_rows=3)
+            queue.enqueue("Requests", ["old0"])
+            queue.enqueue("Requests", ["old1"])
+            queue._task.cancel()
+            await queue.flush()
+            return queue
+
+        queue = asyncio.run(run())
+        assert sent[0] == [["old0"], ["old1"]]
+        # Строки, поставленные во время отправки, отправлены следующей пачкой
+        assert sent[1] == [["new0"], ["new1"], ["new2"]]
+        assert queue.get_stats()["dropped"] == 2
+
+    def test_close_waits_for_flush_in_progress(self, tmp_path):
+        """Тест что close не прерывает отправку пачки и не отправляет её повторно"""
+        sent = []
+
+        async def run():
+            started = asyncio.Event()
+            release = asyncio.Event()
+
+            async def slow_flush(sheet, rows):
+                # Строки уже в листе, ответ API ещё не пришёл
+                sent.append(list(rows))
+                started.set()
+                await release.wait()
+
+            queue = make_queue(tmp_path, slow_flush, batch_size=2)
+            queue.enqueue("Requests", ["a"])
+            queue.enqueue("Requests", ["b"])
+            await started.wait()
+            queue.enqueue("Requests", ["c"])
+
+            closing = asyncio.ensure_future(queue.close())
+            await asyncio.sleep(0.01)
+            release.set()
+            await closing
+            return queue
+
+        queue = asyncio.run(run())
+        assert sent == [[["a"], ["b"]], [["c"]]]
+        assert queue.get_stats()["pending"] == 0
+        assert (tmp_path / "spool.jsonl").read_text() == ""
+
+    def test_spool_bounded_while_flush_fails(self, tmp_path):
+        """Тест что при недоступной таблице spool и очередь после перезапуска не растут сверх max_rows"""
+        sheet = FakeSheet()
+        sheet.error = ConnectionError("offline")
+        spool = tmp_path / "spool.jsonl"
+
+        async def fill():
+            queue = SheetsWriteQueue(spool, sheet, batch_size=100, flush_interval=60, max_rows=5)
+            for i in range(50):
+                queue.enqueue("Requests", [i])
+                await queue.flush()
+            queue._task.cancel()
+            return queue
+
+        queue = asyncio.run(fill())
+        assert queue.get_stats()["pending"] == 5
+        assert queue.get_stats()["dropped"] == 45
+        assert len(spool.read_text().splitlines()) <= 5
+
+        restarted = SheetsWriteQueue(spool, sheet, batch_size=100, flush_interval=60, max_rows=5)
+        assert restarted.get_stats()["pending"] == 5
+        sheet.error = None
+        assert asyncio.run(restarted.flush()) == 0
+        assert sheet.batches == [("Requests", [[45], [46], [47], [48], [49]])]
+
+    def test_oversized_spool_trimmed_on_load(self, tmp_path):
+        """Тест что spool сверх max_rows при загрузке обрезается до последних строк"""
+        spool = tmp_path / "spool.jsonl"
+        spool.write_text("".join(f'{{"sheet": "Errors", "row": [{i}]}}\n' for i in range(8)))
+
+        queue = SheetsWriteQueue(spool, FakeSheet(), batch_size=10, flush_interval=60, max_rows=3)
+
+        assert queue.get_stats()["pending"] == 3
+        assert queue.get_stats()["dropped"] == 5
+        assert len(spool.read_text().splitlines()) == 3
+
+
+class TestSheetsManagerQueue:
+    """Тесты очереди записи в GoogleSheetsManager"""
+
+    def test_unconfigured_sheets_queue_nothing(self, tmp_path, monkeypatch):
+        """Тест что без учётных данных строки не пишутся в spool и отправка не запускается"""
+        from src.utils import sheets as sheets_module
+
+        monkeypatch.setattr(sheets_module, "CREDENTIALS_JSON", "")
+        monkeypatch.setattr(sheets_module, "CREDENTIALS_PATH", str(tmp_path / "missing.json"))
+        monkeypatch.setattr(sheets_module.config, "SHEETS_SPOOL_PATH", tmp_path / "spool.jsonl")
+        monkeypatch.setattr(sheets_module.config, "DAILY_STATS_PATH", tmp_path / "daily_stats.json")
+        manager = sheets_module.GoogleSheetsManager()
+
+        async def run():
+            manager.start()
+            logged = await manager.log_request(1, "user", "YouTube", "video", "https://y/1", True)
+            errored = await manager.log_error(1, "download", "failed")
+            await manager.close()
+            return logged, errored
+
+        assert asyncio.run(run()) == (False, False)
+        assert manager.queue._task is None
+        assert not (tmp_path / "spool.jsonl").exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
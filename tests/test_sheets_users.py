@@ -0,0 +1,90 @@
+"""
+Тесты для индекса листа Users в GoogleSheetsManager
+"""
+import asyncio
+import pytest
+from src.utils.daily_stats import DailyStats
+from src.utils.sheets import GoogleSheetsManager
+
+
+class FakeUsersSheet:
+    """Лист Users в памяти; считает обращения к API"""
+
+    def __init__(self, rows):
+        self.rows = rows  # без заголовка: [user_id, ..., total_requests в колонке H]
+        self.calls = []
+
+    def batch_get(self, ranges):
+        self.calls.append("batch_get")
+        return [[[row[0]] for row in self.rows], [[row[7]] for row in self.rows]]
+
+    def append_row(self, values):
+        self.calls.append("append_row")
+        self.rows.append(values)
+        row = len(self.rows) + 1
+        return {"updates": {"updatedRange": f"Users!A{row}:M{row}"}}
+
+    def batch_update(self, data):
+        self.calls.append("batch_update")
+        for item in data:
+            row = int(item["range"].split(":")[0][1:])
+            self.rows[row - 2][6:8] = item["values"][0]
+
+    def find(self, *args, **kwargs):
+        raise AssertionError("Индекс должен заменять find")
+
+
+def make_manager(tmp_path, monkeypatch, rows):
+    manager = GoogleSheetsManager()
+    sheet = FakeUsersSheet(rows)
+
+    async def init():
+        return True
+
+    monkeypatch.setattr(manager, "init", init)
+    manager.daily_stats = DailyStats(tmp_path / "daily_stats.json")
+    manager.spreadsheet = type("Spreadsheet", (), {"worksheet": lambda self, name: sheet})()
+    return manager, sheet
+
+
+def user_row(user_id, requests):
+    return [str(user_id), "", "", "", "ru", "2026-01-01", "2026-01-01", requests, "active", "", "no", "no", ""]
+
+
+class TestUsersIndex:
+    """Тесты для register_user с индексом строк"""
+
+    def test_existing_users_batched(self, tmp_path, monkeypatch):
+        """Тест что обновления известных пользователей уходят одним batch_update"""
+        manager, sheet = make_manager(tmp_path, monkeypatch, [user_row(1, 5), user_row(2, "")])
+
+        async def run():
+            await manager.register_user(1)
+            await manager.register_user(2)
+            await manager.register_user(1)  # Повтор в окне подавления
+            await manager.flush_user_updates()
+
+        asyncio.run(run())
+        assert sheet.calls == ["batch_get", "batch_update"]
+        assert sheet.rows[0][7] == 6
+        assert sheet.rows[1][7] == 1
+
+    def test_new_user_indexed(self, tmp_path, monkeypatch):
+        """Тест что новый пользователь дописывается и попадает в индекс"""
+        manager, sheet = make_manager(tmp_path, monkeypatch, [user_row(1, 5)])
+        monkeypatch.setattr("src.utils.sheets.config.SHEETS_USER_DEBOUNCE", 0)
+
+        async def run():
+            await manager.register_user(3)
+            await manager.register_user(3)
+            await manager.flush_user_updates()
+
+        asyncio.run(run())
+        assert sheet.calls == ["batch_get", "append_row", "batch_update"]
+        assert sheet.rows[1][0] == "3"
+        assert sheet.rows[1][7] == 2
+        assert manager.daily_stats.pending_rows()[-1][2] == 1  # new_users
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
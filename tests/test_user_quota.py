@@ -0,0 +1,53 @@
+"""
+Тесты для локального хранения премиум-статуса и дневного лимита
+"""
+import asyncio
+import pytest
+from src.database import db_manager
+from src.database.db_manager import DatabaseManager
+
+
+class TestUserQuota:
+    """Тесты для user_quota в DatabaseManager"""
+
+    def test_daily_counter_upsert(self, tmp_path):
+        """Тест что счётчик создаётся и увеличивается атомарным upsert"""
+        db = DatabaseManager(tmp_path / "bot.db")
+
+        async def run():
+            counts = [await db.increment_daily_requests(1) for _ in range(3)]
+            return counts, await db.get_user_quota(1), await db.get_user_quota(2)
+
+        counts, quota, unknown = asyncio.run(run())
+        assert counts == [1, 2, 3]
+        assert quota == {'is_premium': False, 'daily_requests': 3}
+        assert unknown == {'is_premium': False, 'daily_requests': 0}
+
+    def test_counter_resets_on_new_day(self, tmp_path, monkeypatch):
+        """Тест что вчерашний счётчик не учитывается и начинается заново"""
+        db = DatabaseManager(tmp_path / "bot.db")
+        monkeypatch.setattr(db_manager, "_today", lambda: "2026-01-01")
+        asyncio.run(db.increment_daily_requests(1))
+        asyncio.run(db.increment_daily_requests(1))
+
+        monkeypatch.setattr(db_manager, "_today", lambda: "2026-01-02")
+        assert asyncio.run(db.get_user_quota(1))['daily_requests'] == 0
+        assert asyncio.run(db.increment_daily_requests(1)) == 1
+
+    def test_premium_users_replaced(self, tmp_path):
+        """Тест что синхронизация заменяет список премиум-пользователей, не трогая счётчики"""
+        db = DatabaseManager(tmp_path / "bot.db")
+
+        async def run():
+            await db.increment_daily_requests(1)
+            await db.set_premium_users([1, 2])
+            await db.set_premium_users([2, 3])
+            return [await db.get_user_quota(user_id) for user_id in (1, 2, 3)]
+
+        first, second, third = asyncio.run(run())
+        assert first == {'is_premium': False, 'daily_requests': 1}
+        assert second['is_premium'] and third['is_premium']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,69 @@
+"""
+Тесты для пула процессов yt-dlp
+"""
+import asyncio
+import os
+import time
+import pytest
+from src.downloaders.ytdlp_worker import YtDlpProcessPool
+
+
+def wait_for_pids(pool, count, timeout=30):
+    """Ждёт, пока процессы пула сообщат свои PID"""
+    started = time.monotonic()
+    while len(pool.worker_pids()) < count and time.monotonic() - started < timeout:
+        time.sleep(0.05)
+    return pool.worker_pids()
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+class TestYtDlpProcessPool:
+    """Тесты для YtDlpProcessPool"""
+
+    def test_kill_stops_worker_processes(self):
+        """Тест что kill убивает процессы пула по своим PID"""
+        pool = YtDlpProcessPool(2)
+        try:
+            pool.get_executor().submit(time.sleep, 30)
+            pids = wait_for_pids(pool, 2)
+            assert len(pids) == 2
+
+            pool.kill()
+
+            deadline = time.monotonic() + 10
+            while any(is_alive(pid) for pid in pids) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert not any(is_alive(pid) for pid in pids)
+            assert pool.kills == 1
+            assert pool.worker_pids() == set()
+        finally:
+            pool.shutdown()
+
+    def test_job_killed_when_timeout_expires(self):
+        """Тест что задача, не уложившаяся в таймаут, останавливается вместе со своим процессом"""
+        pool = YtDlpProcessPool(2)
+        try:
+            pool.get_executor()
+            pids = wait_for_pids(pool, 2)
+
+            started = time.monotonic()
+            with pytest.raises(asyncio.TimeoutError):
+                asyncio.run(pool.call(time.sleep, 30, timeout=0.5))
+
+            assert time.monotonic() - started < 5
+            assert pool.kills == 1
+            deadline = time.monotonic() + 10
+            while any(is_alive(pid) for pid in pids) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert not any(is_alive(pid) for pid in pids)
+            # Следующая задача получает новый пул
+            assert asyncio.run(pool.call(abs, -3, timeout=30)) == 3
+        finally:
+            pool.shutdown()